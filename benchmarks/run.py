@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+'''
+Compiles the benchmark programs in this folder and times them under lli
+
+    python benchmarks/run.py              runs every benchmark
+    python benchmarks/run.py memo ...     runs the named benchmarks
+'''
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+__author__ = "Mugilan Ganesan"
+__email__ = "mugi.ganesan@gmail.com"
+__status__ = "Developer"
+__version__ = "1.0.0"
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(HERE, os.pardir, "src", "compiler.py")
+
+REPEAT = 3
+
+
+class Benchmark:
+
+    def __init__(self, name, title, variants, sizes, make_input, rate=None):
+        '''
+        variants are (label, program, compiler flags, largest size) tuples,
+        make_input(size) gives the program's stdin, and rate is an optional
+        (unit, work(size)) pair used to report throughput
+        '''
+
+        self.name = name
+        self.title = title
+        self.variants = variants
+        self.sizes = sizes
+        self.make_input = make_input
+        self.rate = rate
+
+
+BENCHMARKS = [
+    Benchmark("memo", "Recursive Fibonacci, plain vs MEMO subroutine",
+              [("plain", "fibonacci_recursive.pc", [], 38),
+               ("memo", "fibonacci_memo.pc", [], None)],
+              [20, 26, 32, 35, 38, 1000, 10000, 50000],
+              lambda n: str(n) + "\n"),
+    Benchmark("output", "OUTPUT throughput, one line per iteration",
+              [("integers", "output_int.pc", [], None),
+               ("mixed", "output_mixed.pc", [], None)],
+              [10000, 100000, 1000000, 10000000],
+              lambda n: str(n) + "\n",
+              rate=(" lines/s", lambda n: n)),
+    Benchmark("input", "INPUT throughput, summing one integer per line",
+              [("integers", "input_int.pc", [], None)],
+              [10000, 100000, 1000000, 5000000],
+              lambda n: str(n) + "\n" + "".join("%d\n" % (i * 7919 % 100003 - 50000) for i in range(n)),
+              rate=(" values/s", lambda n: n)),
+    Benchmark("input_decimal", "INPUT throughput, summing one decimal per line",
+              [("decimals", "input_double.pc", [], None)],
+              [10000, 100000, 1000000, 5000000],
+              lambda n: str(n) + "\n" + "".join("%d.%03d\n" % (i * 7919 % 100003 - 50000, i % 1000) for i in range(n)),
+              rate=(" values/s", lambda n: n)),
+    Benchmark("array_io", "Reading n integers into an array and writing them back, loops vs INPUT x, n and OUTPUT x, n",
+              [("loops", "array_io_loop.pc", [], None),
+               ("bulk", "array_io_bulk.pc", [], None)],
+              [10000, 100000, 1000000, 5000000],
+              lambda n: str(n) + "\n" + "".join("%d\n" % (i * 7919 % 100003 - 50000) for i in range(n)),
+              rate=(" values/s", lambda n: n)),
+    Benchmark("strings", "Appending 10 characters to a string in a loop, up to 10 MB",
+              [("append", "string_append.pc", [], None)],
+              [1000, 10000, 100000, 1000000],
+              lambda n: str(n) + "\n",
+              rate=(" MB/s", lambda n: n * 10 / 1e6)),
+    Benchmark("arena", "Arrays declared in a loop and in a subroutine, malloc vs --alloc=arena",
+              [("malloc", "arena_loop.pc", [], None),
+               ("arena", "arena_loop.pc", ["--alloc=arena"], None)],
+              [1000, 10000, 100000, 1000000],
+              lambda n: str(n) + "\n"),
+    Benchmark("bounds", "Array loops, unchecked vs --bounds-check",
+              [("unchecked", "bounds_check.pc", [], None),
+               ("checked", "bounds_check.pc", ["--bounds-check"], None)],
+              [100000, 1000000, 10000000],
+              lambda n: str(n) + "\n"),
+    Benchmark("reduce", "SUM, MIN and MAX over 10^8 elements in total, hand-written loops vs built-in",
+              [("loops", "reduce_loop.pc", [], None),
+               ("built-in", "reduce_builtin.pc", [], None)],
+              [1000, 100000, 10000000],
+              lambda n: str(n) + "\n"),
+    Benchmark("math", "Square roots and fifth powers, Newton iterations and loops vs SQRT and POW",
+              [("loops", "math_newton.pc", [], None),
+               ("built-in", "math_builtin.pc", [], None)],
+              [10000, 1000000, 10000000],
+              lambda n: str(n) + "\n"),
+    Benchmark("sort", "Sorting pseudo-random numbers, selection sort vs SORT",
+              [("selection", "sort_selection.pc", [], 100000),
+               ("SORT INT", "sort_int.pc", [], None),
+               ("SORT DOUBLE", "sort_double.pc", [], None)],
+              [10000, 100000, 1000000, 10000000],
+              lambda n: str(n) + "\n"),
+    Benchmark("append", "Keeping a third of n numbers, array of n elements vs APPEND",
+              [("preallocated", "append_prealloc.pc", [], None),
+               ("APPEND", "append_dynamic.pc", [], None)],
+              [10000, 1000000, 10000000, 50000000],
+              lambda n: str(n) + "\n"),
+    Benchmark("map", "Counting occurrences of n/4 distinct values, linear scan vs MAP",
+              [("scan", "map_scan.pc", [], 100000),
+               ("MAP", "map_count.pc", [], None)],
+              [10000, 100000, 1000000, 10000000],
+              lambda n: str(n) + "\n"),
+    Benchmark("record", "Moving n records of 8 DOUBLE fields along one axis 20 times, LAYOUT AOS vs SOA",
+              [("AOS", "record_aos.pc", [], None),
+               ("SOA", "record_soa.pc", [], None)],
+              [10000, 100000, 1000000, 5000000],
+              lambda n: str(n) + "\n"),
+]
+
+
+def compile_program(program, flags, directory):
+
+    output = os.path.join(directory, os.path.splitext(program)[0] + "_".join([""] + flags) + ".ll")
+
+    subprocess.run([sys.executable, COMPILER, "--filename=" + os.path.join(HERE, program), "--output=" + output] + flags,
+                   check=True, stdout=subprocess.DEVNULL)
+
+    return output
+
+
+def time_program(ir_file, stdin):
+
+    best = None
+
+    for i in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run(["lli", ir_file], input=stdin, stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def run(benchmark, directory):
+
+    print(benchmark.title)
+
+    compiled = [compile_program(program, flags, directory) for label, program, flags, largest in benchmark.variants]
+    columns = [label for label, program, flags, largest in benchmark.variants]
+    width = 28 if benchmark.rate else 16
+
+    print("  " + "size".rjust(10) + "".join(label.rjust(width) for label in columns))
+
+    for size in benchmark.sizes:
+        stdin = benchmark.make_input(size).encode("utf8")
+        row = "  " + str(size).rjust(10)
+
+        for (label, program, flags, largest), ir_file in zip(benchmark.variants, compiled):
+
+            if largest is not None and size > largest:
+                row += "-".rjust(width)
+                continue
+
+            elapsed = time_program(ir_file, stdin)
+
+            if benchmark.rate:
+                unit, work = benchmark.rate
+                row += ("%.3gs %.3g%s" % (elapsed, work(size) / elapsed, unit)).rjust(width)
+            else:
+                row += ("%.4fs" % elapsed).rjust(width)
+
+        print(row)
+
+    print()
+
+
+def main(names):
+
+    selected = [benchmark for benchmark in BENCHMARKS if not names or benchmark.name in names]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for benchmark in selected:
+            run(benchmark, directory)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -9,6 +9,7 @@ import click
 
 from pc_parser import PC_Parser
 from ir_generator import Generator
+from pc_inliner import Inliner, INLINE_THRESHOLD, INLINE_BUDGET
 
 
 @click.command()
@@ -23,7 +24,35 @@ from ir_generator import Generator
               help="The file which will contain the compiled code"
              )
 
-def main(filename, output):
+@click.option('--auto-parallel',
+              is_flag=True,
+              default=False,
+              help="Split provably independent loops across worker threads"
+             )
+
+@click.option('--inline-threshold',
+              default=INLINE_THRESHOLD,
+              help="The largest subroutine body, in AST nodes, that is inlined at its call sites (0 disables inlining)"
+             )
+
+@click.option('--inline-budget',
+              default=INLINE_BUDGET,
+              help="The most call sites that are inlined in one program"
+             )
+
+@click.option('--alloc',
+              type=click.Choice(["malloc", "arena"]),
+              default="malloc",
+              help="How arrays and strings are allocated: one malloc each, or from arenas released when subroutine calls and loop iterations end"
+             )
+
+@click.option('--bounds-check',
+              is_flag=True,
+              default=False,
+              help="Stop with an error when an array index is out of bounds, instead of corrupting memory"
+             )
+
+def main(filename, output, auto_parallel, inline_threshold, inline_budget, alloc, bounds_check):
     
     input_file = open(filename)
     lines = [line.lstrip() for i, line in enumerate(input_file) if line.strip()]
@@ -33,7 +62,21 @@ def main(filename, output):
     text = ''.join(lines)
     
     ast = PC_Parser().parse(text)
-    ir = Generator().generate(ast, output)
+
+    inliner = Inliner(inline_threshold, inline_budget)
+    ast = inliner.inline(ast)
+
+    if inliner.inlined:
+        click.echo("inlined " + str(inliner.inlined) + (" call site" if inliner.inlined == 1 else " call sites"))
+
+    codegen = Generator(auto_parallel=auto_parallel, alloc=alloc, bounds_check=bounds_check)
+    ir = codegen.generate(ast, output)
+
+    for line in codegen.parallel_report:
+        click.echo(line)
+
+    for line in codegen.bounds_report:
+        click.echo(line)
     
     output_file = open(output,"w+")
     output_file.write(str(ir))
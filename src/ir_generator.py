@@ -5,102 +5,1789 @@ An independent code generator that takes an AST and creates LLVM IR
 from it. The IR is returned as an llvmlite module instance.
 '''
 
+import math
+
 from llvmlite import ir
 from llvmlite import binding
 
-import pc_ast
-from pc_lexer import PC_Lexer
-from pc_parser import PC_Parser
+import pc_ast
+import pc_analysis
+import pc_runtime
+from pc_bounds import Bounds_Analysis, INT_MIN, INT_MAX
+from pc_lexer import PC_Lexer
+from pc_parser import PC_Parser
+from pc_parallel import Loop_Parallelizer
+
+__author__ = "Mugilan Ganesan"
+__email__ = "mugi.ganesan@gmail.com"
+__status__ = "Developer"
+__version__ = "1.0.0"
+
+
+PARALLEL_MIN_TRIP = 1 << 16
+
+ELEMENT_SIZE = {int: 4, float: 8}
+
+STACK_ARRAY_LIMIT = 4096 # bytes
+STACK_ARRAY_ALIGN = 16
+
+MEMO_DIRECT_SIZE = 1 << 16
+
+REDUCTION_WIDTH = 4
+REDUCTION_ACCUMULATORS = 2
+
+# the math functions that are a single LLVM intrinsic on a DOUBLE
+MATH_INTRINSICS = {'SQRT': 'llvm.sqrt', 'EXP': 'llvm.exp', 'LOG': 'llvm.log', 'SIN': 'llvm.sin', 'COS': 'llvm.cos',
+                   'FLOOR': 'llvm.floor', 'CEIL': 'llvm.ceil'}
+
+
+class Generator:
+    
+    def __init__(self, auto_parallel=False, alloc="malloc", bounds_check=False):
+        
+        self.variables  = {}
+        self.functions  = {}
+        self.constants  = {}
+        self.tail_loops = {}
+        self.tail_calls = {}
+        self.memos      = {}
+        self.scope      = ''
+
+        self.effects   = {}
+        self.recursive = set()
+        self.exiting   = set()
+
+        self.auto_parallel   = auto_parallel
+        self.parallel_plans  = {}
+        self.parallel_report = []
+
+        self.alloc        = alloc
+        self.arena_marks    = {}
+        self.file_handles   = {}
+        self.statements     = []
+        self.stack_arrays   = {}
+        self.local_strings  = {}
+        self.dynamic_arrays = set()
+
+        self.bounds_check  = bounds_check
+        self.proven        = set()
+        self.hoisted       = {}
+        self.unchecked     = set()
+        self.versioning    = True
+        self.bounds_report = []
+
+        self.no_wrap = set()
+    
+    def generate(self, ast=[[]], output="output.ll"):
+        
+        self.variables  = {}
+        self.constants  = {}
+        self.functions  = {}
+        self.tail_loops = {}
+        self.tail_calls = {}
+        self.memos      = {}
+        self.scope      = ''
+
+        self.arena_marks    = {}
+        self.file_handles   = {}
+        self.statements     = ast[0]
+        self.stack_arrays   = {}
+        self.local_strings  = {}
+        self.dynamic_arrays = set()
+
+        self.module = ir.Module(name=output)
+
+        triple =  binding.get_default_triple()
+        self.module.triple = "" # the default triple from llvmlite seems to not work on some devices.
+
+        self.runtime = pc_runtime.Runtime(self.module, self.alloc)
+
+        decls = [decl for statements in ast for decl in pc_analysis.function_decls(statements)]
+        graph = pc_analysis.call_graph(decls)
+
+        self.effects = pc_analysis.function_effects(decls, graph)
+        self.recursive = pc_analysis.recursive_functions(graph)
+        self.written = pc_analysis.written_params(decls)
+        self.noalias = pc_analysis.noalias_params(decls, ast, self.written)
+        self.params = {decl.name: decl.args for decl in decls}
+
+        if self.auto_parallel:
+            pure = {name for name, effect in self.effects.items() if effect == pc_analysis.PURE}
+            parallelizer = Loop_Parallelizer(pure, self.noalias)
+            self.parallel_plans = parallelizer.analyze(ast)
+            self.parallel_report = parallelizer.report
+
+        if self.bounds_check:
+            analysis = Bounds_Analysis(self.parallel_plans).analyze(ast)
+            self.proven = analysis.proven
+            self.hoisted = analysis.hoisted
+            self.bounds_report = analysis.report
+
+        self.exiting = pc_analysis.exiting_functions(decls, graph, self.bounds_check, self.proven)
+
+        main_ty = ir.FunctionType(ir.IntType(32), ())
+        self.main = ir.Function(self.module, main_ty, name="main")
+        
+        self.scope = self.main
+
+        builder = self.function_body(self.main)
+
+        for statement in ast[0]:
+            builder = self.codegen(statement,builder)
+
+        if self.runtime.function("pc_open_file"):
+            builder.call(self.runtime.close_files(), [])
+
+        if self.runtime.function("pc.stdout"):
+            builder.call(self.runtime.flush(), [])
+
+        if self.runtime.function("pc_arena_alloc"):
+            builder.call(self.runtime.arena_report(), [])
+
+        builder.ret(ir.IntType(32)(0))
+
+        return self.module
+
+    def function_body(self, func):
+        '''
+        Starts a function with an entry block that only holds its stack
+        allocations, and returns a builder for the block that follows it
+        '''
+
+        entry = func.append_basic_block(name="entry")
+        body = func.append_basic_block(name="body")
+        ir.IRBuilder(entry).branch(body)
+
+        return ir.IRBuilder(body)
+
+    def entry_alloca(self, dType, name):
+        '''Allocates stack space in the entry block of the current function'''
+
+        entry = self.scope.entry_basic_block
+        entry_builder = ir.IRBuilder(entry)
+        entry_builder.position_before(entry.terminator)
+
+        return entry_builder.alloca(dType, size=None, name=name)
+
+    def entry_store(self, value, ptr):
+        '''Initializes stack space at the start of every call of the current function'''
+
+        entry = self.scope.entry_basic_block
+        entry_builder = ir.IRBuilder(entry)
+        entry_builder.position_before(entry.terminator)
+
+        entry_builder.store(value, ptr)
+
+    def value(self, node, builder):
+        '''Generates an expression, loading it if it is a scalar variable or array element'''
+
+        res = self.codegen(node, builder)
+
+        if isinstance(node, pc_ast.Variable) or isinstance(node, pc_ast.Array_Element):
+            if node.dType == float or node.dType == int:
+                res = builder.load(res, name=node.name + "_val", align=self.alignment(res))
+
+        return res
+
+    def loop(self, node, condition, body, builder, metadata=None):
+        '''
+        Emits a loop that tests its condition before every iteration,
+        including the first. Loops the parallelizer has planned are
+        split across worker threads instead. metadata is attached to the
+        branch back to the condition.
+        '''
+
+        if node in self.parallel_plans:
+            return self.parallel_loop(self.parallel_plans[node], condition, body, builder)
+
+        if node in self.hoisted and self.versioning:
+            return self.versioned_loop(self.hoisted[node], condition, body, builder)
+
+        if self.contiguous_loop(node):
+            return self.row_loop(node, condition, body, builder)
+
+        loop_cond = self.scope.append_basic_block(name="while.cond")
+        loop_body = self.scope.append_basic_block(name="while.body")
+        loop_exit = self.scope.append_basic_block(name="while.exit")
+
+        mark = None
+
+        if self.arena_loop(body):
+            mark = self.entry_alloca(pc_runtime.ARENA_MARK, name="arena.mark")
+            builder.call(self.runtime.arena_mark(), [mark])
+
+        builder.branch(loop_cond)
+        builder.position_at_end(loop_cond)
+
+        condition = self.codegen(condition, builder)
+        builder.cbranch(condition, loop_body, loop_exit)
+
+        builder.position_at_end(loop_body)
+
+        for statement in body:
+            builder = self.codegen(statement, builder)
+
+        if not builder.block.is_terminated:
+            self.end_loop_arrays(body, builder)
+
+            if mark:
+                builder.call(self.runtime.arena_release(), [mark])
+
+            latch = builder.branch(loop_cond)
+
+            if metadata is not None:
+                latch.set_metadata('llvm.loop', metadata)
+
+        builder.position_at_end(loop_exit)
+
+        return builder
+
+    def versioned_loop(self, plan, condition, body, builder):
+        '''
+        Makes the bounds checks hoisted out of a counted loop once, before
+        it. The loop is generated twice: without those checks, run when
+        they all pass, and with them, run otherwise so that an access out
+        of bounds is still reported when it happens.
+        '''
+
+        long = ir.IntType(64)
+        counter = ir.PointerType(ir.IntType(32))('%"' + plan.var + '"')
+
+        first = builder.sext(builder.load(counter), long, name="bounds.first")
+        bound = builder.sext(self.value(plan.bound, builder), long, name="bounds.bound")
+        last = bound if plan.inclusive else builder.sub(bound, long(1), name="bounds.last")
+
+        passed = ir.IntType(1)(1)
+
+        # the counter of a loop that runs up to INT_MAX inclusive wraps around
+        if plan.inclusive:
+            passed = builder.icmp_signed('<', bound, long(INT_MAX), name="bounds.finite")
+
+        for check in plan.checks:
+            access = check.access
+            length = builder.load(ir.PointerType(long)('%"' + access.name + '.len"'), name=access.name + ".len_val")
+
+            if check.counter:
+                low, high = (first, last) if check.step > 0 else (builder.neg(last), builder.neg(first))
+
+                if check.offset is not None:
+                    offset = builder.sext(self.value(check.offset, builder), long)
+
+                    if check.negate:
+                        offset = builder.neg(offset)
+
+                    low, high = builder.add(low, offset), builder.add(high, offset)
+
+                inside = builder.and_(builder.icmp_signed('>=', low, long(0)), builder.icmp_signed('<', high, length))
+
+            else:
+                index = self.index(self.value(access.index, builder), builder)
+                inside = builder.icmp_unsigned('<', index, length)
+
+            passed = builder.and_(passed, inside, name="bounds.passed")
+
+        empty = builder.icmp_signed('>', first, last, name="bounds.empty")
+
+        with builder.if_else(builder.or_(empty, passed), likely=True) as (then, otherwise):
+
+            with then:
+                unchecked = self.unchecked
+                self.unchecked = unchecked | {check.access for check in plan.checks}
+                builder = self.loop(None, condition, body, builder)
+                self.unchecked = unchecked
+
+            with otherwise:
+                versioning = self.versioning
+                self.versioning = False
+                builder = self.loop(None, condition, body, builder)
+                self.versioning = versioning
+
+        return builder
+
+    def row_loop(self, node, condition, body, builder):
+        '''
+        Emits a FOR loop along the rows of an array with several
+        dimensions and asks LLVM to vectorize it. LLVM can only count the
+        iterations of a loop whose counter does not wrap around, so the
+        loop is generated twice: with a counter that is stepped without
+        wrapping, run when the bound is below INT_MAX, and as an ordinary
+        loop otherwise.
+        '''
+
+        step = body[-1].rvalue
+
+        bound = self.value(node.final, builder)
+        finite = builder.icmp_signed('<', bound, ir.IntType(32)(INT_MAX), name="row.finite")
+
+        with builder.if_else(finite, likely=True) as (then, otherwise):
+
+            with then:
+                self.no_wrap.add(step)
+                builder = self.loop(None, condition, body, builder, metadata=self.vectorize_metadata())
+                self.no_wrap.discard(step)
+
+            with otherwise:
+                builder = self.loop(None, condition, body, builder)
+
+        return builder
+
+    def parallel_loop(self, plan, condition, body, builder):
+        '''
+        Runs the iterations [i, bound) on worker threads through
+        pc_parallel_for when there are enough of them to pay for the
+        threads, and as an ordinary loop otherwise
+        '''
+
+        counter = ir.PointerType(ir.IntType(32))('%"' + plan.var + '"')
+
+        lo = builder.load(counter, name="par.lo")
+        hi = self.value(plan.bound, builder)
+
+        if plan.inclusive:
+            hi = builder.add(hi, ir.IntType(32)(1), name="par.hi")
+
+        trip = builder.sub(hi, lo, name="par.trip")
+        worth = builder.icmp_signed('>=', trip, ir.IntType(32)(PARALLEL_MIN_TRIP), name="par.worth")
+
+        with builder.if_else(worth) as (then, otherwise):
+
+            with then:
+                worker, ctx_ty, fields = self.parallel_worker(plan)
+
+                ctx = self.entry_alloca(ctx_ty, name="par.ctx")
+
+                for index, (name, dType) in enumerate(fields):
+                    field = builder.gep(ctx, [ir.IntType(32)(0), ir.IntType(32)(index)], inbounds=True)
+
+                    if name in plan.arrays:
+                        builder.store(self.array_pointer(name, plan.arrays[name], builder), field)
+                    else:
+                        builder.store(ir.PointerType(dType)('%"' + name + '"'), field)
+
+                threads = builder.call(self.runtime.parallel_for(),
+                                       [worker, builder.bitcast(ctx, pc_runtime.PTR), lo, hi], name="par.threads")
+
+                for index, (name, (op, dType)) in enumerate(plan.reductions.items(), len(fields)):
+                    var = ir.PointerType(self.ir_type(dType))('%"' + name + '"')
+
+                    with pc_runtime.for_range(builder, ir.IntType(32)(0), threads, name="par.combine") as t:
+                        part = builder.gep(ctx, [ir.IntType(32)(0), ir.IntType(32)(index), t], inbounds=True)
+                        res = self.reduce(op, dType, builder.load(var), builder.load(part), builder)
+                        builder.store(res, var)
+
+                builder.store(hi, counter)
+
+            with otherwise:
+                builder = self.loop(None, condition, body, builder)
+
+        return builder
+
+    def parallel_worker(self, plan):
+        '''
+        Outlines the body of a planned loop into a worker function that
+        runs the iterations [lo, hi) given to it by pc_parallel_for. The
+        worker reaches the variables it reads through pointers in a context
+        struct, and leaves its part of every reduction in that struct.
+        '''
+
+        fields = [(name, self.ir_type(dType)) for name, dType in plan.scalars.items()]
+        fields += [(name, self.ir_type(dType)) for name, dType in plan.arrays.items()]
+
+        if self.bounds_check:
+            fields += [(name + ".len", ir.IntType(64)) for name in plan.arrays]
+
+        partials = [ir.ArrayType(self.ir_type(dType), pc_runtime.MAX_THREADS) for op, dType in plan.reductions.values()]
+        ctx_ty = ir.LiteralStructType([ir.PointerType(dType) for name, dType in fields] + partials)
+
+        worker_ty = ir.FunctionType(ir.VoidType(), [pc_runtime.PTR, ir.IntType(32), ir.IntType(32), ir.IntType(32)])
+        worker = ir.Function(self.module, worker_ty, name=self.scope.name + ".par" + str(len(self.module.functions)))
+        worker.linkage = "internal"
+
+        for arg, name in zip(worker.args, ("par.ctx", "par.lo", "par.hi", "par.thread")):
+            arg.name = name
+
+        raw_ctx, lo, hi, thread = worker.args
+
+        outer_scope = self.scope
+        self.scope = worker
+
+        builder = self.function_body(worker)
+        ctx = builder.bitcast(raw_ctx, ctx_ty.as_pointer())
+
+        for index, (name, dType) in enumerate(fields):
+            field = builder.gep(ctx, [ir.IntType(32)(0), ir.IntType(32)(index)], inbounds=True)
+            builder.load(field, name=name)
+            self.variables[(name, worker)] = 0
+
+        counter = self.entry_alloca(ir.IntType(32), name=plan.var)
+        builder.store(lo, counter)
+        self.variables[(plan.var, worker)] = 0
+
+        for name, (op, dType) in plan.reductions.items():
+            var = self.entry_alloca(self.ir_type(dType), name=name)
+            builder.store(self.ir_type(dType)(0 if op == '+' else 1), var)
+            self.variables[(name, worker)] = 0
+
+        with pc_runtime.for_range(builder, lo, hi, name="par.loop") as i:
+            builder.store(i, counter)
+
+            for statement in plan.body:
+                builder = self.codegen(statement, builder)
+
+        for index, (name, (op, dType)) in enumerate(plan.reductions.items(), len(fields)):
+            part = builder.gep(ctx, [ir.IntType(32)(0), ir.IntType(32)(index), thread], inbounds=True)
+            builder.store(builder.load(ir.PointerType(self.ir_type(dType))('%"' + name + '"')), part)
+
+        builder.ret_void()
+
+        self.scope = outer_scope
+
+        return worker, ctx_ty, fields
+
+    def function_attributes(self, func):
+        '''
+        Tells LLVM what the purity analysis proved about a subroutine, so
+        that calls to it can be combined, hoisted out of loops or deleted
+        '''
+
+        func.attributes.add('nounwind')
+
+        # a subroutine that can stop the program with an error has an
+        # effect even when it reads nothing but its arguments
+        effect = pc_analysis.IMPURE if func.name in self.exiting else self.effects.get(func.name)
+
+        if effect == pc_analysis.PURE:
+            func.attributes.add('readnone')
+
+        elif effect == pc_analysis.READONLY:
+            func.attributes.add('readonly')
+
+        if func.name not in self.recursive:
+            func.attributes.add('norecurse')
+
+    def reference_param(self, decl, arg, pointer, length, builder):
+        '''
+        Sets up an array or string passed by reference, as a pointer to its
+        first element and its length. An array the analysis shows does not
+        share its elements with another array parameter is marked noalias.
+        A string is only ever read.
+        '''
+
+        name, dType, array = arg
+        long = ir.IntType(64)
+
+        if not array or name in self.noalias[decl.name]:
+            pointer.attributes.add('noalias')
+
+        self.variables[(name, self.scope)] = dType
+
+        if array:
+            pointer.name = name
+            length.name = name + ".len_arg"
+
+            self.variables[(name + ".len", self.scope)] = 0
+            builder.store(length, self.entry_alloca(long, name=name + ".len"))
+
+            return
+
+        pointer.name = name + ".data_arg"
+        length.name = name + ".len_arg"
+
+        string = pc_runtime.STRING(ir.Undefined)
+        string = builder.insert_value(string, pointer, 0)
+        string = builder.insert_value(string, length, 1)
+        string = builder.insert_value(string, long(0), 2)
+
+        builder.store(string, self.entry_alloca(pc_runtime.STRING, name=name))
+
+    def memo_lookup(self, node, builder):
+        '''
+        Emits the memo table check at the start of a MEMO subroutine and
+        returns the memoized result on a hit. Calls with a single INT
+        argument in [0, MEMO_DIRECT_SIZE) use a directly indexed table, and
+        all other calls use an open-addressing hash table keyed on the
+        argument values.
+        '''
+
+        ret_type = self.ir_type(node.dType)
+        words = len(node.args)
+
+        key = self.entry_alloca(ir.ArrayType(ir.IntType(64), words), name="memo.key")
+
+        for i, (name, dType, array) in enumerate(node.args):
+            arg = builder.load(ir.PointerType(self.ir_type(dType))('%"' + name + '"'))
+            builder.store(self.memo_word(arg, dType, builder), builder.gep(key, [ir.IntType(32)(0), ir.IntType(32)(i)]))
+
+        key = builder.gep(key, [ir.IntType(32)(0), ir.IntType(32)(0)], name="memo.key_ptr")
+
+        table = ir.GlobalVariable(self.module, pc_runtime.MEMO_TABLE, node.name + ".memo")
+        table.linkage = "internal"
+        table.initializer = pc_runtime.MEMO_TABLE(None)
+
+        memo = {'table': table, 'key': key, 'words': words, 'dType': node.dType, 'direct': None}
+
+        if words == 1 and node.args[0][1] == int:
+            results = ir.GlobalVariable(self.module, ir.ArrayType(ret_type, MEMO_DIRECT_SIZE), node.name + ".memo.results")
+            results.linkage = "internal"
+            results.initializer = ir.ArrayType(ret_type, MEMO_DIRECT_SIZE)(None)
+
+            known = ir.GlobalVariable(self.module, ir.ArrayType(ir.IntType(8), MEMO_DIRECT_SIZE), node.name + ".memo.known")
+            known.linkage = "internal"
+            known.initializer = ir.ArrayType(ir.IntType(8), MEMO_DIRECT_SIZE)(None)
+
+            memo['direct'] = (results, known)
+
+            index = builder.load(key, name="memo.index")
+            direct = builder.icmp_unsigned('<', index, ir.IntType(64)(MEMO_DIRECT_SIZE), name="memo.direct")
+
+            with builder.if_else(direct) as (then, otherwise):
+
+                with then:
+                    flag = builder.load(builder.gep(known, [ir.IntType(32)(0), index]))
+
+                    with builder.if_then(builder.icmp_unsigned('!=', flag, ir.IntType(8)(0))):
+                        builder.ret(builder.load(builder.gep(results, [ir.IntType(32)(0), index])))
+
+                with otherwise:
+                    self.memo_find(memo, builder)
+
+        else:
+            self.memo_find(memo, builder)
+
+        return memo
+
+    def memo_find(self, memo, builder):
+
+        found = builder.call(self.runtime.memo_find(), [memo['table'], memo['key'], ir.IntType(32)(memo['words'])], name="memo.found")
+
+        with builder.if_then(builder.icmp_unsigned('!=', found, found.type(None))):
+            res = builder.load(found)
+
+            if memo['dType'] == int:
+                res = builder.trunc(res, ir.IntType(32))
+            else:
+                res = builder.bitcast(res, ir.DoubleType())
+
+            builder.ret(res)
+
+    def memo_save(self, res, builder):
+        '''Records the result a MEMO subroutine is about to return'''
+
+        memo = self.memos[self.scope]
+
+        def save_hashed():
+            word = self.memo_word(res, memo['dType'], builder)
+            builder.call(self.runtime.memo_store(), [memo['table'], memo['key'], ir.IntType(32)(memo['words']), word])
+
+        if memo['direct']:
+            results, known = memo['direct']
+
+            index = builder.load(memo['key'], name="memo.index")
+            direct = builder.icmp_unsigned('<', index, ir.IntType(64)(MEMO_DIRECT_SIZE), name="memo.direct")
+
+            with builder.if_else(direct) as (then, otherwise):
+
+                with then:
+                    builder.store(res, builder.gep(results, [ir.IntType(32)(0), index]))
+                    builder.store(ir.IntType(8)(1), builder.gep(known, [ir.IntType(32)(0), index]))
+
+                with otherwise:
+                    save_hashed()
+
+        else:
+            save_hashed()
+
+    def memo_word(self, value, dType, builder):
+        '''Widens an INT or DOUBLE into the i64 word stored in memo tables'''
+
+        if dType == int:
+            return builder.sext(value, ir.IntType(64))
+
+        return builder.bitcast(value, ir.IntType(64))
+
+    def string_parts(self, node):
+        '''The strings a tree of string concatenations joins, from left to right'''
+
+        parts = []
+        pending = [node]
+
+        while pending:
+            part = pending.pop()
+
+            if isinstance(part, pc_ast.BinaryOp) and part.op == '+':
+                pending.extend([part.right, part.left])
+            else:
+                parts.append(part)
+
+        return parts
+
+    def string_value(self, node, builder):
+        '''
+        Returns the characters and length of a string expression. A
+        concatenation is built in a temporary that belongs to this
+        expression, so its buffer is reused every time the expression runs.
+        '''
+
+        if isinstance(node, pc_ast.Constant):
+            return self.codegen(node, builder), ir.IntType(64)(len(node.value.encode("utf8")))
+
+        if isinstance(node, pc_ast.Variable):
+            string = self.codegen(node, builder)
+
+        else:
+            string = self.string_temporary()
+            self.build_string(string, self.string_parts(node), builder)
+
+        data = builder.load(builder.gep(string, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=True))
+        length = builder.load(builder.gep(string, [ir.IntType(32)(0), ir.IntType(32)(1)], inbounds=True))
+
+        return data, length
+
+    def string_temporary(self):
+
+        string = self.entry_alloca(pc_runtime.STRING, name="str.tmp")
+        self.entry_store(pc_runtime.STRING(None), string)
+        self.local_strings.setdefault(self.scope, []).append(string)
+
+        return string
+
+    def build_string(self, string, parts, builder, append=False):
+        '''Stores the concatenation of parts in a string, or appends it'''
+
+        for part in parts:
+            data, length = self.string_value(part, builder)
+
+            if append:
+                builder.call(self.runtime.string_append(), [string, data, length])
+            else:
+                builder.call(self.runtime.string_assign(), [string, data, length])
+                append = True
+
+    def assign_string(self, lvalue, rvalue, builder):
+        '''
+        Assigns a string expression to a variable. s = s + t appends to s in
+        place. When s appears anywhere else on the right hand side, the
+        result is built in a temporary whose buffer is then swapped with s.
+        '''
+
+        if (lvalue.name, self.scope) not in self.variables:
+            self.variables[(lvalue.name, self.scope)] = 0
+            string = self.entry_alloca(pc_runtime.STRING, name=lvalue.name)
+            self.entry_store(pc_runtime.STRING(None), string)
+            self.local_strings.setdefault(self.scope, []).append(string)
+
+        string = self.codegen(lvalue, builder)
+        parts = self.string_parts(rvalue)
+
+        uses = [isinstance(part, pc_ast.Variable) and part.name == lvalue.name for part in parts]
+
+        if not any(uses[1:]):
+            if uses[0]:
+                self.build_string(string, parts[1:], builder, append=True)
+            else:
+                self.build_string(string, parts, builder)
+
+            return builder
+
+        temporary = self.string_temporary()
+        self.build_string(temporary, parts, builder)
+
+        old = builder.load(string)
+        builder.store(builder.load(temporary), string)
+        builder.store(old, temporary)
+
+        return builder
+
+    def output_string(self, node, stream, builder):
+        '''
+        Outputs a string. A tree of concatenations is output by writing each
+        of its strings in turn, rather than building the whole string.
+        '''
+
+        parts = self.string_parts(node)
+        end = ir.IntType(8)(ord("\n"))
+
+        for part in parts[:-1]:
+            builder.call(self.runtime.write_text(), [stream] + list(self.string_value(part, builder)))
+
+        builder.call(self.runtime.write_string(), [stream] + list(self.string_value(parts[-1], builder)) + [end])
+
+        return builder
+
+    def file_handle(self, name):
+
+        return pc_runtime.STREAM.as_pointer().as_pointer()('%"' + name + '"')
+
+    def stream(self, name, builder):
+        '''
+        The stream an INPUT or OUTPUT statement uses: stdin or stdout, or
+        the stream of a file, which stops the program if it is not open
+        '''
+
+        if name is None:
+            return None
+
+        stream = builder.load(self.file_handle(name), name=name + "_stream")
+
+        with builder.if_then(builder.icmp_unsigned('==', stream, stream.type(None)), likely=False):
+            builder.call(self.runtime.file_closed(), [self.runtime.cstring(builder, name, "pc.file." + name)])
+
+        return stream
+
+    def file_variable(self, name):
+        '''Declares the variable that holds the stream of a file, which starts out closed'''
+
+        handle_type = pc_runtime.STREAM.as_pointer()
+
+        if (name, self.scope) not in self.variables:
+            self.variables[(name, self.scope)] = 0
+
+            handle = self.entry_alloca(handle_type, name=name)
+            self.entry_store(handle_type(None), handle)
+
+    def open_file(self, node, builder):
+        '''
+        Opens a file for OPENFILE. A file that is still open under the same
+        name is closed first, so that what was written to it is not lost.
+        '''
+
+        self.file_variable(node.name)
+
+        handle = self.file_handle(node.name)
+        old = builder.load(handle)
+
+        with builder.if_then(builder.icmp_unsigned('!=', old, old.type(None))):
+            builder.call(self.runtime.close_file(), [old])
+
+        path, path_length = self.string_value(node.path, builder)
+        mode = ir.IntType(32)(pc_runtime.FILE_MODES[node.mode])
+
+        builder.store(builder.call(self.runtime.open_file(), [path, mode], name=node.name + "_stream"), handle)
+
+        return builder
+
+    def close_file(self, node, builder):
+        '''Closes a file for CLOSEFILE, writing out what is buffered for it'''
+
+        builder.call(self.runtime.close_file(), [self.stream(node.name, builder)])
+        builder.store(pc_runtime.STREAM.as_pointer()(None), self.file_handle(node.name))
+
+        return builder
+
+    def allocate(self, count, dType, builder, name):
+        '''Allocates a cache-line aligned array of count elements with the allocator chosen by --alloc'''
+
+        size = ir.IntType(64)(self.element_size(dType))
+
+        return builder.call(self.runtime.array_alloc(), [self.index(count, builder), size], name=name)
+
+    def index(self, value, builder):
+        '''Widens an array size or index to 64 bits'''
+
+        if value.type == ir.IntType(32):
+            return builder.sext(value, ir.IntType(64), name="idx")
+
+        return value
+
+    def alignment(self, ptr):
+        '''The natural alignment of the scalar a pointer points to'''
+
+        if ptr.type.pointee == ir.DoubleType():
+            return ELEMENT_SIZE[float]
+
+        if ptr.type.pointee == ir.IntType(32):
+            return ELEMENT_SIZE[int]
+
+        return None
+
+    def stack_array_count(self, node):
+        '''The number of elements of an array declaration small and constant enough to go on the stack'''
+
+        if node.path is not None:
+            return None
+
+        if node.dims:
+            sizes = [pc_analysis.constant_value(dim) for dim in node.dims]
+            count = None if None in sizes else math.prod(max(size, 0) for size in sizes)
+        else:
+            count = pc_analysis.constant_value(node.elements)
+
+        if count is None or count < 0 or count * self.element_size(node.dType) > STACK_ARRAY_LIMIT:
+            return None
+
+        return count
+
+    def stack_array(self, node, builder):
+        '''
+        Declares an array in the stack frame of the current function. Its
+        lifetime starts at the declaration and ends when the function
+        returns, or at the end of each iteration of a loop it is local to.
+        '''
+
+        count = self.stack_array_count(node)
+
+        storage = self.entry_alloca(ir.ArrayType(self.ir_type(node.dType), count), name=node.name + ".stack")
+        storage.align = STACK_ARRAY_ALIGN
+
+        self.stack_arrays.setdefault(self.scope, {})[node.name] = (storage, count * self.element_size(node.dType))
+        self.lifetime("llvm.lifetime.start.p0i8", self.stack_arrays[self.scope][node.name], builder)
+
+        builder.gep(storage, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=True, name=node.name)
+
+    def element_size(self, dType):
+        '''
+        The number of bytes an array element takes up. A record laid out
+        AOS is padded like a C struct, while laid out SOA each of its
+        fields goes in a column of its own, with nothing in between.
+        '''
+
+        if not isinstance(dType, pc_ast.Record_Decl):
+            return ELEMENT_SIZE[dType]
+
+        sizes = [ELEMENT_SIZE[field_type] for field, field_type in dType.fields]
+
+        if dType.layout == 'SOA':
+            return sum(sizes)
+
+        size = 0
+
+        for field_size in sizes:
+            size = -(-size // field_size) * field_size + field_size
+
+        return -(-size // max(sizes)) * max(sizes)
+
+    def record_columns(self, node, builder):
+        '''
+        Splits the storage of an array of records laid out SOA into a
+        column for each field, named after the array and the field. The
+        DOUBLE columns go first so that every column stays aligned.
+        '''
+
+        long = ir.IntType(64)
+
+        count = builder.load(ir.PointerType(long)('%"' + node.name + '.len"'), name=node.name + ".len_val")
+        storage = builder.bitcast(ir.PointerType(self.ir_type(node.dType))('%"' + node.name + '"'), pc_runtime.PTR)
+
+        offset = 0
+
+        for field, dType in sorted(node.dType.fields, key=lambda field: -ELEMENT_SIZE[field[1]]):
+            column = builder.gep(storage, [builder.mul(count, long(offset), flags=['nuw', 'nsw'])], inbounds=True)
+            builder.bitcast(column, ir.PointerType(self.ir_type(dType)), name=node.name + "." + field)
+
+            offset += ELEMENT_SIZE[dType]
+
+    def array_length(self, node, count, builder):
+        '''
+        Keeps the number of elements of an array, for whole-array
+        statements and --bounds-check. An array that has not been declared
+        yet has no elements.
+        '''
+
+        long = ir.IntType(64)
+
+        if (node.name + ".len", self.scope) not in self.variables:
+            self.variables[(node.name + ".len", self.scope)] = 0
+            self.entry_store(long(0), self.entry_alloca(long, name=node.name + ".len"))
+
+        count = self.index(count, builder)
+        count = builder.select(builder.icmp_signed('<', count, long(0)), long(0), count)
+
+        builder.store(count, ir.PointerType(long)('%"' + node.name + '.len"'))
+
+    def file_array(self, node, whole, builder):
+        '''
+        Declares an array whose elements are the contents of a file, which
+        is mapped into memory rather than read, so only the pages the
+        program touches are ever loaded. The runtime stores the number of
+        elements in the .len slot, which is all of the file when whole.
+        '''
+
+        long = ir.IntType(64)
+        length = ir.PointerType(long)('%"' + node.name + '.len"')
+
+        count = long(-1) if whole else builder.load(length, name=node.name + ".len_val")
+        path, path_length = self.string_value(node.path, builder)
+        advice = ir.IntType(32)(pc_runtime.MADVICE[node.advice])
+
+        raw = builder.call(self.runtime.map_file(), [path, count, long(self.element_size(node.dType)), advice, length], name=node.name + "_raw")
+        builder.bitcast(raw, ir.PointerType(self.ir_type(node.dType)), name=node.name)
+
+    def sync(self, node, builder):
+        '''Writes the elements of an array mapped from a file back to the file'''
+
+        long = ir.IntType(64)
+
+        data = builder.bitcast(self.array_pointer(node.name, node.dType, builder), pc_runtime.PTR)
+        length = builder.load(ir.PointerType(long)('%"' + node.name + '.len"'))
+        size = builder.mul(length, long(self.element_size(node.dType)))
+        name = self.runtime.cstring(builder, node.name, "pc.array." + node.name)
+
+        builder.call(self.runtime.sync(), [data, size, name])
+
+        return builder
+
+    def array_pointer(self, name, dType, builder):
+        '''
+        The first element of an array. An array declared without a size
+        can move when it grows, so its elements are found through its
+        header every time.
+        '''
+
+        if (name, self.scope) not in self.dynamic_arrays:
+            return ir.PointerType(self.ir_type(dType))('%"' + name + '"')
+
+        header = pc_runtime.DYNAMIC_ARRAY.as_pointer()('%"' + name + '.header"')
+        data = builder.load(builder.gep(header, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=True))
+
+        return builder.bitcast(data, ir.PointerType(self.ir_type(dType)), name=name + ".data")
+
+    def dynamic_array(self, node, builder):
+        '''
+        Declares an array without a size, which starts out empty. Its
+        header lives in the entry block, and its length is the .len slot
+        every array has, so bounds checks and whole-array statements work
+        on it unchanged. Declaring it again keeps the room it has grown.
+        '''
+
+        long = ir.IntType(64)
+
+        if (node.name, self.scope) not in self.dynamic_arrays:
+            self.dynamic_arrays.add((node.name, self.scope))
+            self.variables[(node.name + ".len", self.scope)] = 0
+
+            header = self.entry_alloca(pc_runtime.DYNAMIC_ARRAY, name=node.name + ".header")
+            self.entry_store(pc_runtime.DYNAMIC_ARRAY(None), header)
+
+            entry = self.scope.entry_basic_block
+            entry_builder = ir.IRBuilder(entry)
+            entry_builder.position_before(entry.terminator)
+            entry_builder.gep(header, [ir.IntType(32)(0), ir.IntType(32)(1)], inbounds=True, name=node.name + ".len")
+
+        builder.store(long(0), ir.PointerType(long)('%"' + node.name + '.len"'))
+
+        return builder
+
+    def append(self, node, builder):
+        '''
+        Adds an element to the end of an array declared without a size,
+        doubling its room first when it is full
+        '''
+
+        long = ir.IntType(64)
+
+        value = self.value(node.value, builder)
+
+        if node.dType == float and node.value.dType == int:
+            value = builder.sitofp(value, ir.DoubleType(), name="_casted")
+
+        header = pc_runtime.DYNAMIC_ARRAY.as_pointer()('%"' + node.name + '.header"')
+        length_ptr = ir.PointerType(long)('%"' + node.name + '.len"')
+
+        length = builder.load(length_ptr, name=node.name + ".len_val")
+        capacity = builder.load(builder.gep(header, [ir.IntType(32)(0), ir.IntType(32)(2)], inbounds=True))
+
+        with builder.if_then(builder.icmp_signed('==', length, capacity), likely=False):
+            builder.call(self.runtime.array_grow(), [header, long(ELEMENT_SIZE[node.dType])])
+
+        element = builder.gep(self.array_pointer(node.name, node.dType, builder), [length], inbounds=True, name="element")
+        builder.store(value, element, align=self.alignment(element))
+        builder.store(builder.add(length, long(1)), length_ptr)
+
+        return builder
+
+    def array_dims(self, node, builder):
+        '''
+        Works out the sizes of the dimensions of an array declaration once,
+        keeping those that are not constant for indexing, and returns the
+        number of elements as an i64. A negative size counts as 0.
+        '''
+
+        long = ir.IntType(64)
+        count = long(1)
+
+        for k, dim in enumerate(node.dims):
+            size = self.value(dim, builder)
+            size = builder.select(builder.icmp_signed('<', size, ir.IntType(32)(0)), ir.IntType(32)(0), size)
+
+            if pc_analysis.constant_value(dim) is None:
+                name = node.name + ".dim" + str(k)
+
+                if (name, self.scope) not in self.variables:
+                    self.variables[(name, self.scope)] = 0
+                    self.entry_alloca(ir.IntType(32), name=name)
+
+                builder.store(size, ir.PointerType(ir.IntType(32))('%"' + name + '"'))
+
+            count = builder.mul(count, builder.zext(size, long), name=node.name + ".count")
+
+        return count
+
+    def flat_index(self, node, checked, builder):
+        '''
+        The position of an element of an array with several dimensions,
+        row after row: ((i * d1) + j) * d2 + k for x[i, j, k]. It is
+        worked out in 64 bits without wrapping, which lets LLVM see that
+        neighbouring iterations of a loop over the last index touch
+        neighbouring elements. With checked, each index is checked
+        against the size of its own dimension.
+        '''
+
+        long = ir.IntType(64)
+        flat = None
+
+        for k, (index, dim) in enumerate(zip(node.indices, node.dims)):
+            index = builder.sext(self.value(index, builder), long, name="idx")
+            size = builder.zext(self.value(dim, builder), long, name=node.name + ".size")
+
+            if checked:
+                with builder.if_then(builder.icmp_unsigned('>=', index, size), likely=False):
+                    text = node.name + " along dimension " + str(k + 1)
+                    name = self.runtime.cstring(builder, text, "pc.array." + node.name + ".dim" + str(k))
+                    builder.call(self.runtime.bounds_error(), [name, index, size])
+
+            if flat is None:
+                flat = index
+            else:
+                flat = builder.mul(flat, size, name="flat", flags=['nsw', 'nuw'])
+                flat = builder.add(flat, index, name="flat", flags=['nsw'])
+
+        return flat
+
+    def contiguous_loop(self, node):
+        '''
+        Whether a FOR loop walks along the rows of an array with several
+        dimensions, indexing its last dimension with the counter, so that
+        LLVM should vectorize it. The loop must not contain other loops or
+        declarations, nor change its counter or the variables its bound
+        reads, since row_loop generates it twice.
+        '''
+
+        if not isinstance(node, pc_ast.For) or node.assignment.lvalue.dType != int or node.final.dType != int:
+            return False
+
+        counter = node.assignment.lvalue.name
+        assigned = set()
+        found = False
+
+        for statement in pc_analysis.walk(node.body):
+
+            if isinstance(statement, (pc_ast.While, pc_ast.For, pc_ast.Function_Decl, pc_ast.Array_Declaration, pc_ast.Map_Declaration)):
+                return False
+
+            if isinstance(statement, pc_ast.Assignment) and isinstance(statement.lvalue, pc_ast.Variable):
+                assigned.add(statement.lvalue.name)
+
+            elif isinstance(statement, pc_ast.Input) and isinstance(statement.variable, pc_ast.Variable):
+                assigned.add(statement.variable.name)
+
+            for expression in pc_analysis.statement_expressions(statement):
+                for child in pc_analysis.expressions(expression):
+                    if isinstance(child, pc_ast.Flat_Index):
+                        last = child.indices[-1]
+                        found = found or (isinstance(last, pc_ast.Variable) and last.name == counter)
+
+        if counter in assigned:
+            return False
+
+        assigned.add(counter)
+
+        for child in pc_analysis.expressions(node.final):
+            if not isinstance(child, (pc_ast.Constant, pc_ast.Variable, pc_ast.BinaryOp, pc_ast.UnaryOp)):
+                return False
+
+            if isinstance(child, pc_ast.Variable) and child.name in assigned:
+                return False
+
+        return found
+
+    def check_bounds(self, node, index, builder):
+        '''Stops the program when an index is outside its array'''
+
+        length = builder.load(ir.PointerType(ir.IntType(64))('%"' + node.name + '.len"'), name=node.name + ".len_val")
+        outside = builder.icmp_unsigned('>=', index, length, name="bounds.outside")
+
+        with builder.if_then(outside, likely=False):
+            name = self.runtime.cstring(builder, node.name, "pc.array." + node.name)
+            builder.call(self.runtime.bounds_error(), [name, index, length])
+
+    def lifetime(self, intrinsic, array, builder):
+        '''Marks the start or end of the lifetime of a (storage, size) stack array'''
+
+        storage, size = array
+        func = self.runtime.intrinsic(intrinsic, ir.VoidType(), [ir.IntType(64), pc_runtime.PTR])
+
+        builder.call(func, [ir.IntType(64)(size), builder.bitcast(storage, pc_runtime.PTR)])
+
+    def allocates(self, statements):
+        '''Whether a statement list declares heap arrays or stores strings'''
+
+        for statement in pc_analysis.walk(statements):
+
+            if isinstance(statement, pc_ast.Array_Declaration) and self.stack_array_count(statement) is None:
+                return True
+
+            if isinstance(statement, (pc_ast.Assignment, pc_ast.Input)) and statement.dType == str:
+                return True
+
+        return False
+
+    def array_references(self, statements):
+        '''Counts the declarations and element uses of each array in a statement list'''
+
+        counts = {}
+
+        for statement in pc_analysis.walk(statements):
+
+            if isinstance(statement, (pc_ast.Array_Declaration, pc_ast.Array_Assignment, pc_ast.Sort, pc_ast.Append, pc_ast.Sync)):
+                counts[statement.name] = counts.get(statement.name, 0) + 1
+
+            for expression in pc_analysis.statement_expressions(statement):
+                for node in pc_analysis.expressions(expression):
+                    if isinstance(node, (pc_ast.Array_Element, pc_ast.Array_Variable, pc_ast.Array_Length)):
+                        counts[node.name] = counts.get(node.name, 0) + 1
+
+                    elif isinstance(node, pc_ast.Array_Reduction):
+                        counts[node.array.name] = counts.get(node.array.name, 0) + 1
+
+        return counts
+
+    def loop_arrays(self, body):
+        '''
+        The declarations of the arrays a loop declares, if every one of
+        them is only used inside the loop, otherwise None
+        '''
+
+        declared = [statement for statement in pc_analysis.walk(body) if isinstance(statement, pc_ast.Array_Declaration)]
+
+        inside = self.array_references(body)
+        everywhere = self.array_references(self.statements)
+
+        if all(inside.get(decl.name) == everywhere.get(decl.name) for decl in declared):
+            return declared
+
+        return None
+
+    def arena_loop(self, body):
+        '''
+        Whether the arena can be released after every iteration of a loop:
+        the body declares heap arrays, every array it declares is only used
+        inside the loop and it does not build strings, whose buffers live
+        on between iterations. Joining strings builds a temporary, even as
+        a map key or a subroutine argument.
+        '''
+
+        if self.alloc != "arena":
+            return False
+
+        declared = self.loop_arrays(body)
+
+        if not declared or all(self.stack_array_count(decl) is not None for decl in declared):
+            return False
+
+        for statement in pc_analysis.walk(body):
+            if isinstance(statement, (pc_ast.Assignment, pc_ast.Input)) and statement.dType == str:
+                return False
+
+            for expression in pc_analysis.statement_expressions(statement):
+                for node in pc_analysis.expressions(expression):
+                    if node.dType == str and not isinstance(node, (pc_ast.Constant, pc_ast.Variable)):
+                        return False
+
+        return True
+
+    def end_loop_arrays(self, body, builder):
+        '''Ends the lifetime of the stack arrays local to a loop body at the end of an iteration'''
+
+        stack = self.stack_arrays.get(self.scope, {})
+
+        for decl in self.loop_arrays(body) or []:
+            if decl.name in stack and self.stack_array_count(decl) is not None:
+                self.lifetime("llvm.lifetime.end.p0i8", stack[decl.name], builder)
+
+    def release_activation(self, builder):
+        '''Frees everything the current subroutine call allocated, before it returns'''
+
+        if self.scope in self.arena_marks:
+            builder.call(self.runtime.arena_release(), [self.arena_marks[self.scope]])
+
+        for name in self.file_handles.get(self.scope, []):
+            stream = builder.load(self.file_handle(name))
+
+            with builder.if_then(builder.icmp_unsigned('!=', stream, stream.type(None))):
+                builder.call(self.runtime.close_file(), [stream])
+
+        if self.scope != self.main:
+            for array in self.stack_arrays.get(self.scope, {}).values():
+                self.lifetime("llvm.lifetime.end.p0i8", array, builder)
+
+    def free_strings(self, func):
+        '''
+        Frees the buffers of the strings a subroutine built before each of
+        its returns. Strings it is given belong to the caller, and with the
+        arena allocator the arena releases them.
+        '''
+
+        if self.alloc == "arena":
+            return
+
+        for block in func.blocks:
+            if block.is_terminated and block.terminator.opname == "ret":
+                builder = ir.IRBuilder(block)
+                builder.position_before(block.terminator)
+
+                for string in self.local_strings.get(func, []):
+                    builder.call(self.runtime.string_free(), [string])
+
+    def frame_arguments(self, call):
+        '''Whether a call is given a stack array of the current subroutine by reference'''
+
+        stack = self.stack_arrays.get(self.scope, {})
+
+        return any(array and arg.name in stack for arg, (name, dType, array) in zip(call.args, self.params[call.name]))
+
+    def mark_tail_calls(self, func):
+        '''
+        Marks the calls a subroutine returns the result of as tail calls,
+        unless releasing its activation left something to run between the
+        call and the return
+        '''
+
+        for call in self.tail_calls.get(func, []):
+            instructions = call.parent.instructions
+
+            if len(instructions) >= 2 and instructions[-2] is call and instructions[-1].opname == "ret":
+                call.tail = "musttail" if call.callee.function_type == func.function_type else "tail"
+
+    def vectorize_metadata(self):
+        '''A new llvm.loop node that asks LLVM to vectorize the loop it is attached to'''
+
+        enable = self.module.add_metadata([ir.MetaDataString(self.module, "llvm.loop.vectorize.enable"), ir.IntType(1)(1)])
+
+        # every loop needs its own node, whose first operand is the node
+        # itself, which add_metadata cannot build directly
+        loop = self.module.add_metadata([ir.MetaDataString(self.module, "pc.loop." + str(len(self.module.metadata))), enable])
+        loop.operands = (loop,) + loop.operands[1:]
+
+        return loop
+
+    def array_assignment(self, node, builder):
+        '''
+        Assigns an element-wise expression over whole arrays to an array in
+        a single loop, without temporary arrays. The loop covers the
+        elements that every array in the statement has. The parts of the
+        expression that do not involve arrays are worked out once, before
+        the loop.
+        '''
+
+        long = ir.IntType(64)
+
+        names = [node.name]
+
+        for child in pc_analysis.expressions(node.rvalue):
+            if isinstance(child, pc_ast.Array_Variable) and child.name not in names:
+                names.append(child.name)
+
+        count = None
+
+        for name in names:
+            length = builder.load(ir.PointerType(long)('%"' + name + '.len"'), name=name + ".len_val")
+            count = length if count is None else builder.select(builder.icmp_unsigned('<', length, count), length, count)
+
+        scalars = {}
+        self.scalar_parts(node.rvalue, scalars, builder)
+
+        target = self.array_pointer(node.name, node.dType, builder)
+
+        with pc_runtime.for_range(builder, long(0), count, name="array", metadata=self.vectorize_metadata()) as i:
+            value = self.element_value(node.rvalue, i, scalars, builder)
+
+            if node.dType == float and node.rvalue.dType == int:
+                value = builder.sitofp(value, ir.DoubleType(), name="_casted")
+
+            element = builder.gep(target, [i], inbounds=True, name="element")
+            builder.store(value, element, align=self.alignment(element))
+
+        return builder
+
+    def scalar_parts(self, node, scalars, builder):
+        '''Generates the largest parts of a whole-array expression that do not involve arrays'''
+
+        if not any(isinstance(child, pc_ast.Array_Variable) for child in pc_analysis.expressions(node)):
+            scalars[node] = self.value(node, builder)
+
+        elif isinstance(node, pc_ast.BinaryOp):
+            self.scalar_parts(node.left, scalars, builder)
+            self.scalar_parts(node.right, scalars, builder)
+
+        elif isinstance(node, pc_ast.UnaryOp):
+            self.scalar_parts(node.right, scalars, builder)
+
+        elif isinstance(node, pc_ast.Math_Function):
+            for arg in node.args:
+                self.scalar_parts(arg, scalars, builder)
+
+    def element_value(self, node, index, scalars, builder):
+        '''Generates one element of a whole-array expression'''
+
+        if node in scalars:
+            return scalars[node]
+
+        if isinstance(node, pc_ast.Array_Variable):
+            array = self.array_pointer(node.name, node.dType, builder)
+            element = builder.gep(array, [index], inbounds=True, name="element")
+
+            return builder.load(element, name=node.name + "_val", align=self.alignment(element))
+
+        if isinstance(node, pc_ast.UnaryOp):
+            rvalue = self.element_value(node.right, index, scalars, builder)
+
+            return builder.neg(rvalue) if node.right.dType == int else builder.fsub(ir.DoubleType()(0), rvalue)
+
+        if isinstance(node, pc_ast.Math_Function):
+            return self.math_function(node, [self.element_value(arg, index, scalars, builder) for arg in node.args], builder)
+
+        lvalue = self.element_value(node.left, index, scalars, builder)
+        rvalue = self.element_value(node.right, index, scalars, builder)
+
+        return self.arithmetic(node, lvalue, rvalue, builder)
+
+    def array_reduction(self, node, builder):
+        '''
+        Generates SUM, MIN, MAX, ARGMIN or COUNT over the first elements of
+        an array. The main loop works on vectors of REDUCTION_WIDTH
+        elements and keeps REDUCTION_ACCUMULATORS of them, so that no
+        iteration waits on the result of the one before it. The
+        accumulators are combined after the loop and the last few elements
+        are added one at a time. ARGMIN finds the minimum this way and
+        then the first index that holds it.
+        '''
+
+        long = ir.IntType(64)
+        array = node.array
+
+        count = self.element_count(array.name, node.count, builder)
+        value = None
+
+        if node.value is not None:
+            value = self.value(node.value, builder)
+
+            if array.dType == float and node.value.dType == int:
+                value = builder.sitofp(value, ir.DoubleType(), name="_casted")
+
+        op = 'MIN' if node.op == 'ARGMIN' else node.op
+        dType = int if op == 'COUNT' else array.dType
+
+        if op == 'SUM' or op == 'COUNT':
+            start = self.ir_type(dType)(0)
+        elif dType == int:
+            start = ir.IntType(32)(INT_MAX if op == 'MIN' else INT_MIN)
+        else:
+            start = ir.DoubleType()(float('inf') if op == 'MIN' else float('-inf'))
+
+        pointer = self.array_pointer(array.name, array.dType, builder)
+        vector = ir.Constant(ir.VectorType(start.type, REDUCTION_WIDTH), [start] * REDUCTION_WIDTH)
+
+        step = REDUCTION_WIDTH * REDUCTION_ACCUMULATORS
+        blocks = builder.and_(count, long(-step), name="reduce.blocks")
+
+        lanes = self.reduction_loop(op, dType, pointer, value, long(0), blocks, [vector] * REDUCTION_ACCUMULATORS, builder)
+
+        while len(lanes) > 1:
+            lanes = [self.combine(op, dType, lanes[i], lanes[i + 1], builder) for i in range(0, len(lanes), 2)]
+
+        lanes = [builder.extract_element(lanes[0], ir.IntType(32)(i)) for i in range(REDUCTION_WIDTH)]
+
+        while len(lanes) > 1:
+            lanes = [self.combine(op, dType, lanes[i], lanes[i + 1], builder) for i in range(0, len(lanes), 2)]
+
+        result, = self.reduction_loop(op, dType, pointer, value, blocks, count, lanes, builder)
+
+        if node.op == 'ARGMIN':
+            result = self.first_index(pointer, result, count, builder)
+
+        return result
+
+    def output_array(self, node, stream, builder):
+        '''Writes the leading elements of an array with a single runtime call'''
+
+        name = node.data.name
+
+        array = self.array_pointer(name, node.data.dType, builder)
+        count = self.element_count(name, node.count, builder)
+        separator, size = self.string_value(node.separator, builder)
+
+        write = self.runtime.write_array(self.ir_type(node.data.dType))
+        builder.call(write, [stream, array, count, separator, size])
+
+        return builder
+
+    def input_array(self, node, stream, builder):
+        '''Reads the leading elements of an array with a single runtime call'''
+
+        name = node.variable.name
+
+        array = self.array_pointer(name, node.dType, builder)
+        count = self.element_count(name, node.count, builder)
+
+        builder.call(self.runtime.read_array(self.ir_type(node.dType)), [stream, array, count], name="scan")
+
+        return builder
+
+    def element_count(self, name, node, builder):
+        '''
+        Generates the number of leading elements of an array that SORT, a
+        reduction or an INPUT or OUTPUT of the array works on, as an i64.
+        A negative number means none, and with --bounds-check a number
+        larger than the array stops the program.
+        '''
+
+        long = ir.IntType(64)
+
+        count = builder.sext(self.value(node, builder), long, name="count")
+        count = builder.select(builder.icmp_signed('<', count, long(0)), long(0), count)
+
+        if self.bounds_check:
+            length = builder.load(ir.PointerType(long)('%"' + name + '.len"'), name=name + ".len_val")
+
+            with builder.if_then(builder.icmp_signed('>', count, length), likely=False):
+                text = self.runtime.cstring(builder, name, "pc.array." + name)
+                builder.call(self.runtime.bounds_error(), [text, builder.sub(count, long(1)), length])
+
+        return count
+
+    def reduction_loop(self, op, dType, pointer, value, start, stop, accumulators, builder):
+        '''
+        Emits a loop over the elements from start up to stop that adds the
+        next elements into each of the accumulators in turn, one element
+        for a scalar and a whole vector for a vector. It returns the
+        accumulators after the loop. The number of elements the
+        accumulators take together must divide stop - start.
+        '''
+
+        long = ir.IntType(64)
+
+        widths = [accumulator.type.count if isinstance(accumulator.type, ir.VectorType) else 1 for accumulator in accumulators]
+
+        if value is not None and widths[0] > 1:
+            splat = ir.Constant(ir.VectorType(value.type, widths[0]), ir.Undefined)
+
+            for i in range(widths[0]):
+                splat = builder.insert_element(splat, value, ir.IntType(32)(i))
+
+            value = splat
+
+        preheader = builder.block
+        cond = builder.append_basic_block(name="reduce.cond")
+        body = builder.append_basic_block(name="reduce.body")
+        end = builder.append_basic_block(name="reduce.end")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+
+        index = builder.phi(long, name="reduce.i")
+        index.add_incoming(start, preheader)
+
+        lanes = []
+
+        for accumulator in accumulators:
+            lane = builder.phi(accumulator.type, name="reduce.acc")
+            lane.add_incoming(accumulator, preheader)
+            lanes.append(lane)
+
+        builder.cbranch(builder.icmp_signed('<', index, stop), body, end)
+        builder.position_at_end(body)
+
+        offset = 0
+
+        for lane, width in zip(lanes, widths):
+            element = builder.gep(pointer, [builder.add(index, long(offset))], inbounds=True, name="element")
+            alignment = self.alignment(element)
+
+            if width > 1:
+                element = builder.bitcast(element, ir.PointerType(ir.VectorType(pointer.type.pointee, width)))
+
+            item = builder.load(element, name="reduce.item", align=alignment)
 
-__author__ = "Mugilan Ganesan"
-__email__ = "mugi.ganesan@gmail.com"
-__status__ = "Developer"
-__version__ = "1.0.0"
+            if op == 'COUNT':
+                equal = builder.icmp_signed('==', item, value) if pointer.type.pointee == ir.IntType(32) else builder.fcmp_ordered('==', item, value)
+                item = builder.zext(equal, lane.type)
 
+            lane.add_incoming(self.combine(op, dType, lane, item, builder), body)
+            offset += width
 
-class Generator:
-    
-    def __init__(self):
-        
-        self.variables = {}
-        self.functions = {}
-        self.constants = {}
-        self.scope     = ''
-    
-    def setup_std_funcs(self):
-
-        fmt_type = ir.ArrayType(ir.IntType(8),4)
-        fmt_double = "%lf\0"
-        c_fmt = ir.Constant(fmt_type, bytearray(fmt_double.encode("utf8")))
-        self.double_fmt = ir.GlobalVariable(self.module, c_fmt.type, "fmt_double")
-        self.double_fmt.global_constant = True
-        self.double_fmt.initializer = c_fmt
-
-        fmt_type = ir.ArrayType(ir.IntType(8),3)
-        fmt_string = "%s\0"
-        c_fmt = ir.Constant(fmt_type, bytearray(fmt_string.encode("utf8")))
-        self.string_fmt = ir.GlobalVariable(self.module, c_fmt.type, "fmt_string")
-        self.string_fmt.global_constant = True
-        self.string_fmt.initializer = c_fmt
-
-        fmt_type = ir.ArrayType(ir.IntType(8),3)
-        fmt_int= "%d\0"
-        c_fmt = ir.Constant(fmt_type, bytearray(fmt_int.encode("utf8")))
-        self.int_fmt = ir.GlobalVariable(self.module, c_fmt.type, "fmt_int")
-        self.int_fmt.global_constant = True
-        self.int_fmt.initializer = c_fmt
-          
-        fmt_type = ir.ArrayType(ir.IntType(8),2)
-        fmt_newline = "\n\0"
-        c_fmt = ir.Constant(fmt_type, bytearray(fmt_newline.encode("utf8")))
-        self.newline_fmt = ir.GlobalVariable(self.module, c_fmt.type, "fmt_newline")
-        self.newline_fmt.global_constant = True
-        self.newline_fmt.initializer = c_fmt
-
-        void_ptr_ty = ir.IntType(8).as_pointer()
-        printf_ty = ir.FunctionType(ir.IntType(32), [void_ptr_ty], var_arg=True)
-        self.printf = ir.Function(self.module, printf_ty, name="printf")
-
-        malloc_ty = ir.FunctionType(void_ptr_ty, [ir.IntType(32)])
-        self.malloc = ir.Function(self.module, malloc_ty, name="malloc")
-
-        memcpy_ty = ir.FunctionType(ir.VoidType(), [void_ptr_ty, void_ptr_ty, ir.IntType(32)])
-        self.memcpy = ir.Function(self.module, memcpy_ty, name="memcpy")
-            
-        scanf_ty = ir.FunctionType(ir.IntType(32), [void_ptr_ty], var_arg=True)
-        self.scanf = ir.Function(self.module, scanf_ty, name="scanf")
+        index.add_incoming(builder.add(index, long(offset)), body)
+        builder.branch(cond)
 
-        realloc_ty = ir.FunctionType(ir.VoidType(), [void_ptr_ty, ir.IntType(32)])
-        self.realloc = ir.Function(self.module, realloc_ty, name="realloc")
-        
-    def generate(self, ast=[[]], output="output.ll"):
-        
-        self.variables = {}
-        self.constants = {}
-        self.functions = {}
-        self.scope     = ''
+        builder.position_at_end(end)
 
-        self.module = ir.Module(name=output)
+        return lanes
 
-        triple =  binding.get_default_triple()
-        self.module.triple = "" # the default triple from llvmlite seems to not work on some devices.
+    def combine(self, op, dType, lvalue, rvalue, builder):
+        '''
+        Combines two partial results of a reduction, which are either both
+        scalars or both vectors. DOUBLE sums may be reassociated.
+        '''
 
-        self.setup_std_funcs()
+        if op == 'SUM' or op == 'COUNT':
 
-        main_ty = ir.FunctionType(ir.IntType(32), ())
-        self.main = ir.Function(self.module, main_ty, name="main")
-        
-        self.scope = self.main
+            if dType == int:
+                return builder.add(lvalue, rvalue, name="reduce.sum")
 
-        main_block = self.scope.append_basic_block(name="entry")
-        builder = ir.IRBuilder(main_block)
+            res = builder.fadd(lvalue, rvalue, name="reduce.sum")
+            res.flags.append('reassoc')
 
-        for statement in ast[0]:
-            builder = self.codegen(statement,builder)
+            return res
 
-        builder.ret(ir.IntType(32)(0))
+        compare = '<' if op == 'MIN' else '>'
 
-        return self.module
+        if dType == int:
+            better = builder.icmp_signed(compare, rvalue, lvalue)
+        else:
+            better = builder.fcmp_ordered(compare, rvalue, lvalue)
+
+        return builder.select(better, rvalue, lvalue, name="reduce." + op.lower())
+
+    def first_index(self, pointer, value, count, builder):
+        '''The first index below count that holds value, or -1 if there is none'''
+
+        long = ir.IntType(64)
+
+        preheader = builder.block
+        cond = builder.append_basic_block(name="find.cond")
+        body = builder.append_basic_block(name="find.body")
+        end = builder.append_basic_block(name="find.end")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+
+        index = builder.phi(long, name="find.i")
+        index.add_incoming(long(0), preheader)
+        builder.cbranch(builder.icmp_signed('<', index, count), body, end)
+
+        builder.position_at_end(body)
+
+        element = builder.gep(pointer, [index], inbounds=True, name="element")
+        item = builder.load(element, name="find.item", align=self.alignment(element))
+        found = builder.icmp_signed('==', item, value) if item.type == ir.IntType(32) else builder.fcmp_ordered('==', item, value)
+
+        index.add_incoming(builder.add(index, long(1)), body)
+        builder.cbranch(found, end, cond)
+
+        builder.position_at_end(end)
+
+        result = builder.phi(long, name="find.result")
+        result.add_incoming(long(-1), cond)
+        result.add_incoming(index, body)
+
+        return builder.trunc(result, ir.IntType(32), name="argmin")
+
+    def math_function(self, node, args, builder):
+        '''
+        Applies a math function to arguments that have already been
+        generated. Every function is an LLVM intrinsic that LLVM can
+        vectorize, except for INT powers: those to a constant power are
+        multiplied out and the rest call pc_pow_int.
+        '''
+
+        double = ir.DoubleType()
+        int32 = ir.IntType(32)
+
+        if node.dType == float:
+            args = [builder.sitofp(value, double, name="_casted") if arg.dType == int and node.op != 'POW' else value
+                    for arg, value in zip(node.args, args)]
+
+        if node.op in ('FLOOR', 'CEIL') and node.dType == int:
+            return args[0]
+
+        if node.op in MATH_INTRINSICS:
+            return builder.call(self.module.declare_intrinsic(MATH_INTRINSICS[node.op], [double]), args, name=node.op.lower())
+
+        if node.op == 'ABS' and node.dType == int:
+            func = self.runtime.intrinsic('llvm.abs.i32', int32, [int32, ir.IntType(1)])
+            return builder.call(func, [args[0], ir.IntType(1)(0)], name="abs")
+
+        if node.op == 'ABS':
+            return builder.call(self.module.declare_intrinsic('llvm.fabs', [double]), args, name="abs")
+
+        if node.op in ('MIN', 'MAX') and node.dType == int:
+            name = 'llvm.smin.i32' if node.op == 'MIN' else 'llvm.smax.i32'
+            return builder.call(self.runtime.intrinsic(name, int32, [int32, int32]), args, name=node.op.lower())
+
+        if node.op in ('MIN', 'MAX'):
+            name = 'llvm.minnum.f64' if node.op == 'MIN' else 'llvm.maxnum.f64'
+            return builder.call(self.runtime.intrinsic(name, double, [double, double]), args, name=node.op.lower())
+
+        base, exponent = args
+        base_type, exponent_type = node.args[0].dType, node.args[1].dType
+        power = pc_analysis.constant_value(node.args[1])
+
+        if node.dType == int and power is not None and power >= 0:
+            return self.power(base, power, builder)
+
+        if node.dType == int:
+            return builder.call(self.runtime.pow_int(), [base, exponent], name="pow")
+
+        if base_type == int:
+            base = builder.sitofp(base, double, name="_casted")
+
+        if exponent_type == int:
+            func = self.runtime.intrinsic('llvm.powi.f64.i32', double, [double, int32])
+            return builder.call(func, [base, exponent], name="pow")
+
+        return builder.call(self.module.declare_intrinsic('llvm.pow', [double]), [base, exponent], name="pow")
+
+    def power(self, base, power, builder):
+        '''Multiplies out an INT to a constant power by repeated squaring'''
+
+        result = None
+
+        while power:
+            if power & 1:
+                result = base if result is None else builder.mul(result, base, name="pow")
+
+            power >>= 1
+
+            if power:
+                base = builder.mul(base, base, name="pow")
+
+        return ir.IntType(32)(1) if result is None else result
+
+    def arithmetic(self, node, lvalue, rvalue, builder):
+        '''Applies an arithmetic or comparison BinaryOp to values that have already been generated'''
+
+        l, r = node.children()
+
+        cmp_op = {">","<","!=",">=",'<=',"=="}
+
+        if l.dType == float and r.dType == int:
+            rvalue = builder.sitofp(rvalue, ir.DoubleType(), name="_casted")
+
+        elif l.dType == int and r.dType == float:
+            lvalue = builder.sitofp(lvalue, ir.DoubleType(), name="_casted")
+
+        if node.op == '+':
+
+            if node.dType == float:
+                res = builder.fadd(lvalue, rvalue, name="t")
+
+            elif node.dType == int:
+                res = builder.add(lvalue, rvalue, name="t", flags=['nsw'] if node in self.no_wrap else [])
+
+        elif node.op == '-':
+            if node.dType == float:
+                res = builder.fsub(lvalue, rvalue, name="t")
+
+            elif node.dType == int:
+                res = builder.sub(lvalue, rvalue, name="t")
+
+        elif node.op == '*':
+            if node.dType == float:
+                res = builder.fmul(lvalue, rvalue, name="t")
+
+            elif node.dType == int:
+                res = builder.mul(lvalue, rvalue, name="t")
+
+        elif node.op == '/':
+            if node.dType == float:
+                res = builder.fdiv(lvalue, rvalue, name="t")
+
+            elif node.dType == int:
+                res = builder.sdiv(lvalue, rvalue, name="t")
+
+        elif node.op == '%':
+            if node.dType == float:
+                res = builder.frem(lvalue, rvalue, name="t")
+
+            elif node.dType == int:
+                res = builder.srem(lvalue, rvalue, name="t")
+
+        elif node.op in cmp_op:
+
+            if node.dType == float:
+                res = builder.fcmp_unordered(node.op, lvalue, rvalue, name="t")
+
+            elif node.dType == int:
+                res = builder.icmp_signed(node.op, lvalue, rvalue, name="t")
+
+        return res
+
+    def map_pointer(self, name):
+
+        return pc_runtime.MAP.as_pointer()('%"' + name + '"')
+
+    def map_key(self, node, builder):
+        '''Generates the key of a map element, hashing a STRING key'''
+
+        if node.key_type == int:
+            return "int", self.value(node.key, builder)
+
+        data, length = self.string_value(node.key, builder)
+
+        return "string", builder.call(self.runtime.map_string_key(), [data, length], name="key")
+
+    def map_slot(self, node, builder):
+        '''The slot of a map that holds a key, or -1 if the key is missing'''
+
+        kind, key = self.map_key(node, builder)
+
+        return builder.call(self.runtime.map_find(kind), [self.map_pointer(node.name), key], name="slot")
+
+    def map_cell(self, name, slot, dType, builder):
+        '''Points at the value in a slot of a map, as an INT or a DOUBLE'''
+
+        values = builder.load(builder.gep(self.map_pointer(name), [ir.IntType(32)(0), ir.IntType(32)(2)], inbounds=True))
+
+        return builder.bitcast(builder.gep(values, [slot], inbounds=True), self.ir_type(dType).as_pointer())
+
+    def map_lookup(self, node, builder):
+        '''Generates the value of a key in a map, which is 0 if the key is missing'''
+
+        slot = self.map_slot(node, builder)
+        start = builder.block
+
+        with builder.if_then(builder.icmp_signed('>=', slot, ir.IntType(64)(0))) as then:
+            value = builder.load(self.map_cell(node.name, slot, node.dType, builder))
+            found = builder.block
+
+        result = builder.phi(self.ir_type(node.dType), name=node.name + "_val")
+        result.add_incoming(value, found)
+        result.add_incoming(self.ir_type(node.dType)(0), start)
+
+        return result
+
+    def map_assignment(self, node, builder):
+        '''Stores a value under a key, adding the key if it is missing'''
+
+        value = self.value(node.rvalue, builder)
+
+        if node.dType == float and node.rvalue.dType == int:
+            value = builder.sitofp(value, ir.DoubleType(), name="_casted")
+
+        kind, key = self.map_key(node.element, builder)
+        slot = builder.call(self.runtime.map_insert(kind), [self.map_pointer(node.element.name), key], name="slot")
+
+        builder.store(value, self.map_cell(node.element.name, slot, node.dType, builder))
+
+        return builder
+
+    def ir_type(self, dType):
+
+        if dType == int:
+            return ir.IntType(32)
+
+        elif dType == float:
+            return ir.DoubleType()
+
+        elif isinstance(dType, pc_ast.Record_Decl):
+            return ir.LiteralStructType([self.ir_type(field_type) for field, field_type in dType.fields], packed=dType.layout == 'SOA')
+
+    def reduce(self, op, dType, lvalue, rvalue, builder):
+
+        if op == '+':
+            return builder.add(lvalue, rvalue) if dType == int else builder.fadd(lvalue, rvalue)
+
+        elif op == '*':
+            return builder.mul(lvalue, rvalue) if dType == int else builder.fmul(lvalue, rvalue)
 
     def codegen(self, node, builder):
 
@@ -139,7 +1826,7 @@ class Generator:
                 ptr_type = ir.PointerType(ir.IntType(32), addrspace=0)
 
             elif node.dType == str:
-                ptr_type = ir.PointerType(ir.IntType(8), addrspace=0)
+                ptr_type = pc_runtime.STRING.as_pointer()
 
             return ptr_type('%"'+node.name+'"')
 
@@ -147,27 +1834,90 @@ class Generator:
 
             self.variables[(node.name, self.scope)] = node.dType
 
+            if node.elements is None and node.path is None:
+                return self.dynamic_array(node, builder)
+
             r = node.elements
 
-            if isinstance(r, pc_ast.Variable) or isinstance(r, pc_ast.Array_Element):
+            # mapped from a file, an array without a size is as long as the file
+            if r is None:
+                rvalue = ir.IntType(64)(-1)
+
+            elif node.dims:
+                rvalue = self.array_dims(node, builder)
+
+            elif isinstance(r, pc_ast.Variable) or isinstance(r, pc_ast.Array_Element):
                 rvalue = self.codegen(r, builder)
 
                 if r.dType == float or r.dType == int:
-                    rvalue = builder.load(rvalue,name=r.name + "_val",align=None)
+                    rvalue = builder.load(rvalue, name=r.name + "_val", align=self.alignment(rvalue))
 
             else:
                 rvalue = self.codegen(r, builder)
 
-            if node.dType == int:
-                raw = builder.call(self.malloc, [rvalue], name=node.name+"_raw")
-                builder.bitcast(raw, ir.PointerType(ir.IntType(32), addrspace=0), name=node.name)
+            self.array_length(node, rvalue, builder)
 
-            elif node.dType == float:
-                raw = builder.call(self.malloc, [rvalue], name=node.name+"_raw")
-                builder.bitcast(raw, ir.PointerType(ir.DoubleType(), addrspace=0), name=node.name)
+            if node.path is not None:
+                self.file_array(node, r is None, builder)
+
+            elif self.stack_array_count(node) is not None:
+                self.stack_array(node, builder)
+
+            else:
+                raw = self.allocate(rvalue, node.dType, builder, name=node.name+"_raw")
+                builder.bitcast(raw, ir.PointerType(self.ir_type(node.dType), addrspace=0), name=node.name)
+
+            if isinstance(node.dType, pc_ast.Record_Decl) and node.dType.layout == 'SOA':
+                self.record_columns(node, builder)
+
+            return builder
+
+        elif isinstance(node, pc_ast.Record_Decl):
+
+            return builder
+
+        elif isinstance(node, pc_ast.Map_Declaration):
+
+            if (node.name, self.scope) not in self.variables:
+                self.variables[(node.name, self.scope)] = node.dType
+                self.entry_alloca(pc_runtime.MAP, name=node.name)
+
+            builder.store(pc_runtime.MAP(None), self.map_pointer(node.name))
 
             return builder
 
+        elif isinstance(node, pc_ast.Map_Element):
+
+            return self.map_lookup(node, builder)
+
+        elif isinstance(node, pc_ast.Map_Assignment):
+
+            return self.map_assignment(node, builder)
+
+        elif isinstance(node, pc_ast.Map_Contains):
+
+            return builder.icmp_signed('>=', self.map_slot(node, builder), ir.IntType(64)(0), name="t")
+
+        elif isinstance(node, pc_ast.Open_File):
+
+            return self.open_file(node, builder)
+
+        elif isinstance(node, pc_ast.Close_File):
+
+            return self.close_file(node, builder)
+
+        elif isinstance(node, pc_ast.End_Of_File):
+
+            ended = builder.call(self.runtime.at_end(), [self.stream(node.name, builder)])
+
+            return builder.zext(ended, ir.IntType(32), name=node.name + "_eof")
+
+        elif isinstance(node, pc_ast.Map_Size):
+
+            count = builder.load(builder.gep(self.map_pointer(node.name), [ir.IntType(32)(0), ir.IntType(32)(3)], inbounds=True))
+
+            return builder.trunc(count, ir.IntType(32), name=node.name + "_size")
+
         elif isinstance(node, pc_ast.Array_Element):
 
             if node.dType == int:
@@ -175,27 +1925,71 @@ class Generator:
             elif node.dType == float:
                 ptr_type = ir.PointerType(ir.DoubleType(), addrspace=0)
 
-            index = self.codegen(node.index, builder)
+            checked = self.bounds_check and node not in self.proven and node not in self.unchecked
+
+            if isinstance(node.index, pc_ast.Flat_Index):
+                index = self.flat_index(node.index, checked, builder)
+
+            else:
+                index = self.codegen(node.index, builder)
+
+                if isinstance(node.index, pc_ast.Variable) or isinstance(node.index, pc_ast.Array_Element):
+                    index = builder.load(index, name="_val", align=self.alignment(index))
 
-            if isinstance(node.index, pc_ast.Variable) or isinstance(node.index, pc_ast.Array_Element):
-                index = builder.load(index,name="_val",align=None)
+                index = self.index(index, builder)
 
-            arr = ptr_type('%"'+node.name+'"')
-            index_ptr = builder.gep(arr, [index], name="element")
+                if checked:
+                    self.check_bounds(node, index, builder)
+
+            # a field of a record laid out SOA is an element of its column,
+            # and laid out AOS it is a member of the record at the index
+            if node.record is None:
+                arr = self.array_pointer(node.name, node.dType, builder)
+                index_ptr = builder.gep(arr, [index], inbounds=True, name="element")
+
+            elif node.record.layout == 'SOA':
+                column = ir.PointerType(self.ir_type(node.dType))('%"' + node.name + "." + node.field + '"')
+                index_ptr = builder.gep(column, [index], inbounds=True, name="element")
+
+            else:
+                fields = [field for field, dType in node.record.fields]
+                records = ir.PointerType(self.ir_type(node.record))('%"' + node.name + '"')
+                index_ptr = builder.gep(records, [index, ir.IntType(32)(fields.index(node.field))], inbounds=True, name="element")
 
             return index_ptr
 
+        elif isinstance(node, pc_ast.Array_Assignment):
+
+            return self.array_assignment(node, builder)
+
+        elif isinstance(node, pc_ast.Append):
+
+            return self.append(node, builder)
+
+        elif isinstance(node, pc_ast.Sync):
+
+            return self.sync(node, builder)
+
+        elif isinstance(node, pc_ast.Array_Length):
+
+            length = builder.load(ir.PointerType(ir.IntType(64))('%"' + node.name + '.len"'), name=node.name + ".len_val")
+
+            return builder.trunc(length, ir.IntType(32), name=node.name + "_length")
+
         elif isinstance(node, pc_ast.Assignment):
 
             l, r = node.children()
 
+            if node.dType == str:
+                return self.assign_string(l, r, builder)
+
             lvalue = self.codegen(l, builder)
 
             if isinstance(r, pc_ast.Variable) or isinstance(r, pc_ast.Array_Element):
                 rvalue = self.codegen(r, builder)
 
                 if r.dType == float or r.dType == int:
-                    rvalue = builder.load(rvalue,name=r.name + "_val",align=None)
+                    rvalue = builder.load(rvalue, name=r.name + "_val", align=self.alignment(rvalue))
 
             else:
                 rvalue = self.codegen(r, builder)
@@ -203,39 +1997,28 @@ class Generator:
             if node.dType == float:
                 if (l.name, self.scope) not in self.variables:
                     self.variables[(l.name, self.scope)] = 0
-                    builder.alloca(ir.DoubleType(),size=None,name=l.name)
+                    self.entry_alloca(ir.DoubleType(), name=l.name)
 
-                builder.store(rvalue,lvalue,align=None)
+                if rvalue.type == ir.IntType(32):
+                    rvalue = builder.sitofp(rvalue, ir.DoubleType())
+
+                builder.store(rvalue, lvalue, align=self.alignment(lvalue))
 
             elif node.dType == int:
                 if (l.name, self.scope) not in self.variables:
                     self.variables[(l.name, self.scope)] = 0
-                    builder.alloca(ir.IntType(32),size=None,name=l.name)
-
-                builder.store(rvalue,lvalue,align=None)
+                    self.entry_alloca(ir.IntType(32), name=l.name)
 
-            elif node.dType == str:
-                if (l.name, self.scope) in self.variables:
-                    if self.variables[(l.name, self.scope)] != l.length:
-                        builder.call(self.realloc, [lvalue, ir.IntType(32)(l.length)])
-                        self.variables[(l.name, self.scope)] = l.length
-
-                else:
-                    self.variables[(l.name, self.scope)] = l.length
-                    builder.call(self.malloc, [ir.IntType(32)(l.length)], name=l.name)
+                builder.store(rvalue, lvalue, align=self.alignment(lvalue))
 
-                if isinstance(r, pc_ast.Constant):
-                    temp = builder.bitcast(rvalue, ir.PointerType(ir.IntType(8), addrspace=0), name="temp")
-                else:
-                    temp = rvalue
-
-                builder.call(self.memcpy, [lvalue, temp, ir.IntType(32)(l.length)])
 
             return builder
 
         elif isinstance(node, pc_ast.BinaryOp):
 
-            cmp_op = {">","<","!=",">=",'<=',"=="}
+            if node.dType == str:
+                data, length = self.string_value(node, builder)
+                return data
 
             l, r = node.children()
 
@@ -243,7 +2026,7 @@ class Generator:
                 lvalue = self.codegen(l, builder)
 
                 if l.dType == float or l.dType == int:
-                    lvalue = builder.load(lvalue,name=l.name + "_val",align=None)
+                    lvalue = builder.load(lvalue, name=l.name + "_val", align=self.alignment(lvalue))
 
             else:
                 lvalue = self.codegen(l, builder)
@@ -252,69 +2035,12 @@ class Generator:
                 rvalue = self.codegen(r, builder)
 
                 if r.dType == float or r.dType == int:
-                    rvalue = builder.load(rvalue,name=r.name + "_val",align=None)
+                    rvalue = builder.load(rvalue, name=r.name + "_val", align=self.alignment(rvalue))
 
             else:
                 rvalue = self.codegen(r, builder)
 
-            if l.dType == float and r.dType == int:
-                rvalue = builder.sitofp(rvalue, ir.DoubleType(), name="_casted")
-
-            elif l.dType == int and r.dType == float:
-                lvalue = builder.sitofp(lvalue, ir.DoubleType(), name="_casted")
-
-            if node.op == '+':
-
-                if node.dType == str:
-
-                    res = builder.call(self.malloc, [ir.IntType(32)(node.length)], name="pt1")
-                    builder.call(self.memcpy, [res, lvalue, ir.IntType(32)(l.length - 1)])
-                    pt2 = builder.gep(res, [ir.IntType(32)(l.length - 1)], "pt2")
-                    builder.call(self.memcpy, [pt2, rvalue, ir.IntType(32)(r.length)])
-
-                elif node.dType == float:
-                    res = builder.fadd(lvalue, rvalue, name="t")
-
-                elif node.dType == int:
-                    res = builder.add(lvalue, rvalue, name="t")
-
-            elif node.op == '-':
-                if node.dType == float:
-                    res = builder.fsub(lvalue, rvalue, name="t")
-
-                elif node.dType == int:
-                    res = builder.sub(lvalue, rvalue, name="t")
-
-            elif node.op == '*':
-                if node.dType == float:
-                    res = builder.fmul(lvalue, rvalue, name="t")
-
-                elif node.dType == int:
-                    res = builder.mul(lvalue, rvalue, name="t")
-
-            elif node.op == '/':
-                if node.dType == float:
-                    res = builder.fdiv(lvalue, rvalue, name="t")
-
-                elif node.dType == int:
-                    res = builder.sdiv(lvalue, rvalue, name="t")
-
-            elif node.op == '%':
-                if node.dType == float:
-                    res = builder.frem(lvalue, rvalue, name="t")
-
-                elif node.dType == int:
-                    res = builder.srem(lvalue, rvalue, name="t")
-
-            elif node.op in cmp_op:
-
-                if node.dType == float:
-                    res = builder.fcmp_unordered(node.op, lvalue, rvalue, name="t")
-
-                elif node.dType == int:
-                    res = builder.icmp_signed(node.op, lvalue, rvalue, name="t")
-
-            return res
+            return self.arithmetic(node, lvalue, rvalue, builder)
 
         elif isinstance(node, pc_ast.UnaryOp):
 
@@ -324,7 +2050,7 @@ class Generator:
                 rvalue = self.codegen(r, builder)
 
                 if r.dType == float or r.dType == int:
-                    rvalue = builder.load(rvalue,name=r.name + "_val",align=None)
+                    rvalue = builder.load(rvalue, name=r.name + "_val", align=self.alignment(rvalue))
 
             else:
                 rvalue = self.codegen(r, builder)
@@ -343,30 +2069,31 @@ class Generator:
 
             raw_data = node.children()
 
-            data = self.codegen(raw_data, builder)
+            stream = self.stream(node.file, builder)
+            end = ir.IntType(8)(ord("\n"))
 
-            if isinstance(raw_data, pc_ast.Array_Element):
-                data = builder.load(data,name=raw_data.name + "_val",align=None)
+            if stream is None:
+                stream = self.runtime.stdout()
 
-            if raw_data.dType == float: 
-                fmt_ptr = builder.gep(self.double_fmt, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=False, name="fmt_ptr")
+            if node.count is not None:
+                return self.output_array(node, stream, builder)
 
-                if isinstance(raw_data, pc_ast.Variable):
-                    data = builder.load(data,name=raw_data.name + "_val",align=None)
+            if raw_data.dType == str:
+                return self.output_string(raw_data, stream, builder)
 
-            elif raw_data.dType == str:
-                fmt_ptr = builder.gep(self.string_fmt, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=False, name="fmt_ptr")
+            data = self.codegen(raw_data, builder)
 
-            elif raw_data.dType == int:
-                fmt_ptr = builder.gep(self.int_fmt, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=False, name="fmt_ptr")
+            if isinstance(raw_data, pc_ast.Array_Element):
+                data = builder.load(data, name=raw_data.name + "_val", align=self.alignment(data))
 
-                if isinstance(raw_data, pc_ast.Variable):
-                    data = builder.load(data,name=raw_data.name + "_val",align=None)
+            if isinstance(raw_data, pc_ast.Variable) and raw_data.dType != str:
+                data = builder.load(data, name=raw_data.name + "_val", align=self.alignment(data))
 
-            builder.call(self.printf, [fmt_ptr, data], name="print")
-                
-            fmt_ptr = builder.gep(self.newline_fmt, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=False, name="fmt_ptr")
-            builder.call(self.printf, [fmt_ptr], name="print")
+            if raw_data.dType == float:
+                builder.call(self.runtime.write_double(), [stream, data, end])
+
+            elif raw_data.dType == int:
+                builder.call(self.runtime.write_int(), [stream, data, end])
 
             return builder
 
@@ -400,40 +2127,49 @@ class Generator:
 
             condition, body = node.children()
 
-            loop_body = self.scope.append_basic_block(name="while.body")
+            return self.loop(node, condition, body, builder)
 
-            builder.branch(loop_body)
-            loop_body_builder = ir.IRBuilder(loop_body)
+        elif isinstance(node, pc_ast.For):
 
-            for statement in body:
-                loop_body_builder = self.codegen(statement, loop_body_builder)
-            
-            condition = self.codegen(condition, loop_body_builder)
+            assignment, final, body = node.children()
 
-            loop_exit = self.scope.append_basic_block(name="while.exit")
-            loop_exit_builder = ir.IRBuilder(loop_exit)
+            builder = self.codegen(assignment, builder)
 
-            loop_body_builder.cbranch(condition, loop_body, loop_exit)
+            var = assignment.lvalue
+            one = pc_ast.Constant(var.dType, var.dType(1), 0)
+            step = pc_ast.Assignment("=", var.dType, var, pc_ast.BinaryOp('+', var, one, var.dType, 0))
 
-            return loop_exit_builder
+            if var.dType == float or final.dType == float:
+                condition = pc_ast.BinaryOp('<=', var, final, float, 0)
+            else:
+                condition = pc_ast.BinaryOp('<=', var, final, int, 0)
+
+            return self.loop(node, condition, body + [step], builder)
         
         elif isinstance(node, pc_ast.Input):
-        
+
+            stream = self.stream(node.file, builder)
+
+            # prompts written by OUTPUT have to appear before the program waits
+            if stream is None:
+                builder.call(self.runtime.flush(), [])
+                stream = self.runtime.stdin()
+
+            if node.count is not None:
+                return self.input_array(node, stream, builder)
+
             variable = self.codegen(node.variable, builder)
 
-            #builder.call(self.realloc, [variable, ir.IntType(32)(5)]) for strings
             self.variables[(node.variable.name, self.scope)] = 0
 
             if node.dType == int:
-                fmt_ptr = builder.gep(self.int_fmt, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=False, name="fmt_ptr")
+                builder.call(self.runtime.read_int(), [stream, variable], name="scan")
 
             elif node.dType == float:
-                fmt_ptr = builder.gep(self.double_fmt, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=False, name="fmt_ptr")
+                builder.call(self.runtime.read_double(), [stream, variable], name="scan")
 
             elif node.dType == str:
-                fmt_ptr = builder.gep(self.string_fmt, [ir.IntType(32)(0), ir.IntType(32)(0)], inbounds=False, name="fmt_ptr")
-
-            builder.call(self.scanf, [fmt_ptr, variable], name="scan")
+                builder.call(self.runtime.read_string(), [stream, variable], name="scan")
 
             return builder
         
@@ -442,7 +2178,13 @@ class Generator:
             args = []
             
             for arg in node.args:
-                if arg[1] == int:
+                if arg[2]:
+                    args += [ir.PointerType(self.ir_type(arg[1])), ir.IntType(64)]
+
+                elif arg[1] == str:
+                    args += [pc_runtime.PTR, ir.IntType(64)]
+
+                elif arg[1] == int:
                     args.append(ir.IntType(32))
                 
                 elif arg[1] == float:
@@ -457,20 +2199,25 @@ class Generator:
             fnty = ir.FunctionType(dType, args)
             
             func = ir.Function(self.module, fnty, name=node.name)
+            self.function_attributes(func)
                            
             self.variables[(node.name, self.scope)] = dType
             self.functions[node.name] = func
             
-            for i in range(0, len(func.args)):
-                func.args[i].name = node.args[i][0] + "_arg"
+            params = iter(func.args)
             
-            block = func.append_basic_block(name="entry")
-            func_builder = ir.IRBuilder(block)
+            func_builder = self.function_body(func)
             
             self.scope = func
             
-            for i in range(0, len(node.args)):
-                arg = node.args[i]
+            for arg in node.args:
+
+                if arg[2] or arg[1] == str:
+                    self.reference_param(node, arg, next(params), next(params), func_builder)
+                    continue
+
+                param = next(params)
+                param.name = arg[0] + "_arg"
                 
                 if arg[1] == int:
                     dType = ir.IntType(32)
@@ -478,13 +2225,48 @@ class Generator:
                 elif arg[1] == float:
                     dType = ir.DoubleType()
                     
-                var = func_builder.alloca(dType,size=None,name=arg[0])
-                func_builder.store(func.args[i],var,align=None)
+                var = self.entry_alloca(dType, name=arg[0])
+                func_builder.store(param, var, align=self.alignment(var))
+
+            if node.memo:
+                self.memos[func] = self.memo_lookup(node, func_builder)
+
+            # memory allocated by a call can only be reached through its own
+            # variables, so all of it is released when the call returns
+            if self.alloc == "arena" and self.allocates(node.body):
+                mark = self.entry_alloca(pc_runtime.ARENA_MARK, name="arena.mark")
+                func_builder.call(self.runtime.arena_mark(), [mark])
+                self.arena_marks[func] = mark
+
+            # the files a call opens can only be reached through its own
+            # variables, so they are closed when it returns
+            files = sorted({statement.name for statement in pc_analysis.walk(node.body) if isinstance(statement, pc_ast.Open_File)})
+
+            if files:
+                for name in files:
+                    self.file_variable(name)
+
+                self.file_handles[func] = files
+
+            # self tail calls reassign the arguments and jump back here
+            if pc_analysis.self_tail_calls(node) and not node.memo and not pc_analysis.reference_params(node):
+                tail_block = func.append_basic_block(name="tailrecurse")
+                func_builder.branch(tail_block)
+                func_builder.position_at_end(tail_block)
+
+                self.tail_loops[func] = (tail_block, node.args)
             
+            outer_statements = self.statements
+            self.statements = node.body
+
             for statement in node.body:
                 func_builder = self.codegen(statement, func_builder)
+
+            self.statements = outer_statements
             
             if not func_builder.block.is_terminated:
+                self.release_activation(func_builder)
+
                 if node.dType == int:
                     dType = ir.IntType(32)
                     func_builder.ret(dType(0))
@@ -492,23 +2274,53 @@ class Generator:
                 elif node.dType == float:
                     dType = ir.DoubleType()
                     func_builder.ret(dType(0.0))
+
+            self.free_strings(func)
+            self.mark_tail_calls(func)
             
             self.scope = self.main
             
             return builder
     
+        elif isinstance(node, pc_ast.Array_Reduction):
+
+            return self.array_reduction(node, builder)
+
+        elif isinstance(node, pc_ast.Math_Function):
+
+            return self.math_function(node, [self.value(arg, builder) for arg in node.args], builder)
+
+        elif isinstance(node, pc_ast.Sort):
+
+            array = self.array_pointer(node.name, node.dType, builder)
+            count = self.element_count(node.name, node.count, builder)
+
+            sort = self.runtime.sort(self.ir_type(node.dType))
+            builder.call(sort, [array, count, ir.IntType(1)(node.descending)])
+
+            return builder
+
         elif isinstance(node, pc_ast.Function_Call):
             
             func = self.functions[node.name]
             
             args = []
             
-            for arg in node.args:
+            for arg, (name, dType, array) in zip(node.args, self.params[node.name]):
+
+                if array:
+                    args.append(self.array_pointer(arg.name, arg.dType, builder))
+                    args.append(builder.load(ir.PointerType(ir.IntType(64))('%"' + arg.name + '.len"'), name=arg.name + ".len_val"))
+                    continue
+
+                if dType == str:
+                    args.extend(self.string_value(arg, builder))
+                    continue
                 
                 built_arg = self.codegen(arg, builder)
                 
                 if isinstance(arg, pc_ast.Array_Element) or isinstance(arg, pc_ast.Variable):
-                    built_arg = builder.load(built_arg,name=arg.name + "_val",align=None)
+                    built_arg = builder.load(built_arg, name=arg.name + "_val", align=self.alignment(built_arg))
                     
                 args.append(built_arg)
             
@@ -517,12 +2329,38 @@ class Generator:
             return res 
         
         elif isinstance(node, pc_ast.Return):
+
+            call = node.data
+
+            if isinstance(call, pc_ast.Function_Call) and self.scope in self.tail_loops and call.name == self.scope.name:
+                tail_block, params = self.tail_loops[self.scope]
+
+                args = [self.value(arg, builder) for arg in call.args]
+
+                for (name, dType, array), arg, value in zip(params, call.args, args):
+                    if dType == float and arg.dType == int:
+                        value = builder.sitofp(value, ir.DoubleType(), name="_casted")
+
+                    builder.store(value, ir.PointerType(self.ir_type(dType))('%"' + name + '"'))
+
+                self.release_activation(builder)
+                builder.branch(tail_block)
+
+                return builder
             
             res = self.codegen(node.data, builder)
             
             if isinstance(node.data, pc_ast.Array_Element) or isinstance(node.data, pc_ast.Variable):
-                res = builder.load(res,name="res",align=None)
-            
+                res = builder.load(res, name="res", align=self.alignment(res))
+
+            if self.scope in self.memos:
+                self.memo_save(res, builder)
+
+            # a tail call may not be given arrays that live in this frame
+            elif isinstance(call, pc_ast.Function_Call) and self.scope != self.main and not self.frame_arguments(call):
+                self.tail_calls.setdefault(self.scope, []).append(res)
+
+            self.release_activation(builder)
             builder.ret(res)
             
             return builder
@@ -0,0 +1,467 @@
+#!/usr/bin/env python
+
+'''
+Helpers for walking the AST and for analyses shared by the optimization
+passes and the IR generator
+'''
+
+import pc_ast
+
+__author__ = "Mugilan Ganesan"
+__email__ = "mugi.ganesan@gmail.com"
+__status__ = "Developer"
+__version__ = "1.0.0"
+
+
+def walk(statements):
+    '''
+    Yields every statement in a statement list, descending into the
+    bodies of IF, WHILE and FOR statements but not into subroutines
+    '''
+
+    for statement in statements or []:
+
+        yield statement
+
+        if isinstance(statement, pc_ast.If):
+            yield from walk(statement.if_true)
+            yield from walk(statement.if_false)
+
+        elif isinstance(statement, pc_ast.While):
+            yield from walk(statement.body)
+
+        elif isinstance(statement, pc_ast.For):
+            yield statement.assignment
+            yield from walk(statement.body)
+
+
+def tail_calls(decl):
+    '''
+    The RETURN statements of a subroutine that return the result of a
+    call directly. Every RETURN ends its path, so such a call is always
+    in tail position.
+    '''
+
+    return [statement for statement in walk(decl.body)
+            if isinstance(statement, pc_ast.Return) and isinstance(statement.data, pc_ast.Function_Call)]
+
+
+def self_tail_calls(decl):
+    '''The tail calls a subroutine makes to itself'''
+
+    return [statement for statement in tail_calls(decl) if statement.data.name == decl.name]
+
+
+def expressions(node):
+    '''Yields an expression and every expression nested inside it'''
+
+    if node is None:
+        return
+
+    yield node
+
+    if isinstance(node, pc_ast.BinaryOp):
+        yield from expressions(node.left)
+        yield from expressions(node.right)
+
+    elif isinstance(node, pc_ast.UnaryOp):
+        yield from expressions(node.right)
+
+    elif isinstance(node, pc_ast.Array_Element):
+        yield from expressions(node.index)
+
+    elif isinstance(node, pc_ast.Flat_Index):
+        for index in node.indices + (node.dims or []):
+            yield from expressions(index)
+
+    elif isinstance(node, (pc_ast.Function_Call, pc_ast.Math_Function)):
+        for arg in node.args:
+            yield from expressions(arg)
+
+    elif isinstance(node, (pc_ast.Map_Element, pc_ast.Map_Contains)):
+        yield from expressions(node.key)
+
+    # the array itself is not an expression that is worked out, so it is
+    # not yielded
+    elif isinstance(node, pc_ast.Array_Reduction):
+        yield from expressions(node.count)
+        yield from expressions(node.value)
+
+
+def constant_value(node):
+    '''
+    The value of an INT expression built only from constants, following
+    the generated code: division and remainder truncate towards zero and
+    results wrap around at 32 bits. None if it is not constant.
+    '''
+
+    if isinstance(node, pc_ast.Constant) and node.dType == int:
+        value = node.value
+
+    elif isinstance(node, pc_ast.UnaryOp) and node.dType == int and node.op == '-':
+        right = constant_value(node.right)
+
+        if right is None:
+            return None
+
+        value = -right
+
+    elif isinstance(node, pc_ast.BinaryOp) and node.dType == int and node.op in ('+', '-', '*', '/', '%'):
+        left = constant_value(node.left)
+        right = constant_value(node.right)
+
+        if left is None or right is None or (node.op in ('/', '%') and right == 0):
+            return None
+
+        if node.op == '+':
+            value = left + right
+        elif node.op == '-':
+            value = left - right
+        elif node.op == '*':
+            value = left * right
+        else:
+            quotient = abs(left) // abs(right) * (1 if (left < 0) == (right < 0) else -1)
+            value = quotient if node.op == '/' else left - quotient * right
+
+    else:
+        return None
+
+    return (value + (1 << 31)) % (1 << 32) - (1 << 31)
+
+
+def statement_expressions(statement):
+    '''The expressions that appear directly in a statement'''
+
+    if isinstance(statement, pc_ast.Assignment):
+        return [statement.lvalue, statement.rvalue]
+
+    elif isinstance(statement, pc_ast.Output):
+        return [statement.data, statement.count]
+
+    elif isinstance(statement, pc_ast.Return):
+        return [statement.data]
+
+    elif isinstance(statement, pc_ast.Input):
+        return [statement.variable, statement.count]
+
+    elif isinstance(statement, pc_ast.Open_File):
+        return [statement.path]
+
+    elif isinstance(statement, (pc_ast.If, pc_ast.While)):
+        return [statement.condition]
+
+    elif isinstance(statement, pc_ast.For):
+        return [statement.final]
+
+    elif isinstance(statement, pc_ast.Array_Declaration):
+        return [statement.elements, statement.path]
+
+    elif isinstance(statement, pc_ast.Array_Assignment):
+        return [statement.rvalue]
+
+    elif isinstance(statement, pc_ast.Sort):
+        return [statement.count]
+
+    elif isinstance(statement, pc_ast.Append):
+        return [statement.value]
+
+    elif isinstance(statement, pc_ast.Map_Assignment):
+        return [statement.element, statement.rvalue]
+
+    elif isinstance(statement, (pc_ast.Constant, pc_ast.Variable, pc_ast.Array_Element,
+                                pc_ast.BinaryOp, pc_ast.UnaryOp, pc_ast.Function_Call, pc_ast.Array_Reduction, pc_ast.Array_Length,
+                                pc_ast.Map_Element, pc_ast.Map_Contains, pc_ast.Map_Size, pc_ast.End_Of_File,
+                                pc_ast.Math_Function)):
+        return [statement]
+
+    return []
+
+
+def calls(statements):
+    '''Yields every subroutine call made in a statement list'''
+
+    for statement in walk(statements):
+        for expression in statement_expressions(statement):
+            for node in expressions(expression):
+                if isinstance(node, pc_ast.Function_Call):
+                    yield node
+
+
+def does_io(statements):
+    '''Whether a statement list contains an INPUT or OUTPUT statement, or opens or closes a file'''
+
+    return any(isinstance(statement, (pc_ast.Input, pc_ast.Output, pc_ast.Open_File, pc_ast.Close_File))
+               for statement in walk(statements))
+
+
+PURE, READONLY, IMPURE = 0, 1, 2
+
+
+def function_decls(statements):
+    '''Yields every subroutine declared in a statement list'''
+
+    for statement in walk(statements):
+        if isinstance(statement, pc_ast.Function_Decl):
+            yield statement
+            yield from function_decls(statement.body)
+
+
+def call_graph(decls):
+    '''Maps each subroutine name to the names of the subroutines it calls'''
+
+    return {decl.name: {call.name for call in calls(decl.body)} for decl in decls}
+
+
+def recursive_functions(graph):
+    '''The subroutines that can reach themselves through the call graph'''
+
+    recursive = set()
+
+    for name in graph:
+        seen = set()
+        stack = list(graph[name])
+
+        while stack:
+            callee = stack.pop()
+
+            if callee == name:
+                recursive.add(name)
+                break
+
+            if callee not in seen:
+                seen.add(callee)
+                stack.extend(graph.get(callee, ()))
+
+    return recursive
+
+
+def reference_params(decl):
+    '''The parameters of a subroutine that are passed by reference: its arrays and strings'''
+
+    return {name for name, dType, array in decl.args if array or dType == str}
+
+
+def array_params(decl):
+    '''The names of the array parameters of a subroutine, in order'''
+
+    return [name for name, dType, array in decl.args if array]
+
+
+def written_array(statement):
+    '''The name of the array a statement writes to, or None'''
+
+    if isinstance(statement, pc_ast.Assignment) and isinstance(statement.lvalue, pc_ast.Array_Element):
+        return statement.lvalue.name
+
+    if isinstance(statement, pc_ast.Input) and isinstance(statement.variable, (pc_ast.Array_Element, pc_ast.Array_Variable)):
+        return statement.variable.name
+
+    if isinstance(statement, (pc_ast.Array_Assignment, pc_ast.Sort, pc_ast.Append)):
+        return statement.name
+
+    return None
+
+
+def local_effect(decl):
+    '''
+    The side effects of a subroutine body on its own, ignoring calls.
+    INT and DOUBLE arguments are passed by value and subroutines cannot
+    see the variables of the main program, so a body without INPUT,
+    OUTPUT or heap allocation only touches its own stack frame and the
+    arrays and strings passed to it. Reading those makes it READONLY,
+    and writing to an array passed to it makes it IMPURE.
+    '''
+
+    if decl.memo:
+        return IMPURE
+
+    references = reference_params(decl)
+    effect = PURE
+
+    for statement in walk(decl.body):
+
+        if isinstance(statement, (pc_ast.Input, pc_ast.Output, pc_ast.Array_Declaration, pc_ast.Append,
+                                  pc_ast.Map_Declaration, pc_ast.Sync, pc_ast.Open_File, pc_ast.Close_File)):
+            return IMPURE
+
+        if isinstance(statement, pc_ast.Assignment) and statement.dType == str:
+            return IMPURE
+
+        if written_array(statement) in references:
+            return IMPURE
+
+        for expression in statement_expressions(statement):
+            for node in expressions(expression):
+
+                if isinstance(node, pc_ast.Array_Reduction):
+                    node = node.array
+
+                if isinstance(node, (pc_ast.Variable, pc_ast.Array_Element, pc_ast.Array_Variable, pc_ast.Array_Length)) \
+                   and node.name in references:
+                    effect = READONLY
+
+    return effect
+
+
+def function_effects(decls, graph):
+    '''
+    Classifies every subroutine as PURE, READONLY or IMPURE by
+    propagating local effects up the call graph until nothing changes
+    '''
+
+    effects = {decl.name: local_effect(decl) for decl in decls}
+
+    changed = True
+
+    while changed:
+        changed = False
+
+        for name, callees in graph.items():
+            effect = max([effects[name]] + [effects.get(callee, IMPURE) for callee in callees])
+
+            if effect != effects[name]:
+                effects[name] = effect
+                changed = True
+
+    return effects
+
+
+def written_params(decls):
+    '''
+    The array parameters of each subroutine that it writes to, itself or
+    through the subroutines it passes them on to
+    '''
+
+    by_name = {decl.name: decl for decl in decls}
+    written = {decl.name: {written_array(statement) for statement in walk(decl.body)} & set(array_params(decl))
+               for decl in decls}
+
+    changed = True
+
+    while changed:
+        changed = False
+
+        for decl in decls:
+            for call in calls(decl.body):
+                callee = by_name.get(call.name)
+
+                if callee is None:
+                    continue
+
+                for arg, (name, dType, array) in zip(call.args, callee.args):
+                    if (array and name in written[callee.name] and arg.name in array_params(decl)
+                            and arg.name not in written[decl.name]):
+                        written[decl.name].add(arg.name)
+                        changed = True
+
+    return written
+
+
+def noalias_params(decls, ast, written):
+    '''
+    The array parameters of each subroutine that never share their
+    elements with another of its array parameters while one of the two is
+    written to. A call that passes the same array twice rules that out,
+    and so does a call that passes on two parameters of its caller that
+    might share elements themselves.
+    '''
+
+    by_name = {decl.name: decl for decl in decls}
+    noalias = {decl.name: set(array_params(decl)) for decl in decls}
+
+    sites = [(None, call) for statements in ast for call in calls(statements)]
+    sites += [(decl, call) for decl in decls for call in calls(decl.body)]
+
+    changed = True
+
+    while changed:
+        changed = False
+
+        for caller, call in sites:
+            callee = by_name.get(call.name)
+
+            if callee is None:
+                continue
+
+            passed = [(name, arg.name) for arg, (name, dType, array) in zip(call.args, callee.args) if array]
+
+            for name, array in passed:
+                for other, other_array in passed:
+
+                    if other == name or (name not in written[callee.name] and other not in written[callee.name]):
+                        continue
+
+                    shared = array == other_array
+
+                    if caller is not None and array in array_params(caller) and other_array in array_params(caller):
+                        shared = shared or not {array, other_array} <= noalias[caller.name]
+
+                    if shared and name in noalias[callee.name]:
+                        noalias[callee.name].discard(name)
+                        changed = True
+
+    return noalias
+
+
+def local_exit(decl, bounds_check=False, proven=()):
+    '''
+    Whether a subroutine body, ignoring calls, can stop the program with
+    a runtime error: running out of memory for an array, a map or a
+    joined string, using a file, or with bounds checks an array access
+    that is not proven in bounds
+    '''
+
+    for statement in walk(decl.body):
+
+        if isinstance(statement, (pc_ast.Array_Declaration, pc_ast.Append, pc_ast.Map_Declaration, pc_ast.Map_Assignment,
+                                  pc_ast.Sync, pc_ast.Open_File, pc_ast.Close_File)):
+            return True
+
+        if isinstance(statement, (pc_ast.Input, pc_ast.Output)) and (statement.file is not None or statement.count is not None):
+            return True
+
+        if isinstance(statement, (pc_ast.Assignment, pc_ast.Input)) and statement.dType == str:
+            return True
+
+        if bounds_check and isinstance(statement, (pc_ast.Sort, pc_ast.Array_Assignment)):
+            return True
+
+        for expression in statement_expressions(statement):
+            for node in expressions(expression):
+
+                if isinstance(node, pc_ast.BinaryOp) and node.dType == str:
+                    return True
+
+                if isinstance(node, pc_ast.End_Of_File):
+                    return True
+
+                if bounds_check and isinstance(node, pc_ast.Array_Reduction):
+                    return True
+
+                if bounds_check and isinstance(node, pc_ast.Array_Element) and node not in proven:
+                    return True
+
+    return False
+
+
+def exiting_functions(decls, graph, bounds_check=False, proven=()):
+    '''
+    The subroutines that can stop the program with a runtime error instead
+    of returning, themselves or through the subroutines they call. LLVM
+    must not treat calls to them as free of side effects, or it would
+    remove the error along with a call whose result is unused.
+    '''
+
+    exiting = {decl.name for decl in decls if local_exit(decl, bounds_check, proven)}
+
+    changed = True
+
+    while changed:
+        changed = False
+
+        for name, callees in graph.items():
+            if name not in exiting and any(callee in exiting or callee not in graph for callee in callees):
+                exiting.add(name)
+                changed = True
+
+    return exiting
@@ -72,24 +72,41 @@ class Variable:
         return None
     
 class Output:
-    __slots__ = ('data')
+    __slots__ = ('data', 'file', 'count', 'separator')
     
-    def __init__(self, data):
+    def __init__(self, data, file=None, count=None, separator=None):
         self.data = data
+        self.file = file
+        self.count = count
+        self.separator = separator
         
     def children(self):
         return (self.data)
     
 class Input:
-    __slots__ = ('variable', 'dType')
+    __slots__ = ('variable', 'dType', 'file', 'count')
     
-    def __init__(self, variable, dType):
+    def __init__(self, variable, dType, file=None, count=None):
         self.variable = variable
         self.dType = dType
+        self.file = file
+        self.count = count
         
     def children(self):
         return None
     
+class Sort:
+    __slots__ = ('dType', 'name', 'count', 'descending')
+
+    def __init__(self, dType, name, count, descending):
+        self.dType = dType
+        self.name = name
+        self.count = count
+        self.descending = descending
+
+    def children(self):
+        return (self.count)
+
 class If:
     __slots__ = ('condition', 'if_true', 'if_false')
     
@@ -112,28 +129,142 @@ class While:
         return (self.condition, self.body)
 
 class Array_Declaration:
-    __slots__ = ('dType','name','elements')
+    __slots__ = ('dType','name','elements','dims','path','advice')
     
-    def __init__(self, dType, name, elements):
+    def __init__(self, dType, name, elements, dims=None, path=None, advice=None):
         self.dType = dType
         self.name = name
         self.elements = elements
+        self.dims = dims
+        self.path = path
+        self.advice = advice
         
     def children(self):
         return (self.elements)
     
 class Array_Element:
-    __slots__ = ('dType', 'name', 'index', 'length')
+    __slots__ = ('dType', 'name', 'index', 'length', 'record', 'field')
     
-    def __init__(self, dType, name, index, length):
+    def __init__(self, dType, name, index, length, record=None, field=None):
         self.dType = dType
         self.name = name
         self.length = length
         self.index = index
+        self.record = record
+        self.field = field
         
     def children(self):
         return (self.index)
+
+class Flat_Index:
+    __slots__ = ('dType', 'name', 'indices', 'dims', 'length')
+
+    def __init__(self, dType, name, indices, dims, length):
+        self.dType = dType
+        self.name = name
+        self.indices = indices
+        self.dims = dims
+        self.length = length
+
+    def children(self):
+        return self.indices
+
+class Sync:
+    __slots__ = ('dType', 'name')
+
+    def __init__(self, dType, name):
+        self.dType = dType
+        self.name = name
+
+    def children(self):
+        return None
+
+class Open_File:
+    __slots__ = ('name', 'path', 'mode')
+
+    def __init__(self, name, path, mode):
+        self.name = name
+        self.path = path
+        self.mode = mode
+
+    def children(self):
+        return (self.path)
+
+class Close_File:
+    __slots__ = ('name')
+
+    def __init__(self, name):
+        self.name = name
+
+    def children(self):
+        return None
+
+class End_Of_File:
+    __slots__ = ('dType', 'name', 'length')
+
+    def __init__(self, dType, name, length):
+        self.dType = dType
+        self.name = name
+        self.length = length
+
+    def children(self):
+        return None
+
+class Record_Decl:
+    __slots__ = ('name', 'fields', 'layout')
+
+    def __init__(self, name, fields, layout):
+        self.name = name
+        self.fields = fields
+        self.layout = layout
+
+    def children(self):
+        return None
+
+class Array_Variable:
+    __slots__ = ('dType', 'name', 'length')
+
+    def __init__(self, dType, name, length):
+        self.dType = dType
+        self.name = name
+        self.length = length
+
+    def children(self):
+        return None
+
+class Array_Assignment:
+    __slots__ = ('dType', 'name', 'rvalue')
+
+    def __init__(self, dType, name, rvalue):
+        self.dType = dType
+        self.name = name
+        self.rvalue = rvalue
+
+    def children(self):
+        return (self.rvalue)
     
+class Append:
+    __slots__ = ('dType', 'name', 'value')
+
+    def __init__(self, dType, name, value):
+        self.dType = dType
+        self.name = name
+        self.value = value
+
+    def children(self):
+        return (self.value)
+
+class Array_Length:
+    __slots__ = ('dType', 'name', 'length')
+
+    def __init__(self, dType, name, length):
+        self.dType = dType
+        self.name = name
+        self.length = length
+
+    def children(self):
+        return None
+
 class For:
     __slots__ = ('assignment','final','body')
     
@@ -146,13 +277,14 @@ class For:
         return (self.assignment, self.final, self.body)
 
 class Function_Decl:
-    __slots__ = ('name','args','body','dType')
+    __slots__ = ('name','args','body','dType','memo')
     
-    def __init__(self, name, args, body, dType):
+    def __init__(self, name, args, body, dType, memo=False):
         self.name = name
         self.args = args
         self.body = body
         self.dType = dType
+        self.memo = memo
     
     def children(self):
         return None
@@ -169,6 +301,91 @@ class Function_Call:
     def children(self):
         return self.args
     
+class Array_Reduction:
+    __slots__ = ('op', 'dType', 'array', 'count', 'value', 'length')
+
+    def __init__(self, op, dType, array, count, value, length):
+        self.op = op
+        self.dType = dType
+        self.array = array
+        self.count = count
+        self.value = value
+        self.length = length
+
+    def children(self):
+        return (self.count, self.value)
+
+class Math_Function:
+    __slots__ = ('op', 'dType', 'args', 'length')
+
+    def __init__(self, op, dType, args, length):
+        self.op = op
+        self.dType = dType
+        self.args = args
+        self.length = length
+
+    def children(self):
+        return self.args
+
+class Map_Declaration:
+    __slots__ = ('name', 'key_type', 'dType')
+
+    def __init__(self, name, key_type, dType):
+        self.name = name
+        self.key_type = key_type
+        self.dType = dType
+
+    def children(self):
+        return None
+
+class Map_Element:
+    __slots__ = ('dType', 'name', 'key', 'key_type', 'length')
+
+    def __init__(self, dType, name, key, key_type, length):
+        self.dType = dType
+        self.name = name
+        self.key = key
+        self.key_type = key_type
+        self.length = length
+
+    def children(self):
+        return (self.key)
+
+class Map_Assignment:
+    __slots__ = ('dType', 'element', 'rvalue')
+
+    def __init__(self, dType, element, rvalue):
+        self.dType = dType
+        self.element = element
+        self.rvalue = rvalue
+
+    def children(self):
+        return (self.element, self.rvalue)
+
+class Map_Contains:
+    __slots__ = ('dType', 'name', 'key', 'key_type', 'length')
+
+    def __init__(self, dType, name, key, key_type, length):
+        self.dType = dType
+        self.name = name
+        self.key = key
+        self.key_type = key_type
+        self.length = length
+
+    def children(self):
+        return (self.key)
+
+class Map_Size:
+    __slots__ = ('dType', 'name', 'length')
+
+    def __init__(self, dType, name, length):
+        self.dType = dType
+        self.name = name
+        self.length = length
+
+    def children(self):
+        return None
+
 class Return:
     __slots__ = ('data')
     
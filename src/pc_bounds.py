@@ -0,0 +1,873 @@
+#!/usr/bin/env python
+
+'''
+A range analysis for --bounds-check. It proves which array accesses are
+always in bounds, so that only the others are checked, and finds the
+checks that can be hoisted out of counted loops.
+'''
+
+import pc_ast
+import pc_analysis
+from pc_parallel import describe, is_increment
+
+__author__ = "Mugilan Ganesan"
+__email__ = "mugi.ganesan@gmail.com"
+__status__ = "Developer"
+__version__ = "1.0.0"
+
+
+INT_MIN = -(1 << 31)
+INT_MAX = (1 << 31) - 1
+
+COMPARISONS = {'<', '<=', '>', '>=', '==', '!='}
+NEGATE      = {'<': '>=', '>=': '<', '>': '<=', '<=': '>', '==': '!=', '!=': '=='}
+FLIP        = {'<': '>', '>': '<', '<=': '>=', '>=': '<=', '==': '==', '!=': '!='}
+
+
+def bounded(value):
+    '''A bound that the 32-bit value of an INT expression can really have, otherwise None'''
+
+    return value if value is not None and INT_MIN <= value <= INT_MAX else None
+
+
+class Facts:
+    '''
+    What is known about an INT value: low <= value <= high, value < s + o
+    for every s: o in below, and value == s + o for every s: o in equal,
+    where s is the name of an INT variable. None means unbounded.
+    '''
+
+    __slots__ = ('low', 'high', 'below', 'equal')
+
+    def __init__(self, low=None, high=None, below=None, equal=None):
+        self.low = bounded(low)
+        self.high = bounded(high)
+        self.below = below or {}
+        self.equal = equal or {}
+
+    def __eq__(self, other):
+        return (self.low, self.high, self.below, self.equal) == (other.low, other.high, other.below, other.equal)
+
+    def upper_bounds(self):
+        '''Every s: o such that value < s + o'''
+
+        bounds = dict(self.below)
+
+        for name, offset in self.equal.items():
+            bounds[name] = min(bounds.get(name, offset + 1), offset + 1)
+
+        return bounds
+
+    def minimum(self):
+        '''The smallest the value can be, or None'''
+
+        candidates = [INT_MIN + offset for offset in self.equal.values()]
+
+        if self.low is not None:
+            candidates.append(self.low)
+
+        return max(candidates) if candidates else None
+
+    def maximum(self):
+        '''The largest the value can be, or None'''
+
+        candidates = [INT_MAX + offset - 1 for offset in self.upper_bounds().values()]
+
+        if self.high is not None:
+            candidates.append(self.high)
+
+        return min(candidates) if candidates else None
+
+    def shifted(self, amount):
+        '''The facts about value + amount, for a constant amount'''
+
+        return Facts(None if self.low is None else self.low + amount,
+                     None if self.high is None else self.high + amount,
+                     {name: offset + amount for name, offset in self.below.items()},
+                     {name: offset + amount for name, offset in self.equal.items()})
+
+    def without(self, name):
+        '''Forgets what the value has to do with a variable'''
+
+        if name not in self.below and name not in self.equal:
+            return self
+
+        return Facts(self.low, self.high,
+                     {s: o for s, o in self.below.items() if s != name},
+                     {s: o for s, o in self.equal.items() if s != name})
+
+
+UNKNOWN = Facts()
+
+
+def dimension(name, k):
+    '''The variable that holds the size of dimension k of an array, when it is not constant'''
+
+    return name + ".dim" + str(k)
+
+
+def join(a, b):
+    '''The facts that hold whichever of two paths was taken'''
+
+    upper_a, upper_b = a.upper_bounds(), b.upper_bounds()
+
+    return Facts(None if a.low is None or b.low is None else min(a.low, b.low),
+                 None if a.high is None or b.high is None else max(a.high, b.high),
+                 {name: max(offset, upper_b[name]) for name, offset in upper_a.items() if name in upper_b},
+                 {name: offset for name, offset in a.equal.items() if b.equal.get(name) == offset})
+
+
+def widen(old, new):
+    '''
+    Drops every bound that moved between two visits of a loop head, so
+    that the analysis of a loop always finishes
+    '''
+
+    upper = old.upper_bounds()
+
+    return Facts(new.low if new.low == old.low else None,
+                 new.high if new.high == old.high else None,
+                 {name: offset for name, offset in new.below.items() if name in upper and offset <= upper[name]},
+                 new.equal)
+
+
+class State:
+    '''The facts known about the INT variables and array lengths at one point of a program'''
+
+    __slots__ = ('values', 'lengths')
+
+    def __init__(self, values=None, lengths=None):
+        self.values = values or {}
+        self.lengths = lengths or {}
+
+    def __eq__(self, other):
+        return self.values == other.values and self.lengths == other.lengths
+
+    def copy(self):
+        return State(dict(self.values), dict(self.lengths))
+
+    def kill(self, name):
+        '''Forgets everything known about a variable that is assigned a new value'''
+
+        self.values.pop(name, None)
+
+        for facts in (self.values, self.lengths):
+            for key in facts:
+                facts[key] = facts[key].without(name)
+
+    def assign(self, name, facts):
+
+        self.kill(name)
+        self.values[name] = facts.without(name)
+
+
+def join_states(a, b):
+
+    if a is None:
+        return b
+
+    if b is None:
+        return a
+
+    return State({name: join(facts, b.values[name]) for name, facts in a.values.items() if name in b.values},
+                 {name: join(facts, b.lengths[name]) for name, facts in a.lengths.items() if name in b.lengths})
+
+
+def widen_states(old, new):
+
+    return State({name: widen(old.values[name], facts) for name, facts in new.values.items()},
+                 {name: widen(old.lengths[name], facts) for name, facts in new.lengths.items()})
+
+
+class Hoisted_Check:
+    '''
+    A check on an array access in a counted loop, made once before the
+    loop. The index is counter * step + offset when counter is True and
+    the invariant expression index otherwise.
+    '''
+
+    __slots__ = ('access', 'counter', 'step', 'offset', 'negate')
+
+    def __init__(self, access, counter, step=1, offset=None, negate=False):
+        self.access = access
+        self.counter = counter
+        self.step = step
+        self.offset = offset
+        self.negate = negate
+
+
+class Hoisted_Loop:
+    '''A loop whose counter runs from its value before the loop up to bound, and the checks hoisted out of it'''
+
+    __slots__ = ('var', 'bound', 'inclusive', 'checks')
+
+    def __init__(self, var, bound, inclusive, checks):
+        self.var = var
+        self.bound = bound
+        self.inclusive = inclusive
+        self.checks = checks
+
+
+class Bounds_Analysis:
+
+    def __init__(self, skip=()):
+
+        self.skip     = set(skip)
+        self.accesses = {}
+        self.proven   = set()
+        self.hoisted  = {}
+        self.report   = []
+        self.scope    = 'main'
+
+    def analyze(self, ast):
+        '''
+        Works out which accesses are proven in bounds and which loops have
+        checks hoisted out of them. Loops in skip are not given hoisted
+        checks.
+        '''
+
+        self.accesses = {}
+        self.hoisted  = {}
+
+        for statements in ast:
+            self.scope = 'main'
+            self.statements(statements, State())
+
+        self.proven = {access for access, (scope, proven) in self.accesses.items() if proven}
+
+        claimed = set()
+
+        for statements in ast:
+            self.hoist(statements, claimed)
+
+        self.report = self.summary(claimed)
+
+        return self
+
+    def summary(self, claimed):
+
+        if not self.accesses:
+            return ["bounds checks: no array accesses"]
+
+        total = len(self.accesses)
+        proven = len(self.proven)
+        hoisted = len(claimed)
+        checked = total - proven - hoisted
+
+        removed = 100 * (proven + hoisted) // total
+
+        lines = ["bounds checks: " + str(total) + " array accesses, " + str(proven) + " proven in bounds, "
+                 + str(hoisted) + " hoisted out of loops, " + str(checked) + " checked in place ("
+                 + str(removed) + "% removed)"]
+
+        for access, (scope, proven) in self.accesses.items():
+            if not proven and access not in claimed:
+                lines.append(scope + ": " + describe(access) + " - checked")
+
+        return lines
+
+    # range analysis
+
+    def statements(self, statements, state):
+
+        for statement in statements or []:
+            state = self.statement(statement, state)
+
+        return state
+
+    def statement(self, statement, state):
+        '''Records the accesses a statement makes and returns the state after it, None if it never finishes'''
+
+        if isinstance(statement, pc_ast.Function_Decl):
+            outer_scope = self.scope
+            self.scope = statement.name
+            self.statements(statement.body, State())
+            self.scope = outer_scope
+
+            return state
+
+        if isinstance(statement, pc_ast.If):
+            self.visit(statement.condition, state)
+
+            if_true = self.statements(statement.if_true, self.assume(state, statement.condition))
+            if_false = self.statements(statement.if_false, self.assume(state, statement.condition, negate=True))
+
+            return join_states(if_true, if_false)
+
+        if isinstance(statement, pc_ast.While):
+            return self.loop(statement.condition, statement.body, state)
+
+        if isinstance(statement, pc_ast.For):
+            state = self.statement(statement.assignment, state)
+
+            var, final = statement.assignment.lvalue, statement.final
+
+            if var.dType != int or final.dType != int:
+                self.visit(final, state)
+                return self.loop(None, statement.body, state)
+
+            one = pc_ast.Constant(int, 1, 0)
+            step = pc_ast.Assignment("=", int, var, pc_ast.BinaryOp('+', var, one, int, 0))
+            condition = pc_ast.BinaryOp('<=', var, final, int, 0)
+
+            return self.loop(condition, statement.body + [step], state)
+
+        for expression in pc_analysis.statement_expressions(statement):
+            self.visit(expression, state)
+
+        if state is None:
+            return None
+
+        if isinstance(statement, pc_ast.Return):
+            return None
+
+        state = state.copy()
+
+        if isinstance(statement, pc_ast.Assignment) and isinstance(statement.lvalue, pc_ast.Variable):
+
+            if statement.dType == int:
+                state.assign(statement.lvalue.name, self.evaluate(statement.rvalue, state))
+            else:
+                state.kill(statement.lvalue.name)
+
+        elif isinstance(statement, pc_ast.Input) and isinstance(statement.variable, pc_ast.Variable):
+            state.kill(statement.variable.name)
+
+        # an array mapped from a file without a size is as long as the file
+        elif isinstance(statement, pc_ast.Array_Declaration) and statement.elements is None and statement.path is not None:
+            state.lengths.pop(statement.name, None)
+
+        elif isinstance(statement, pc_ast.Array_Declaration) and statement.elements is None:
+            state.lengths[statement.name] = Facts(0, 0)
+
+        elif isinstance(statement, pc_ast.Append) and statement.name in state.lengths:
+            state.lengths[statement.name] = state.lengths[statement.name].shifted(1)
+
+        elif isinstance(statement, pc_ast.Array_Declaration):
+            count = self.evaluate(statement.elements, state)
+
+            # a negative count gives an empty array, so the length is only
+            # equal to the count when the count is positive, which is the
+            # case whenever an index is proven to be below it
+            low = count.minimum()
+            state.lengths[statement.name] = Facts(0 if low is None else max(low, 0), None, None, count.equal)
+
+            # the sizes of the dimensions that are not constant are kept in
+            # variables that the indexes are checked against, and stand for
+            # their sizes in the same way
+            for k, dim in enumerate(statement.dims or []):
+                if pc_analysis.constant_value(dim) is None:
+                    size = self.evaluate(dim, state)
+                    low = size.minimum()
+                    state.assign(dimension(statement.name, k), Facts(0 if low is None else max(low, 0), None, None, size.equal))
+
+        return state
+
+    def loop(self, condition, body, state):
+        '''
+        Analyzes a loop by visiting its body until the facts at its head
+        stop changing, and returns the state after it
+        '''
+
+        head = state
+
+        while head is not None:
+            self.visit(condition, head)
+
+            out = self.statements(body, self.assume(head, condition))
+            new = widen_states(head, join_states(head, out))
+
+            if new == head:
+                return self.assume(head, condition, negate=True)
+
+            head = new
+
+        self.visit(condition, None)
+        self.statements(body, None)
+
+        return None
+
+    def assume(self, state, condition, negate=False):
+        '''The state on the path where a condition is true, or false with negate'''
+
+        if state is None or not isinstance(condition, pc_ast.BinaryOp) or condition.op not in COMPARISONS:
+            return state
+
+        if condition.left.dType != int or condition.right.dType != int:
+            return state
+
+        op = NEGATE[condition.op] if negate else condition.op
+
+        left = self.evaluate(condition.left, state)
+        right = self.evaluate(condition.right, state)
+
+        state = state.copy()
+
+        for node, op, other in ((condition.left, op, right), (condition.right, FLIP[op], left)):
+
+            if not isinstance(node, pc_ast.Variable):
+                continue
+
+            facts = state.values.get(node.name, UNKNOWN)
+            other = other.without(node.name)
+
+            low, high = facts.low, facts.high
+            below, equal = dict(facts.below), dict(facts.equal)
+
+            if op in ('<', '<='):
+                step = 1 if op == '<' else 0
+                maximum = other.maximum()
+
+                if maximum is not None:
+                    high = maximum - step if high is None else min(high, maximum - step)
+
+                for name, offset in other.upper_bounds().items():
+                    below[name] = min(below.get(name, offset - step), offset - step)
+
+            elif op in ('>', '>='):
+                minimum = other.minimum()
+
+                if minimum is not None:
+                    step = 1 if op == '>' else 0
+                    low = minimum + step if low is None else max(low, minimum + step)
+
+            elif op == '==':
+                minimum, maximum = other.minimum(), other.maximum()
+
+                if minimum is not None:
+                    low = minimum if low is None else max(low, minimum)
+
+                if maximum is not None:
+                    high = maximum if high is None else min(high, maximum)
+
+                below.update(other.below)
+                equal.update(other.equal)
+
+            if low is not None and high is not None and low > high:
+                return None
+
+            state.values[node.name] = Facts(low, high, below, equal)
+
+        return state
+
+    def evaluate(self, node, state):
+        '''The facts about the value of an INT expression'''
+
+        if node.dType != int:
+            return UNKNOWN
+
+        if isinstance(node, pc_ast.Constant):
+            return Facts(node.value, node.value)
+
+        if isinstance(node, pc_ast.Variable):
+            facts = state.values.get(node.name, UNKNOWN)
+
+            equal = dict(facts.equal)
+            equal[node.name] = 0
+
+            return Facts(facts.low, facts.high, facts.below, equal)
+
+        if isinstance(node, pc_ast.UnaryOp) and node.op == '-':
+            right = self.evaluate(node.right, state)
+
+            minimum, maximum = right.minimum(), right.maximum()
+
+            if minimum is None or maximum is None or minimum == INT_MIN:
+                return UNKNOWN
+
+            return Facts(-maximum, -minimum)
+
+        if isinstance(node, pc_ast.Math_Function) and node.op in ('MIN', 'MAX'):
+            return self.extreme(node.op, *[self.evaluate(arg, state) for arg in node.args])
+
+        if isinstance(node, pc_ast.Math_Function) and node.op == 'ABS':
+            right = self.evaluate(node.args[0], state)
+
+            minimum, maximum = right.minimum(), right.maximum()
+
+            # ABS wraps INT_MIN around to itself
+            if minimum is None or minimum == INT_MIN:
+                return UNKNOWN
+
+            if maximum is None:
+                return Facts(max(minimum, 0))
+
+            return Facts(max(minimum, -maximum, 0), max(maximum, -minimum))
+
+        if not isinstance(node, pc_ast.BinaryOp):
+            return UNKNOWN
+
+        left = self.evaluate(node.left, state)
+        right = self.evaluate(node.right, state)
+
+        if node.op == '+':
+            return self.add(left, right)
+
+        if node.op == '-':
+            return self.subtract(left, right)
+
+        if node.op == '*':
+            values = [left.minimum(), left.maximum(), right.minimum(), right.maximum()]
+
+            if None in values:
+                return UNKNOWN
+
+            products = [a * b for a in values[:2] for b in values[2:]]
+
+            if bounded(min(products)) is None or bounded(max(products)) is None:
+                return UNKNOWN
+
+            return Facts(min(products), max(products))
+
+        if node.op == '/':
+            return self.divide(node, left, right, state)
+
+        if node.op == '%':
+            return self.remainder(left, right)
+
+        return UNKNOWN
+
+    def extreme(self, op, left, right):
+        '''
+        The facts about MIN or MAX of two values. The smaller of the two is
+        below anything either of them is below, and the larger is only below
+        what both of them are.
+        '''
+
+        lows, highs = [left.minimum(), right.minimum()], [left.maximum(), right.maximum()]
+        upper_left, upper_right = left.upper_bounds(), right.upper_bounds()
+
+        if op == 'MIN':
+            low = None if None in lows else min(lows)
+            high = min([high for high in highs if high is not None], default=None)
+
+            below = dict(upper_left)
+
+            for name, offset in upper_right.items():
+                below[name] = min(below.get(name, offset), offset)
+
+        else:
+            low = max([low for low in lows if low is not None], default=None)
+            high = None if None in highs else max(highs)
+
+            below = {name: max(offset, upper_right[name]) for name, offset in upper_left.items() if name in upper_right}
+
+        return Facts(low, high, below)
+
+    def add(self, left, right):
+
+        if None in (left.minimum(), right.minimum(), left.maximum(), right.maximum()):
+            return UNKNOWN
+
+        # a sum that can wrap around says nothing about its value
+        if bounded(left.minimum() + right.minimum()) is None or bounded(left.maximum() + right.maximum()) is None:
+            return UNKNOWN
+
+        below = {}
+
+        for a, b in ((left, right), (right, left)):
+            for name, offset in a.upper_bounds().items():
+                below[name] = min(below.get(name, offset + b.maximum()), offset + b.maximum())
+
+        equal = {}
+
+        if left.low is not None and left.low == left.high:
+            equal = right.shifted(left.low).equal
+
+        elif right.low is not None and right.low == right.high:
+            equal = left.shifted(right.low).equal
+
+        return Facts(left.minimum() + right.minimum(), left.maximum() + right.maximum(), below, equal)
+
+    def subtract(self, left, right):
+
+        if None in (left.minimum(), right.minimum(), left.maximum(), right.maximum()):
+            return UNKNOWN
+
+        if bounded(left.minimum() - right.maximum()) is None or bounded(left.maximum() - right.minimum()) is None:
+            return UNKNOWN
+
+        low = left.minimum() - right.maximum()
+
+        # s + k - v > k - o when v < s + o
+        upper = right.upper_bounds()
+
+        for name, offset in left.equal.items():
+            if name in upper:
+                low = max(low, offset - upper[name] + 1)
+
+        below = {name: offset - right.minimum() for name, offset in left.upper_bounds().items()}
+
+        equal = {}
+
+        if right.low is not None and right.low == right.high:
+            equal = left.shifted(-right.low).equal
+
+        return Facts(low, left.maximum() - right.minimum(), below, equal)
+
+    def divide(self, node, left, right, state):
+
+        if right.low is None or right.low != right.high or right.low <= 0:
+            return UNKNOWN
+
+        divisor = right.low
+        minimum, maximum = left.minimum(), left.maximum()
+
+        if minimum is None or maximum is None:
+            return UNKNOWN
+
+        facts = Facts(int(minimum / divisor), int(maximum / divisor))
+
+        if minimum < 0:
+            return facts
+
+        # a / c <= a when a >= 0, and (a + b) / c stays below what both a and b are below when c >= 2
+        below = left.upper_bounds()
+
+        if divisor >= 2 and isinstance(node.left, pc_ast.BinaryOp) and node.left.op == '+':
+            a = self.evaluate(node.left.left, state)
+            b = self.evaluate(node.left.right, state)
+
+            if a.minimum() is not None and a.minimum() >= 0 and b.minimum() is not None and b.minimum() >= 0:
+                upper_a = self.expand(a.upper_bounds(), state.values, 'upper')
+                upper_b = self.expand(b.upper_bounds(), state.values, 'upper')
+
+                for name, offset in upper_a.items():
+                    if name in upper_b:
+                        below[name] = min(below.get(name, max(offset, upper_b[name])), max(offset, upper_b[name]))
+
+        return Facts(facts.low, facts.high, below)
+
+    def remainder(self, left, right):
+
+        if right.low is None or right.low != right.high or right.low == 0:
+            return UNKNOWN
+
+        limit = abs(right.low) - 1
+        minimum, maximum = left.minimum(), left.maximum()
+
+        if minimum is not None and minimum >= 0:
+            return Facts(0, limit if maximum is None else min(limit, maximum), left.upper_bounds())
+
+        if maximum is not None and maximum <= 0:
+            return Facts(-limit if minimum is None else max(-limit, minimum), 0)
+
+        return Facts(-limit, limit)
+
+    def visit(self, node, state):
+        '''Records whether every array access in an expression is proven in bounds'''
+
+        for child in pc_analysis.expressions(node):
+            if isinstance(child, pc_ast.Array_Element):
+                self.accesses[child] = (self.scope, state is not None and self.in_bounds(child, state))
+
+    def in_bounds(self, access, state):
+
+        # each index of an array with several dimensions is checked against
+        # the size of its own dimension rather than the flat position
+        # against the length
+        if isinstance(access.index, pc_ast.Flat_Index):
+            flat = access.index
+
+            return flat.dims is not None and all(self.below(self.evaluate(index, state), self.evaluate(dim, state), state)
+                                                 for index, dim in zip(flat.indices, flat.dims))
+
+        if access.name not in state.lengths:
+            return False
+
+        return self.below(self.evaluate(access.index, state), state.lengths[access.name], state)
+
+    def below(self, index, length, state):
+        '''Whether a value is proven to be at least 0 and below a length'''
+
+        if index.minimum() is None or index.minimum() < 0:
+            return False
+
+        if index.maximum() is not None and length.low is not None and index.maximum() < length.low:
+            return True
+
+        sizes = self.expand(length.equal, state.values, 'equal')
+
+        for name, offset in self.expand(index.upper_bounds(), state.values, 'upper').items():
+            if name in sizes and offset <= sizes[name]:
+                return True
+
+        return False
+
+    def expand(self, bounds, values, kind):
+        '''
+        Adds the bounds that follow from what is known about the variables
+        in a set of bounds: v < s + o and s == t + k give v < t + o + k
+        '''
+
+        expanded = dict(bounds)
+
+        for name, offset in bounds.items():
+            facts = values.get(name, UNKNOWN)
+            further = facts.equal if kind == 'equal' else facts.upper_bounds()
+
+            for other, shift in further.items():
+                if kind == 'equal':
+                    expanded.setdefault(other, offset + shift)
+                else:
+                    # v < s + o and s < t + k give v < t + o + k - 1
+                    value = offset + shift - 1
+                    expanded[other] = min(expanded.get(other, value), value)
+
+        return expanded
+
+    # hoisting
+
+    def hoist(self, statements, claimed):
+        '''
+        Gives each loop the checks that can be made once before it. An
+        access is claimed by the outermost loop that can hoist its check.
+        '''
+
+        for statement in statements or []:
+
+            if isinstance(statement, pc_ast.Function_Decl):
+                self.hoist(statement.body, claimed)
+
+            elif isinstance(statement, pc_ast.If):
+                self.hoist(statement.if_true, claimed)
+                self.hoist(statement.if_false, claimed)
+
+            elif isinstance(statement, (pc_ast.While, pc_ast.For)):
+                plan = self.hoisting(statement, claimed)
+
+                if plan:
+                    self.hoisted[statement] = plan
+                    claimed.update(check.access for check in plan.checks)
+
+                self.hoist(statement.body, claimed)
+
+    def hoisting(self, loop, claimed):
+        '''Returns a Hoisted_Loop for a counted loop with checks to hoist, otherwise None'''
+
+        if loop in self.skip:
+            return None
+
+        if isinstance(loop, pc_ast.For):
+            var, bound, inclusive, body = loop.assignment.lvalue, loop.final, True, loop.body
+
+        else:
+            cond = loop.condition
+
+            if not isinstance(cond, pc_ast.BinaryOp) or cond.op not in ('<', '<=') or not isinstance(cond.left, pc_ast.Variable):
+                return None
+
+            var, bound, inclusive = cond.left, cond.right, cond.op == '<='
+
+            if not loop.body or not is_increment(loop.body[-1], var.name):
+                return None
+
+            body = loop.body[:-1]
+
+        if var.dType != int or bound.dType != int:
+            return None
+
+        assigned = set()
+
+        for statement in pc_analysis.walk(body):
+
+            # the body is generated twice, which declarations cannot be
+            if isinstance(statement, (pc_ast.Array_Declaration, pc_ast.Function_Decl)):
+                return None
+
+            if isinstance(statement, pc_ast.Assignment) and isinstance(statement.lvalue, pc_ast.Variable):
+                assigned.add(statement.lvalue.name)
+
+            elif isinstance(statement, pc_ast.Input) and isinstance(statement.variable, pc_ast.Variable):
+                assigned.add(statement.variable.name)
+
+        if var.name in assigned:
+            return None
+
+        assigned.add(var.name)
+
+        if not self.invariant(bound, assigned):
+            return None
+
+        checks = []
+
+        for statement in pc_analysis.walk(loop.body):
+            for expression in pc_analysis.statement_expressions(statement):
+                for access in pc_analysis.expressions(expression):
+
+                    if not isinstance(access, pc_ast.Array_Element) or access in self.proven or access in claimed:
+                        continue
+
+                    # each index of an array with several dimensions is
+                    # checked against its own dimension where it is used
+                    if isinstance(access.index, pc_ast.Flat_Index):
+                        continue
+
+                    check = self.counter_check(access, var.name, assigned)
+
+                    if check is None and self.invariant(access.index, assigned):
+                        check = Hoisted_Check(access, False)
+
+                    if check is not None:
+                        checks.append(check)
+
+        if not checks:
+            return None
+
+        return Hoisted_Loop(var.name, bound, inclusive, checks)
+
+    def counter_check(self, access, var, assigned):
+        '''Matches indexes of the form i, i + e, e + i, i - e and e - i where e is loop invariant'''
+
+        index = access.index
+
+        if isinstance(index, pc_ast.Variable) and index.name == var:
+            return Hoisted_Check(access, True)
+
+        if not isinstance(index, pc_ast.BinaryOp) or index.op not in ('+', '-'):
+            return None
+
+        def is_counter(node):
+            return isinstance(node, pc_ast.Variable) and node.name == var
+
+        if is_counter(index.left) and self.invariant(index.right, assigned):
+            return Hoisted_Check(access, True, 1, index.right, index.op == '-')
+
+        if is_counter(index.right) and self.invariant(index.left, assigned):
+            return Hoisted_Check(access, True, 1 if index.op == '+' else -1, index.left)
+
+        return None
+
+    def invariant(self, node, assigned):
+        '''
+        Whether an INT expression has the same value on every iteration of
+        a loop that assigns the given variables, and can be evaluated
+        before the loop without trapping
+        '''
+
+        for child in pc_analysis.expressions(node):
+
+            if child.dType != int:
+                return False
+
+            if isinstance(child, pc_ast.Variable):
+                if child.name in assigned:
+                    return False
+
+            elif isinstance(child, pc_ast.BinaryOp):
+                if child.op in ('/', '%'):
+                    if not isinstance(child.right, pc_ast.Constant) or child.right.value <= 0:
+                        return False
+
+                elif child.op not in ('+', '-', '*'):
+                    return False
+
+            elif isinstance(child, pc_ast.UnaryOp):
+                if child.op != '-':
+                    return False
+
+            # the INT math functions cannot trap
+            elif not isinstance(child, (pc_ast.Constant, pc_ast.Math_Function)):
+                return False
+
+        return True
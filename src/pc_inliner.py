@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+
+'''
+An AST pass that runs between the parser and the IR generator and
+replaces calls to small, pure, non-recursive subroutines with their bodies
+'''
+
+import copy
+
+import pc_ast
+import pc_analysis
+
+__author__ = "Mugilan Ganesan"
+__email__ = "mugi.ganesan@gmail.com"
+__status__ = "Developer"
+__version__ = "1.0.0"
+
+
+INLINE_THRESHOLD = 40
+INLINE_BUDGET    = 1000
+
+# the variables made for the arguments and locals of an inlined call are
+# named after them with this and a number, which no program name can hold
+TEMPORARY = ".inl"
+
+
+def is_temporary(name):
+    '''Whether a variable was made by the inliner for an inlined call'''
+
+    return TEMPORARY in name
+
+
+def size(node):
+    '''The number of AST nodes in a statement or expression'''
+
+    count = 0
+
+    for statement in pc_analysis.walk([node]):
+        count += 1
+
+        for expression in pc_analysis.statement_expressions(statement):
+            count += sum(1 for child in pc_analysis.expressions(expression))
+
+    return count
+
+
+def rename(node, names):
+    '''Renames the variables of an expression tree in place'''
+
+    for child in pc_analysis.expressions(node):
+        if isinstance(child, pc_ast.Variable) and child.name in names:
+            child.name = names[child.name]
+
+    return node
+
+
+def substitute(node, values):
+    '''Returns an expression with the named variables replaced by copies of expressions'''
+
+    if isinstance(node, pc_ast.Variable) and node.name in values:
+        return copy.deepcopy(values[node.name])
+
+    if isinstance(node, pc_ast.BinaryOp):
+        node.left = substitute(node.left, values)
+        node.right = substitute(node.right, values)
+
+    elif isinstance(node, pc_ast.UnaryOp):
+        node.right = substitute(node.right, values)
+
+    elif isinstance(node, pc_ast.Array_Element):
+        node.index = substitute(node.index, values)
+
+    elif isinstance(node, pc_ast.Flat_Index):
+        node.indices = [substitute(index, values) for index in node.indices]
+
+    elif isinstance(node, (pc_ast.Function_Call, pc_ast.Math_Function)):
+        node.args = [substitute(arg, values) for arg in node.args]
+
+    elif isinstance(node, pc_ast.Array_Reduction):
+        node.count = substitute(node.count, values)
+        node.value = substitute(node.value, values)
+
+    elif isinstance(node, (pc_ast.Map_Element, pc_ast.Map_Contains)):
+        node.key = substitute(node.key, values)
+
+    return node
+
+
+class Inline_Candidate:
+    __slots__ = ('decl', 'locals', 'body', 'result')
+
+    def __init__(self, decl, body, result):
+        self.decl = decl
+        self.body = body
+        self.result = result
+        self.locals = {statement.lvalue.name for statement in body} | {arg[0] for arg in decl.args}
+
+
+class Inliner:
+
+    def __init__(self, threshold=INLINE_THRESHOLD, budget=INLINE_BUDGET):
+
+        self.threshold  = threshold
+        self.budget     = budget
+        self.inlined    = 0
+        self.candidates = {}
+        self.pure       = set()
+        self.count      = 0
+
+    def inline(self, ast):
+        '''
+        Inlines call sites in place, callees first, until the call-site
+        budget runs out. Returns the AST; the number of call sites that
+        were inlined is left in `inlined`.
+        '''
+
+        self.inlined    = 0
+        self.candidates = {}
+
+        decls = [decl for statements in ast for decl in pc_analysis.function_decls(statements)]
+        graph = pc_analysis.call_graph(decls)
+        recursive = pc_analysis.recursive_functions(graph)
+        effects = pc_analysis.function_effects(decls, graph)
+
+        self.pure = {name for name, effect in effects.items() if effect == pc_analysis.PURE}
+
+        # subroutines must be declared before they are called, so
+        # declaration order inlines callees before their callers
+        for decl in decls:
+            decl.body = self.statements(decl.body)
+
+            if decl.name not in recursive and decl.name in self.pure:
+                self.consider(decl)
+
+        for i in range(len(ast)):
+            ast[i] = self.statements(ast[i])
+
+        return ast
+
+    def consider(self, decl):
+        '''
+        A subroutine can be inlined when all of its arguments are passed by
+        value and its body is a run of scalar assignments followed by a
+        single RETURN, within the size threshold
+        '''
+
+        if pc_analysis.reference_params(decl):
+            return
+
+        *body, last = decl.body
+
+        if not isinstance(last, pc_ast.Return) or last.data.dType != decl.dType:
+            return
+
+        for statement in body:
+            if not isinstance(statement, pc_ast.Assignment) or not isinstance(statement.lvalue, pc_ast.Variable):
+                return
+
+        if sum(size(statement) for statement in decl.body) > self.threshold:
+            return
+
+        self.candidates[decl.name] = Inline_Candidate(decl, body, last.data)
+
+    def statements(self, statements):
+
+        if statements is None:
+            return None
+
+        result = []
+
+        for statement in statements:
+            prefix = []
+
+            if isinstance(statement, pc_ast.Assignment):
+                statement.lvalue = self.expression(statement.lvalue, prefix)
+                statement.rvalue = self.expression(statement.rvalue, prefix)
+
+            elif isinstance(statement, (pc_ast.Output, pc_ast.Return)):
+                statement.data = self.expression(statement.data, prefix)
+
+                if isinstance(statement, pc_ast.Output):
+                    statement.count = self.expression(statement.count, prefix)
+
+            elif isinstance(statement, pc_ast.Input):
+                statement.variable = self.expression(statement.variable, prefix)
+                statement.count = self.expression(statement.count, prefix)
+
+            elif isinstance(statement, pc_ast.Open_File):
+                statement.path = self.expression(statement.path, prefix)
+
+            elif isinstance(statement, pc_ast.Array_Declaration):
+                statement.elements = self.expression(statement.elements, prefix)
+                statement.path = self.expression(statement.path, prefix)
+
+            elif isinstance(statement, pc_ast.Array_Assignment):
+                statement.rvalue = self.expression(statement.rvalue, prefix)
+
+            elif isinstance(statement, pc_ast.Sort):
+                statement.count = self.expression(statement.count, prefix)
+
+            elif isinstance(statement, pc_ast.Append):
+                statement.value = self.expression(statement.value, prefix)
+
+            elif isinstance(statement, pc_ast.Map_Assignment):
+                statement.element = self.expression(statement.element, prefix)
+                statement.rvalue = self.expression(statement.rvalue, prefix)
+
+            elif isinstance(statement, pc_ast.If):
+                statement.condition = self.expression(statement.condition, prefix)
+                statement.if_true = self.statements(statement.if_true)
+                statement.if_false = self.statements(statement.if_false)
+
+            # loop conditions are evaluated on every iteration, so nothing
+            # can be hoisted out of them
+            elif isinstance(statement, pc_ast.While):
+                statement.condition = self.expression(statement.condition, None)
+                statement.body = self.statements(statement.body)
+
+            elif isinstance(statement, pc_ast.For):
+                statement.assignment.rvalue = self.expression(statement.assignment.rvalue, prefix)
+                statement.final = self.expression(statement.final, None)
+                statement.body = self.statements(statement.body)
+
+            elif isinstance(statement, (pc_ast.BinaryOp, pc_ast.UnaryOp, pc_ast.Function_Call, pc_ast.Math_Function)):
+                statement = self.expression(statement, prefix)
+
+            result.extend(prefix)
+            result.append(statement)
+
+        return result
+
+    def expression(self, node, prefix):
+        '''
+        Rewrites an expression bottom-up. Statements that have to run
+        before it are appended to prefix, or the call is left alone when
+        prefix is None.
+        '''
+
+        if isinstance(node, pc_ast.BinaryOp):
+            node.left = self.expression(node.left, prefix)
+            node.right = self.expression(node.right, prefix)
+
+        elif isinstance(node, pc_ast.UnaryOp):
+            node.right = self.expression(node.right, prefix)
+
+        elif isinstance(node, pc_ast.Array_Element):
+            node.index = self.expression(node.index, prefix)
+
+        elif isinstance(node, pc_ast.Flat_Index):
+            node.indices = [self.expression(index, prefix) for index in node.indices]
+
+        elif isinstance(node, pc_ast.Array_Reduction):
+            node.count = self.expression(node.count, prefix)
+            node.value = self.expression(node.value, prefix)
+
+        elif isinstance(node, (pc_ast.Map_Element, pc_ast.Map_Contains)):
+            node.key = self.expression(node.key, prefix)
+
+        elif isinstance(node, pc_ast.Math_Function):
+            node.args = [self.expression(arg, prefix) for arg in node.args]
+
+        elif isinstance(node, pc_ast.Function_Call):
+            node.args = [self.expression(arg, prefix) for arg in node.args]
+
+            if node.name in self.candidates and self.inlined < self.budget:
+                inlined = self.inline_call(self.candidates[node.name], node, prefix)
+
+                if inlined is not None:
+                    self.inlined += 1
+                    return inlined
+
+        return node
+
+    def has_side_effects(self, node):
+
+        return any(isinstance(child, pc_ast.Function_Call) and child.name not in self.pure
+                   for child in pc_analysis.expressions(node))
+
+    def inline_call(self, candidate, call, prefix):
+        '''Returns the expression that replaces the call, or None to keep it'''
+
+        decl = candidate.decl
+
+        if len(call.args) != len(decl.args):
+            return None
+
+        for arg, (name, dType, array) in zip(call.args, decl.args):
+            if arg.dType != dType or self.has_side_effects(arg):
+                return None
+
+        if not candidate.body:
+            return self.inline_expression(candidate, call)
+
+        if prefix is None:
+            return None
+
+        self.count += 1
+        names = {name: name + TEMPORARY + str(self.count) for name in candidate.locals}
+
+        for arg, (name, dType, array) in zip(call.args, decl.args):
+            var = pc_ast.Variable(dType, names[name], 0)
+            prefix.append(pc_ast.Assignment("=", dType, var, arg))
+
+        for statement in copy.deepcopy(candidate.body):
+            rename(statement.lvalue, names)
+            rename(statement.rvalue, names)
+            prefix.append(statement)
+
+        return rename(copy.deepcopy(candidate.result), names)
+
+    def inline_expression(self, candidate, call):
+        '''
+        Substitutes the arguments straight into a body that is a single
+        RETURN. An argument that is more than a variable or constant is
+        only substituted if the body uses it at most once, so that no work
+        is duplicated.
+        '''
+
+        params = [name for name, dType, array in candidate.decl.args]
+        uses = {name: 0 for name in params}
+
+        for node in pc_analysis.expressions(candidate.result):
+            if isinstance(node, pc_ast.Variable) and node.name in uses:
+                uses[node.name] += 1
+
+        for arg, name in zip(call.args, params):
+            if uses[name] > 1 and not isinstance(arg, (pc_ast.Constant, pc_ast.Variable)):
+                return None
+
+        return substitute(copy.deepcopy(candidate.result), dict(zip(params, call.args)))
@@ -35,14 +35,19 @@ class PC_Lexer(object):
     tokens = (
         'VAR',
         'INT','DOUBLE',
-        'INPUT','OUTPUT',
-        'SUBROUTINE','ENDSUBROUTINE','RETURN',
+        'INPUT','OUTPUT','SEPARATOR',
+        'SUBROUTINE','ENDSUBROUTINE','RETURN','MEMO',
         'IF','THEN','ELSE','ENDIF',
         'WHILE','DO','ENDWHILE',
         'FOR','TO','NEXT',
+        'SORT','DESCENDING','APPEND',
+        'RECORD','ENDRECORD','LAYOUT',
+        'FILE','SYNC',
+        'OPENFILE','READFILE','WRITEFILE','CLOSEFILE',
+        'MAP','FROM','STRING','CONTAINS','SIZE',
         'INT_CONST','DOUBLE_CONST','STRING_CONST',
         'PLUS','MINUS','TIMES','DIVIDE','EQUALS','PERCENT',
-        'COMMA','NEWLINE',
+        'COMMA','DOT','NEWLINE',
         'LPAREN','RPAREN',
         'LBRACKET','RBRACKET',
         'LESS_THAN','LESS_EQUAL',
@@ -72,16 +77,19 @@ class PC_Lexer(object):
     t_RBRACKET       = r'\]'
     
     t_COMMA          = r'\,'
+    t_DOT            = r'\.'
     
     t_SUBROUTINE     = r'SUBROUTINE'
     t_ENDSUBROUTINE  = r'ENDSUBROUTINE'
     t_RETURN         = r'RETURN'
+    t_MEMO           = r'MEMO'
 
     t_INT            = 'INT'
     t_DOUBLE         = 'DOUBLE'
 
     t_INPUT          = 'INPUT'
     t_OUTPUT         = 'OUTPUT'
+    t_SEPARATOR      = 'SEPARATOR'
 
     t_IF             = 'IF'
     t_THEN           = 'THEN'
@@ -96,6 +104,28 @@ class PC_Lexer(object):
     t_TO             = 'TO'
     t_NEXT           = 'NEXT'
 
+    t_SORT           = 'SORT'
+    t_DESCENDING     = 'DESCENDING'
+    t_APPEND         = 'APPEND'
+
+    t_RECORD         = 'RECORD'
+    t_ENDRECORD      = 'ENDRECORD'
+    t_LAYOUT         = 'LAYOUT'
+
+    t_FILE           = 'FILE'
+    t_SYNC           = 'SYNC'
+
+    t_OPENFILE       = 'OPENFILE'
+    t_READFILE       = 'READFILE'
+    t_WRITEFILE      = 'WRITEFILE'
+    t_CLOSEFILE      = 'CLOSEFILE'
+
+    t_MAP            = 'MAP'
+    t_FROM           = 'FROM'
+    t_STRING         = 'STRING'
+    t_CONTAINS       = 'CONTAINS'
+    t_SIZE           = 'SIZE'
+
     t_VAR            = reserved + r'[a-zA-Z_][a-zA-Z0-9_]*'
 
     t_ignore         = " \t"
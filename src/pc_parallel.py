@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+
+'''
+A loop analysis that finds counted loops whose iterations are independent
+of one another, so that the generator can split them across threads
+'''
+
+import pc_ast
+import pc_inliner
+
+__author__ = "Mugilan Ganesan"
+__email__ = "mugi.ganesan@gmail.com"
+__status__ = "Developer"
+__version__ = "1.0.0"
+
+
+REDUCTION_OPS = {'+', '*'}
+
+
+class Not_Parallel(Exception):
+    pass
+
+
+class Parallel_Loop:
+    __slots__ = ('var', 'bound', 'inclusive', 'body', 'scalars', 'arrays', 'writes', 'reductions', 'locals')
+
+    def __init__(self, var, bound, inclusive, body):
+        self.var = var
+        self.bound = bound
+        self.inclusive = inclusive
+        self.body = body
+        self.scalars = {}
+        self.arrays = {}
+        self.writes = set()
+        self.reductions = {}
+        self.locals = {}
+
+
+def describe(node):
+    '''Renders an expression or loop header back into pseudocode'''
+
+    if isinstance(node, pc_ast.Constant):
+        return '"' + node.value + '"' if node.dType == str else str(node.value)
+
+    elif isinstance(node, (pc_ast.Variable, pc_ast.Array_Variable)):
+        return node.name
+
+    elif isinstance(node, pc_ast.Array_Element):
+        return node.name + "[" + describe(node.index) + "]" + ("." + node.field if node.field else "")
+
+    elif isinstance(node, pc_ast.Flat_Index):
+        return ", ".join(describe(index) for index in node.indices)
+
+    elif isinstance(node, pc_ast.Map_Element):
+        return node.name + "[" + describe(node.key) + "]"
+
+    elif isinstance(node, pc_ast.Map_Contains):
+        return "CONTAINS(" + node.name + ", " + describe(node.key) + ")"
+
+    elif isinstance(node, pc_ast.Map_Size):
+        return "SIZE(" + node.name + ")"
+
+    elif isinstance(node, pc_ast.Array_Length):
+        return "LENGTH(" + node.name + ")"
+
+    elif isinstance(node, pc_ast.BinaryOp):
+        parts = []
+        for child in node.children():
+            text = describe(child)
+            parts.append("(" + text + ")" if isinstance(child, pc_ast.BinaryOp) else text)
+        op = '<>' if node.op == '!=' else node.op
+        return parts[0] + " " + op + " " + parts[1]
+
+    elif isinstance(node, pc_ast.UnaryOp):
+        return node.op + describe(node.right)
+
+    elif isinstance(node, pc_ast.Function_Call):
+        return node.name + "(" + ", ".join(describe(arg) for arg in node.args) + ")"
+
+    elif isinstance(node, pc_ast.Math_Function):
+        return node.op + "(" + ", ".join(describe(arg) for arg in node.args) + ")"
+
+    elif isinstance(node, pc_ast.Array_Reduction):
+        args = [node.array, node.count] + ([node.value] if node.value is not None else [])
+        return node.op + "(" + ", ".join(describe(arg) for arg in args) + ")"
+
+    elif isinstance(node, pc_ast.While):
+        return "WHILE " + describe(node.condition)
+
+    elif isinstance(node, pc_ast.For):
+        return "FOR " + node.assignment.lvalue.name + " = " + describe(node.assignment.rvalue) + " TO " + describe(node.final)
+
+    return type(node).__name__
+
+
+def is_increment(statement, name):
+    '''Matches `name = name + 1` and `name = 1 + name`'''
+
+    if not isinstance(statement, pc_ast.Assignment) or not isinstance(statement.lvalue, pc_ast.Variable):
+        return False
+
+    r = statement.rvalue
+
+    if statement.lvalue.name != name or not isinstance(r, pc_ast.BinaryOp) or r.op != '+':
+        return False
+
+    for var, one in ((r.left, r.right), (r.right, r.left)):
+        if isinstance(var, pc_ast.Variable) and var.name == name and isinstance(one, pc_ast.Constant) and one.value == 1:
+            return True
+
+    return False
+
+
+class Loop_Parallelizer:
+
+    def __init__(self, pure_functions=(), noalias=None):
+
+        self.plans  = {}
+        self.report = []
+
+        self.pure_functions = set(pure_functions)
+
+        # the array parameters of each subroutine that never share elements
+        # with another of its array parameters, see pc_analysis.noalias_params
+        self.noalias      = noalias or {}
+        self.array_params = {}
+
+    def analyze(self, ast):
+
+        self.plans  = {}
+        self.report = []
+
+        for statements in ast:
+            self.visit(statements, 'main')
+
+        return self.plans
+
+    def visit(self, statements, scope):
+
+        for statement in statements or []:
+
+            if isinstance(statement, pc_ast.Function_Decl):
+                self.array_params[statement.name] = {name for name, dType, array in statement.args if array}
+                self.visit(statement.body, statement.name)
+
+            elif isinstance(statement, pc_ast.If):
+                self.visit(statement.if_true, scope)
+                self.visit(statement.if_false, scope)
+
+            elif isinstance(statement, (pc_ast.While, pc_ast.For)):
+                header = scope + ": " + describe(statement)
+
+                try:
+                    plan = self.plan(statement, scope)
+
+                except Not_Parallel as reason:
+                    self.report.append(header + " - not parallelized: " + str(reason))
+                    self.visit(statement.body, scope)
+
+                else:
+                    self.plans[statement] = plan
+
+                    detail = ", ".join("reduces " + name for name in plan.reductions)
+                    self.report.append(header + " - parallelized" + (" (" + detail + ")" if detail else ""))
+
+    def plan(self, loop, scope='main'):
+        '''Returns a Parallel_Loop for the loop, or raises Not_Parallel'''
+
+        if isinstance(loop, pc_ast.For):
+            var = loop.assignment.lvalue
+            plan = Parallel_Loop(var.name, loop.final, True, loop.body)
+
+        else:
+            cond = loop.condition
+
+            if not isinstance(cond, pc_ast.BinaryOp) or cond.op not in ('<', '<=') or not isinstance(cond.left, pc_ast.Variable):
+                raise Not_Parallel("condition is not of the form `i < n` or `i <= n`")
+
+            var = cond.left
+
+            if not loop.body or not is_increment(loop.body[-1], var.name):
+                raise Not_Parallel("the last statement does not increment " + var.name + " by 1")
+
+            plan = Parallel_Loop(var.name, cond.right, cond.op == '<=', loop.body[:-1])
+
+        if var.dType != int or plan.bound.dType != int:
+            raise Not_Parallel("the loop counter and bound are not INT")
+
+        reads = []
+        self.statements(plan.body, plan, reads)
+
+        for name in plan.reductions:
+            if name in plan.scalars:
+                raise Not_Parallel("reduction variable " + name + " is read outside its update")
+
+        for name, index in reads:
+            if name in plan.writes and not self.is_counter(index, plan):
+                raise Not_Parallel(name + "[" + describe(index) + "] is read while other iterations write " + name)
+
+        if not plan.writes and not plan.reductions:
+            raise Not_Parallel("there are no array writes or reductions to split")
+
+        bound_reads = []
+        bound = Parallel_Loop(None, None, False, [])
+        self.expression(plan.bound, bound, bound_reads)
+
+        for name in list(bound.scalars) + [name for name, index in bound_reads]:
+            if name == plan.var or name in plan.reductions or name in plan.writes:
+                raise Not_Parallel("the bound " + describe(plan.bound) + " changes inside the loop")
+
+        plan.scalars.update(bound.scalars)
+
+        for name, dType in bound.arrays.items():
+            plan.arrays.setdefault(name, dType)
+
+        # array arguments are matched by name above, but two of them may be
+        # the same array passed twice
+        params = self.array_params.get(scope, set())
+        noalias = self.noalias.get(scope, set())
+
+        for name in sorted(plan.writes & params):
+            for other in sorted(set(plan.arrays) & params - {name}):
+                if not {name, other} <= noalias:
+                    raise Not_Parallel("it writes " + name + ", which may share elements with " + other)
+
+        return plan
+
+    def is_counter(self, node, plan):
+
+        return isinstance(node, pc_ast.Variable) and node.name == plan.var
+
+    def statements(self, statements, plan, reads):
+
+        for statement in statements or []:
+
+            if isinstance(statement, pc_ast.Assignment):
+                self.assignment(statement, plan, reads)
+
+            elif isinstance(statement, pc_ast.If):
+                self.expression(statement.condition, plan, reads)
+                self.statements(statement.if_true, plan, reads)
+                self.statements(statement.if_false, plan, reads)
+
+            elif isinstance(statement, (pc_ast.While, pc_ast.For)):
+                raise Not_Parallel("it contains a nested loop")
+
+            elif isinstance(statement, pc_ast.Output):
+                raise Not_Parallel("it performs OUTPUT" if statement.file is None else "it writes to the file " + statement.file)
+
+            elif isinstance(statement, pc_ast.Input):
+                raise Not_Parallel("it performs INPUT" if statement.file is None else "it reads from the file " + statement.file)
+
+            elif isinstance(statement, (pc_ast.Open_File, pc_ast.Close_File)):
+                raise Not_Parallel("it opens or closes the file " + statement.name)
+
+            elif isinstance(statement, pc_ast.Return):
+                raise Not_Parallel("it returns from inside the loop")
+
+            elif isinstance(statement, pc_ast.Array_Declaration):
+                raise Not_Parallel("it declares the array " + statement.name)
+
+            elif isinstance(statement, pc_ast.Array_Assignment):
+                raise Not_Parallel("it assigns the whole array " + statement.name)
+
+            elif isinstance(statement, pc_ast.Sort):
+                raise Not_Parallel("it sorts the array " + statement.name)
+
+            elif isinstance(statement, pc_ast.Append):
+                raise Not_Parallel("it appends to the array " + statement.name)
+
+            elif isinstance(statement, pc_ast.Map_Declaration):
+                raise Not_Parallel("it declares the map " + statement.name)
+
+            elif isinstance(statement, pc_ast.Map_Assignment):
+                raise Not_Parallel("it writes to the map " + statement.element.name)
+
+            elif isinstance(statement, (pc_ast.BinaryOp, pc_ast.UnaryOp, pc_ast.Constant,
+                                        pc_ast.Variable, pc_ast.Array_Element, pc_ast.Function_Call, pc_ast.Math_Function)):
+                self.expression(statement, plan, reads)
+
+            else:
+                raise Not_Parallel("it contains an unsupported statement")
+
+    def assignment(self, node, plan, reads):
+
+        l, r = node.children()
+
+        if node.dType == str:
+            raise Not_Parallel("it assigns the string " + l.name)
+
+        if isinstance(l, pc_ast.Array_Element):
+
+            if l.record is not None:
+                raise Not_Parallel("it writes to the array of records " + l.name)
+
+            if not self.is_counter(l.index, plan):
+                raise Not_Parallel("it writes " + describe(l) + ", which is not indexed by " + plan.var)
+
+            plan.arrays[l.name] = l.dType
+            plan.writes.add(l.name)
+            self.expression(r, plan, reads)
+
+        elif l.name == plan.var:
+            raise Not_Parallel("it assigns the loop counter " + plan.var)
+
+        # an inlined call assigns its variables before it reads them, so
+        # every iteration can have its own
+        elif pc_inliner.is_temporary(l.name):
+            plan.locals[l.name] = node.dType
+            self.expression(r, plan, reads)
+
+        else:
+            op, operand = self.reduction(l.name, r)
+
+            if op is None:
+                raise Not_Parallel("it assigns " + l.name + ", which carries a value between iterations")
+
+            if plan.reductions.get(l.name, (op,))[0] != op:
+                raise Not_Parallel("it reduces " + l.name + " with different operators")
+
+            plan.reductions[l.name] = (op, node.dType)
+            self.expression(operand, plan, reads)
+
+    def reduction(self, name, node):
+        '''Matches `name = name op e` and `name = e op name`, returning (op, e)'''
+
+        if isinstance(node, pc_ast.BinaryOp) and node.op in REDUCTION_OPS:
+
+            for var, operand in ((node.left, node.right), (node.right, node.left)):
+                if isinstance(var, pc_ast.Variable) and var.name == name:
+                    return node.op, operand
+
+        return None, None
+
+    def expression(self, node, plan, reads):
+
+        if isinstance(node, pc_ast.Constant):
+
+            if node.dType == str:
+                raise Not_Parallel("it uses strings")
+
+        elif isinstance(node, pc_ast.Variable):
+
+            if node.dType == str:
+                raise Not_Parallel("it uses strings")
+
+            if node.name != plan.var and node.name not in plan.locals:
+                plan.scalars[node.name] = node.dType
+
+        elif isinstance(node, pc_ast.Array_Element):
+
+            if node.record is not None:
+                raise Not_Parallel("it uses the array of records " + node.name)
+
+            reads.append((node.name, node.index))
+            plan.arrays.setdefault(node.name, node.dType)
+            self.expression(node.index, plan, reads)
+
+        elif isinstance(node, pc_ast.BinaryOp):
+
+            if node.dType == str:
+                raise Not_Parallel("it uses strings")
+
+            self.expression(node.left, plan, reads)
+            self.expression(node.right, plan, reads)
+
+        elif isinstance(node, pc_ast.UnaryOp):
+            self.expression(node.right, plan, reads)
+
+        # the sizes of the dimensions are read like any other variable
+        elif isinstance(node, pc_ast.Flat_Index):
+            for index in node.indices + node.dims:
+                self.expression(index, plan, reads)
+
+        elif isinstance(node, pc_ast.Function_Call):
+
+            if node.name not in self.pure_functions:
+                raise Not_Parallel("it calls the subroutine " + node.name + ", which has side effects")
+
+            for arg in node.args:
+                self.expression(arg, plan, reads)
+
+        elif isinstance(node, pc_ast.Math_Function):
+            for arg in node.args:
+                self.expression(arg, plan, reads)
+
+        elif isinstance(node, pc_ast.Array_Reduction):
+            raise Not_Parallel("it uses " + node.op + " on the whole array " + node.array.name)
+
+        elif isinstance(node, pc_ast.Array_Length):
+            raise Not_Parallel("it uses LENGTH(" + node.name + ")")
+
+        elif isinstance(node, (pc_ast.Map_Element, pc_ast.Map_Contains, pc_ast.Map_Size)):
+            raise Not_Parallel("it uses the map " + node.name)
+
+        elif isinstance(node, pc_ast.End_Of_File):
+            raise Not_Parallel("it reads from the file " + node.name)
+
+        else:
+            raise Not_Parallel("it contains an unsupported expression")
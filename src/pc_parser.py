@@ -10,6 +10,7 @@ import sys
 from ply import yacc
 
 import pc_ast
+import pc_analysis
 from pc_lexer import PC_Lexer
 
 __author__ = "Mugilan Ganesan"
@@ -17,6 +18,17 @@ __email__ = "mugi.ganesan@gmail.com"
 __status__ = "Developer"
 __version__ = "1.0.0"
 
+# the array reductions that are built in, with their number of arguments
+REDUCTIONS = {'SUM': 2, 'MIN': 2, 'MAX': 2, 'ARGMIN': 2, 'COUNT': 3}
+
+# the math functions that are built in, with their number of arguments.
+# MIN and MAX of an array and a number of elements are reductions instead.
+MATH_FUNCTIONS = {'SQRT': 1, 'EXP': 1, 'LOG': 1, 'SIN': 1, 'COS': 1,
+                  'ABS': 1, 'FLOOR': 1, 'CEIL': 1, 'POW': 2, 'MIN': 2, 'MAX': 2}
+
+# the math functions that always give a DOUBLE
+DOUBLE_FUNCTIONS = ('SQRT', 'EXP', 'LOG', 'SIN', 'COS')
+
 
 class PC_Parser:
     
@@ -31,7 +43,18 @@ class PC_Parser:
         self.ast             = []
         self.variable_types  = {}
         self.var_lengths     = {}
+        self.arrays          = {}
+        self.dynamic_arrays  = set()
+        self.array_dims      = {}
+        self.maps            = {}
+        self.records         = {}
+        self.record_arrays   = {}
+        self.references      = set()
+        self.mapped          = set()
+        self.files           = {}
         self.functions       = {}
+        self.function_args   = {}
+        self.io_functions    = set()
         self.scope           = ''
         
         self.Lexer = lexer()       
@@ -46,13 +69,46 @@ class PC_Parser:
         self.ast             = []
         self.variable_types  = {}
         self.var_lengths     = {}
+        self.arrays          = {}
+        self.dynamic_arrays  = set()
+        self.array_dims      = {}
+        self.maps            = {}
+        self.records         = {}
+        self.record_arrays   = {}
+        self.references      = set()
+        self.mapped          = set()
+        self.files           = {}
         self.functions       = {}
+        self.function_args   = {}
+        self.io_functions    = set()
         self.scope           = ''
 
         self.Parser.parse(input=text, lexer=self.Lexer)
 
         return self.ast
 
+    def check_scalar(self, node, context):
+        '''
+        Stops with an error if an expression uses a whole array, other than
+        as the argument of a subroutine, which check_args has checked
+        '''
+
+        passed = [arg for child in pc_analysis.expressions(node) if isinstance(child, pc_ast.Function_Call) for arg in child.args]
+
+        if any(isinstance(child, pc_ast.Array_Variable) and not any(child is arg for arg in passed)
+               for child in pc_analysis.expressions(node)):
+            print("A whole array cannot be used " + context)
+            sys.exit()
+
+    def check_field(self, element):
+        '''Stops with an error if an element of an array of records is used without picking a field'''
+
+        if isinstance(element, pc_ast.Array_Element) and isinstance(element.dType, pc_ast.Record_Decl):
+            record = element.dType
+            print(element.name + " holds " + record.name + " records, so one of their fields has to be picked, like "
+                  + element.name + "[...]." + record.fields[0][0])
+            sys.exit()
+
     def p_statement(self, p):
         '''statement : stmt_list'''
 
@@ -90,19 +146,34 @@ class PC_Parser:
     def p_for_stmt(self, p):
         '''for_stmt : FOR assignment_stmt TO expression NEWLINE stmt_list NEWLINE NEXT VAR'''
 
+        if isinstance(p[2], pc_ast.Array_Assignment):
+            print("The counter of a FOR loop cannot be an array")
+            sys.exit()
+
+        self.check_scalar(p[4], "as the end of a FOR loop")
+
         p[0] = pc_ast.For(p[2],p[4],p[6])
 
     def p_simple_stmt(self, p):
         '''simple_stmt : expression
                        | expr_list
-                       | arg_list
                        | assignment_stmt
                        | array_decl_stmt
+                       | file_decl_stmt
+                       | map_decl_stmt
+                       | record_stmt
                        | if_stmt
                        | while_stmt
                        | for_stmt
                        | output_stmt
                        | input_stmt
+                       | open_file_stmt
+                       | read_file_stmt
+                       | write_file_stmt
+                       | close_file_stmt
+                       | sort_stmt
+                       | append_stmt
+                       | sync_stmt
                        | function_stmt
                        | return_stmt'''
 
@@ -110,19 +181,207 @@ class PC_Parser:
 
     def p_array_decl_stmt(self, p):
         '''array_decl_stmt : DOUBLE array_index
-                           | INT array_index'''
+                           | INT array_index
+                           | VAR array_index'''
 
         if p[1] == 'DOUBLE':
             dType = float
         elif p[1] == 'INT':
             dType = int
+        elif p[1] in self.records:
+            dType = self.records[p[1]]
+        else:
+            print(p[1] + " is not a RECORD")
+            sys.exit()
+
+        if isinstance(p[2], pc_ast.Array_Element) and p[2].field is not None:
+            print("Syntax error at '.'")
+            sys.exit()
 
         name = p[2].name
         elements = p[2].index
 
+        self.check_reference(name, "declared again")
+
+        if (name, self.scope) in self.dynamic_arrays:
+            print(name + " was declared without a size, so it cannot be given one")
+            sys.exit()
+
+        dims = None
+
+        # an array with several dimensions is one block of elements, row
+        # after row, and an index into it is worked out from the sizes of
+        # all but the first dimension
+        if isinstance(elements, pc_ast.Flat_Index):
+            dims = elements.indices
+
+            for dim in dims:
+                if dim.dType != int:
+                    print("The sizes of an array must be INTs")
+                    sys.exit()
+
+            strides = []
+
+            for k, dim in enumerate(dims):
+                size = pc_analysis.constant_value(dim)
+
+                if size is None:
+                    strides.append(pc_ast.Variable(int, name + ".dim" + str(k), 0))
+                else:
+                    strides.append(pc_ast.Constant(int, max(size, 0), 0))
+
+            self.array_dims[(name, self.scope)] = strides
+
+            elements = dims[0]
+
+            for dim in dims[1:]:
+                elements = pc_ast.BinaryOp('*', elements, dim, int, 0)
+
+        self.variable_types[(name, self.scope)] = dType
+
+        # an array of records is only ever used a field at a time, so it
+        # is kept apart from the arrays whole-array statements work on
+        if isinstance(dType, pc_ast.Record_Decl):
+            self.record_arrays[(name, self.scope)] = dType
+        else:
+            self.arrays[(name, self.scope)] = dType
+
+        p[0] = pc_ast.Array_Declaration(dType, name, elements, dims)
+
+    def p_dynamic_array_decl_stmt(self, p):
+        '''array_decl_stmt : DOUBLE VAR LBRACKET RBRACKET
+                           | INT VAR LBRACKET RBRACKET'''
+
+        dType = float if p[1] == 'DOUBLE' else int
+        name = p[2]
+
+        self.check_reference(name, "declared again")
+
+        if (name, self.scope) in self.arrays and (name, self.scope) not in self.dynamic_arrays:
+            print(name + " was declared with a size, so it cannot be declared without one")
+            sys.exit()
+
         self.variable_types[(name, self.scope)] = dType
+        self.arrays[(name, self.scope)] = dType
+        self.dynamic_arrays.add((name, self.scope))
+
+        p[0] = pc_ast.Array_Declaration(dType, name, None)
+
+    def p_file_decl_stmt(self, p):
+        '''file_decl_stmt : array_decl_stmt FROM FILE expression
+                          | array_decl_stmt FROM FILE expression VAR'''
+
+        decl = p[1]
+
+        self.check_scalar(p[4], "as a file name")
+
+        if p[4].dType != str:
+            print("The file an array is mapped from must be given as a STRING")
+            sys.exit()
+
+        advice = p[5] if len(p) == 6 else None
+
+        if advice not in (None, 'SEQUENTIAL', 'RANDOM'):
+            print("The access to a file can be SEQUENTIAL or RANDOM, not " + advice)
+            sys.exit()
+
+        # without a size, the array has as many elements as the file holds
+        # and is not a growable array
+        self.dynamic_arrays.discard((decl.name, self.scope))
+        self.mapped.add((decl.name, self.scope))
+
+        decl.path = p[4]
+        decl.advice = advice
+
+        p[0] = decl
+
+    def p_sync_stmt(self, p):
+        '''sync_stmt : SYNC VAR'''
+
+        if (p[2], self.scope) not in self.mapped:
+            print("SYNC needs an array mapped from a file, but " + p[2] + " is not one")
+            sys.exit()
+
+        p[0] = pc_ast.Sync(self.variable_types[(p[2], self.scope)], p[2])
+
+    def p_map_decl_stmt(self, p):
+        '''map_decl_stmt : MAP VAR FROM map_type TO map_type'''
+
+        if p[4] not in (int, str):
+            print("The keys of a map must be INT or STRING")
+            sys.exit()
+
+        if p[6] not in (int, float):
+            print("The values of a map must be INT or DOUBLE")
+            sys.exit()
+
+        self.maps[(p[2], self.scope)] = (p[4], p[6])
+
+        p[0] = pc_ast.Map_Declaration(p[2], p[4], p[6])
+
+    def p_record_stmt(self, p):
+        '''record_stmt : RECORD VAR NEWLINE field_list NEWLINE ENDRECORD
+                       | RECORD VAR LAYOUT VAR NEWLINE field_list NEWLINE ENDRECORD'''
+
+        name = p[2]
+        fields = p[len(p) - 3]
+        layout = p[4] if len(p) == 9 else 'AOS'
+
+        if layout not in ('AOS', 'SOA'):
+            print("The LAYOUT of a record must be AOS or SOA, not " + layout)
+            sys.exit()
+
+        if name in self.records:
+            print("The record " + name + " is already defined")
+            sys.exit()
+
+        names = [field for field, dType in fields]
+
+        for field in names:
+            if names.count(field) > 1:
+                print(name + " has more than one field called " + field)
+                sys.exit()
+
+        self.records[name] = pc_ast.Record_Decl(name, fields, layout)
+
+        p[0] = self.records[name]
+
+    def p_field_list(self, p):
+        '''field_list : INT VAR
+                      | DOUBLE VAR
+                      | field_list NEWLINE INT VAR
+                      | field_list NEWLINE DOUBLE VAR'''
+
+        dType = int if p[len(p) - 2] == 'INT' else float
+
+        if len(p) == 3:
+            p[0] = [(p[2], dType)]
+        else:
+            p[0] = p[1] + [(p[4], dType)]
 
-        p[0] = pc_ast.Array_Declaration(dType, name, elements)
+    def p_map_type(self, p):
+        '''map_type : INT
+                    | DOUBLE
+                    | STRING'''
+
+        p[0] = {'INT': int, 'DOUBLE': float, 'STRING': str}[p[1]]
+
+    def map_key(self, name, key):
+        '''Checks that a map exists and that a key has the type of its keys'''
+
+        if (name, self.scope) not in self.maps:
+            print(name + " is not a map")
+            sys.exit()
+
+        self.check_scalar(key, "as a key")
+
+        key_type = self.maps[(name, self.scope)][0]
+
+        if key.dType != key_type:
+            print("The keys of " + name + " are " + ("INT" if key_type == int else "STRING"))
+            sys.exit()
+
+        return key_type
 
     def p_assignment_stmt(self, p):
         '''assignment_stmt : VAR EQUALS expression'''
@@ -132,6 +391,34 @@ class PC_Parser:
         expr = p[3]
         length = p[3].length
 
+        if (var, self.scope) in self.maps:
+            print("A whole map cannot be assigned to")
+            sys.exit()
+
+        if (var, self.scope) in self.record_arrays:
+            print("A whole array of records cannot be assigned to")
+            sys.exit()
+
+        if (var, self.scope) in self.files:
+            print(var + " is a file, so it cannot be assigned to")
+            sys.exit()
+
+        if self.variable_types.get((var, self.scope)) == str:
+            self.check_reference(var, "assigned to")
+
+        # assigning to a whole array works element by element
+        if (var, self.scope) in self.arrays:
+            array_type = self.arrays[(var, self.scope)]
+
+            if dType not in (int, float) or (array_type == int and dType == float):
+                print("Invalid operation")
+                sys.exit()
+
+            p[0] = pc_ast.Array_Assignment(array_type, var, expr)
+            return
+
+        self.check_scalar(expr, "in an assignment to a variable")
+
         self.variable_types[(var, self.scope)] = dType
         self.var_lengths[(var, self.scope)] = length
         var = pc_ast.Variable(dType, var,length)
@@ -140,6 +427,28 @@ class PC_Parser:
     def p_array_assign_stmt(self, p):
         '''assignment_stmt : array_index EQUALS expression'''
 
+        self.check_scalar(p[3], "in an assignment to an array element")
+
+        if isinstance(p[1], pc_ast.Map_Element):
+
+            if p[3].dType not in (int, float) or (p[1].dType == int and p[3].dType == float):
+                print("Invalid operation")
+                sys.exit()
+
+            p[0] = pc_ast.Map_Assignment(p[1].dType, p[1], p[3])
+            return
+
+        self.check_field(p[1])
+
+        if p[1].field is not None:
+
+            if p[3].dType not in (int, float) or (p[1].dType == int and p[3].dType == float):
+                print("Invalid operation")
+                sys.exit()
+
+            p[0] = pc_ast.Assignment("=", p[1].dType, p[1], p[3])
+            return
+
         if (p[1].name, self.scope) in self.variable_types:
             p[0] = pc_ast.Assignment("=", self.variable_types[(p[1].name, self.scope)], p[1], p[3])
         else:
@@ -150,29 +459,223 @@ class PC_Parser:
         '''input_stmt : INPUT VAR
                       | INPUT array_index'''
 
-        if isinstance(p[2], pc_ast.Array_Element):
-            name = p[2].name
+        p[0] = self.input_target(p[2], "INPUT")
+
+    def p_input_array_stmt(self, p):
+        '''input_stmt : INPUT VAR COMMA expression'''
+
+        array = self.array_count(p[2], p[4], "INPUT")
+
+        p[0] = pc_ast.Input(array, array.dType, None, p[4])
+
+    def array_count(self, name, count, statement):
+        '''
+        Checks the array and the number of its leading elements that an
+        INPUT or OUTPUT of a whole array works on, and returns the array
+        '''
+
+        if (name, self.scope) in self.record_arrays:
+            print(statement + " cannot work on a whole array of records")
+            sys.exit()
+
+        if (name, self.scope) not in self.arrays:
+            print(statement + " of several elements needs an array, but " + name + " is not one")
+            sys.exit()
+
+        self.check_scalar(count, "in " + statement)
+
+        if count.dType != int:
+            print("The number of elements given to " + statement + " must be an INT")
+            sys.exit()
+
+        return pc_ast.Array_Variable(self.arrays[(name, self.scope)], name, 0)
+
+    def separator(self, p, index):
+        '''The SEPARATOR written between the elements of an array, a newline if none is given'''
+
+        text = p[index] if len(p) > index else "\n"
+
+        if text == "":
+            print("The SEPARATOR between elements cannot be empty")
+            sys.exit()
+
+        return pc_ast.Constant(str, text, len(text) + 1)
+
+    def input_target(self, target, statement, file=None):
+        '''Builds an INPUT or READFILE of a variable or an array element'''
+
+        if isinstance(target, pc_ast.Map_Element):
+            print(statement + " cannot read into a map")
+            sys.exit()
+
+        if isinstance(target, pc_ast.Array_Element):
+            name = target.name
         else:
-            name = p[2]
+            name = target
         
         if (name, self.scope) not in self.variable_types:
             print("The variable " + name + " is undefined")
             sys.exit()
+
+        self.check_field(target)
+
+        if not isinstance(target, pc_ast.Array_Element) and self.variable_types[(name, self.scope)] == str:
+            self.check_reference(name, "read into")
+
+        if (name, self.scope) in self.record_arrays and not isinstance(target, pc_ast.Array_Element):
+            print(statement + " cannot read into a whole array of records")
+            sys.exit()
+
+        if isinstance(target, pc_ast.Array_Element) and target.field is not None:
+            return pc_ast.Input(target, target.dType, file)
             
-        if isinstance(p[2], pc_ast.Array_Element):
-             var = p[2]
+        if isinstance(target, pc_ast.Array_Element):
+             var = target
         else:
-            var = pc_ast.Variable(self.variable_types[(name, self.scope)], p[2],0)
+            var = pc_ast.Variable(self.variable_types[(name, self.scope)], target,0)
         
-        p[0] = pc_ast.Input(var, self.variable_types[(name, self.scope)])
+        return pc_ast.Input(var, self.variable_types[(name, self.scope)], file)
+
+    def check_file(self, name, reading):
+        '''Stops with an error if a file has not been opened to be read from, or written to'''
+
+        mode = self.files.get((name, self.scope))
+
+        if mode is None:
+            print(name + " is not a file opened with OPENFILE")
+            sys.exit()
+
+        if reading != (mode == 'READ'):
+            print("The file " + name + " is opened to " + mode + ", so it cannot be " + ("read from" if reading else "written to"))
+            sys.exit()
+
+    def p_open_file_stmt(self, p):
+        '''open_file_stmt : OPENFILE VAR COMMA expression COMMA VAR
+                          | OPENFILE VAR COMMA expression COMMA APPEND'''
+
+        name, mode = p[2], p[6]
+
+        if mode not in ('READ', 'WRITE', 'APPEND'):
+            print("A file can be opened to READ, WRITE or APPEND, not " + mode)
+            sys.exit()
+
+        if (name, self.scope) in self.variable_types or (name, self.scope) in self.maps:
+            print(name + " is already a variable, so it cannot be a file")
+            sys.exit()
+
+        # a file can be opened again, but not to both read and write
+        opened = self.files.get((name, self.scope))
+
+        if opened is not None and (opened == 'READ') != (mode == 'READ'):
+            print("The file " + name + " is already opened to " + opened + ", so it cannot be opened to " + mode)
+            sys.exit()
+
+        self.check_scalar(p[4], "as a file name")
+
+        if p[4].dType != str:
+            print("The name of a file must be given as a STRING")
+            sys.exit()
+
+        self.files[(name, self.scope)] = mode
+
+        p[0] = pc_ast.Open_File(name, p[4], mode)
+
+    def p_read_file_stmt(self, p):
+        '''read_file_stmt : READFILE VAR COMMA VAR
+                          | READFILE VAR COMMA array_index'''
+
+        self.check_file(p[2], True)
+
+        p[0] = self.input_target(p[4], "READFILE", p[2])
+
+    def p_read_file_array_stmt(self, p):
+        '''read_file_stmt : READFILE VAR COMMA VAR COMMA expression'''
+
+        self.check_file(p[2], True)
+
+        array = self.array_count(p[4], p[6], "READFILE")
+
+        p[0] = pc_ast.Input(array, array.dType, p[2], p[6])
+
+    def p_write_file_stmt(self, p):
+        '''write_file_stmt : WRITEFILE VAR COMMA expression'''
+
+        self.check_file(p[2], False)
+        self.check_scalar(p[4], "in WRITEFILE")
+
+        p[0] = pc_ast.Output(p[4], p[2])
+
+    def p_write_file_array_stmt(self, p):
+        '''write_file_stmt : WRITEFILE VAR COMMA VAR COMMA expression
+                           | WRITEFILE VAR COMMA VAR COMMA expression SEPARATOR STRING_CONST'''
+
+        self.check_file(p[2], False)
+
+        array = self.array_count(p[4], p[6], "WRITEFILE")
+
+        p[0] = pc_ast.Output(array, p[2], p[6], self.separator(p, 8))
+
+    def p_close_file_stmt(self, p):
+        '''close_file_stmt : CLOSEFILE VAR'''
+
+        if (p[2], self.scope) not in self.files:
+            print(p[2] + " is not a file opened with OPENFILE")
+            sys.exit()
+
+        p[0] = pc_ast.Close_File(p[2])
             
+    def p_sort_stmt(self, p):
+        '''sort_stmt : SORT VAR COMMA expression
+                     | SORT VAR COMMA expression DESCENDING'''
+
+        if (p[2], self.scope) not in self.arrays:
+            print("SORT needs an array, but " + p[2] + " is not one")
+            sys.exit()
+
+        self.check_scalar(p[4], "in SORT")
+
+        if p[4].dType != int:
+            print("The number of elements given to SORT must be an INT")
+            sys.exit()
+
+        p[0] = pc_ast.Sort(self.arrays[(p[2], self.scope)], p[2], p[4], len(p) == 6)
+
+    def p_append_stmt(self, p):
+        '''append_stmt : APPEND VAR COMMA expression'''
+
+        if (p[2], self.scope) not in self.dynamic_arrays:
+            print("APPEND needs an array declared without a size, like INT " + p[2] + "[], but " + p[2] + " is not one")
+            sys.exit()
+
+        self.check_scalar(p[4], "in APPEND")
+
+        dType = self.arrays[(p[2], self.scope)]
+
+        if p[4].dType not in (int, float) or (dType == int and p[4].dType == float):
+            print("Invalid operation")
+            sys.exit()
+
+        p[0] = pc_ast.Append(dType, p[2], p[4])
+
     def p_output_stmt(self, p):
         '''output_stmt : OUTPUT expression'''
 
+        self.check_scalar(p[2], "in OUTPUT")
+
         p[0] = pc_ast.Output(p[2])
+
+    def p_output_array_stmt(self, p):
+        '''output_stmt : OUTPUT VAR COMMA expression
+                       | OUTPUT VAR COMMA expression SEPARATOR STRING_CONST'''
+
+        array = self.array_count(p[2], p[4], "OUTPUT")
+
+        p[0] = pc_ast.Output(array, None, p[4], self.separator(p, 6))
         
     def p_return_stmt(self, p):
         '''return_stmt : RETURN expression'''
+
+        self.check_scalar(p[2], "in RETURN")
         
         p[0] = pc_ast.Return(p[2])
         
@@ -191,6 +694,7 @@ class PC_Parser:
         name = p[3]
         
         self.functions[name] = dType
+        self.function_args[name] = p[5] if len(p) == 7 else []
         self.var_lengths[(name, self.scope)] = 0
         
         self.scope = name
@@ -201,41 +705,98 @@ class PC_Parser:
         elif len(p) == 7:
             arg_list = p[5]
             
-            for arg in arg_list:
-                self.variable_types[(arg[0], self.scope)] = arg[1]
-                self.var_lengths[(arg[0], self.scope)] = 0
+            for arg_name, arg_type, array in arg_list:
+                self.variable_types[(arg_name, self.scope)] = arg_type
+                self.var_lengths[(arg_name, self.scope)] = 0
+
+                if array:
+                    self.arrays[(arg_name, self.scope)] = arg_type
+
+                if array or arg_type == str:
+                    self.references.add((arg_name, self.scope))
         
-        p[0] = [name, arg_list, dType]
+        p[0] = [name, arg_list, dType, False]
+
+    def p_memo_function_header(self, p):
+        '''function_header : MEMO function_header'''
+
+        p[0] = p[2][:3] + [True]
         
     def p_function_stmt(self, p):
         '''function_stmt : function_header NEWLINE stmt_list NEWLINE ENDSUBROUTINE'''
 
-        name, args, dType = p[1]
+        name, args, dType, memo = p[1]
         
         self.scope = ''
+
+        if pc_analysis.does_io(p[3]) or any(call.name in self.io_functions for call in pc_analysis.calls(p[3])):
+            self.io_functions.add(name)
+
+        if memo and name in self.io_functions:
+            print("MEMO subroutine " + name + " cannot do INPUT or OUTPUT")
+            sys.exit()
+
+        if memo and any(array or arg_type == str for arg_name, arg_type, array in args):
+            print("MEMO subroutine " + name + " can only take INT and DOUBLE arguments")
+            sys.exit()
         
-        p[0] = pc_ast.Function_Decl(name, args, p[3], dType)
+        p[0] = pc_ast.Function_Decl(name, args, p[3], dType, memo)
                    
     def p_arg_list(self, p):
-        '''arg_list : INT VAR
-                    | DOUBLE VAR
-                    | arg_list COMMA INT VAR
-                    | arg_list COMMA DOUBLE VAR'''
-        
-                    
-        if p[len(p) - 2] == 'INT':
-            dType = int
-            
-        elif p[len(p) - 2] == 'DOUBLE':
-            dType = float
-        
-        if len(p) == 3:
-            
-            p[0] = [[p[2], dType]]
-            
-        elif len(p) == 5:
+        '''arg_list : param
+                    | arg_list COMMA param'''
 
-            p[0] = p[1] + [[p[4], dType]]
+        if len(p) == 2:
+            p[0] = [p[1]]
+
+        elif len(p) == 4:
+            p[0] = p[1] + [p[3]]
+
+    def p_param(self, p):
+        '''param : INT VAR
+                 | DOUBLE VAR
+                 | STRING VAR
+                 | INT VAR LBRACKET RBRACKET
+                 | DOUBLE VAR LBRACKET RBRACKET'''
+
+        dType = {'INT': int, 'DOUBLE': float, 'STRING': str}[p[1]]
+
+        # arrays and strings are passed by reference, as their first
+        # element and their length
+        p[0] = [p[2], dType, len(p) == 5]
+
+    def check_reference(self, name, action):
+        '''Stops with an error if an array or string passed by reference would be replaced'''
+
+        if (name, self.scope) in self.references:
+            print(name + " is passed to " + self.scope + " by reference, so it cannot be " + action)
+            sys.exit()
+
+    def check_args(self, name, args):
+        '''Stops with an error if a call does not match the parameters of a subroutine'''
+
+        params = self.function_args[name]
+
+        if len(args) != len(params):
+            print(name + " takes " + str(len(params)) + (" argument" if len(params) == 1 else " arguments"))
+            sys.exit()
+
+        for arg, (param, dType, array) in zip(args, params):
+
+            if array and (not isinstance(arg, pc_ast.Array_Variable) or arg.dType != dType):
+                print("The argument for " + param + " of " + name + " must be " + ("an INT" if dType == int else "a DOUBLE") + " array")
+                sys.exit()
+
+            if not array:
+                self.check_scalar(arg, "as an argument")
+
+            if dType == str and arg.dType != str:
+                print("The argument for " + param + " of " + name + " must be a STRING")
+                sys.exit()
+
+            if dType != str and arg.dType == str:
+                print("The argument for " + param + " of " + name + " cannot be a STRING")
+                sys.exit()
             
     def p_expr_list(self, p):
         '''expr_list : expression COMMA expression
@@ -311,6 +872,8 @@ class PC_Parser:
             sys.exit()
 
         else:
+            self.check_scalar(p[1], "in a comparison")
+            self.check_scalar(p[3], "in a comparison")
 
             if p[2] == '<>':
                 p[2] = '!='
@@ -336,10 +899,31 @@ class PC_Parser:
         '''expression : VAR LPAREN expression RPAREN
                       | VAR LPAREN expr_list RPAREN
                       | VAR LPAREN RPAREN'''
+
+        args = [] if len(p) == 4 else p[3] if type(p[3]) == list else [p[3]]
+
+        if p[1] == 'LENGTH' and p[1] not in self.functions:
+            p[0] = self.array_length(args)
+            return
+
+        if p[1] == 'EOF' and p[1] not in self.functions:
+            p[0] = self.end_of_file(args)
+            return
+
+        if p[1] in MATH_FUNCTIONS and p[1] not in self.functions \
+           and not (p[1] in REDUCTIONS and args and isinstance(args[0], pc_ast.Array_Variable)):
+            p[0] = self.math_function(p[1], args)
+            return
+
+        if p[1] in REDUCTIONS and p[1] not in self.functions:
+            p[0] = self.array_reduction(p[1], args)
+            return
         
         if p[1] not in self.functions:
             print("Function has not been defined")
             sys.exit()
+
+        self.check_args(p[1], args)
         
         if len(p) == 5:
             
@@ -352,19 +936,169 @@ class PC_Parser:
         elif len(p) == 4:
             p[0] = pc_ast.Function_Call(p[1], [], self.functions[p[1]], 0)
         
+    def array_length(self, args):
+        '''Builds LENGTH(arr)'''
+
+        if len(args) != 1 or not isinstance(args[0], pc_ast.Array_Variable):
+            print("LENGTH takes an array")
+            sys.exit()
+
+        return pc_ast.Array_Length(int, args[0].name, 0)
+
+    def end_of_file(self, args):
+        '''Builds EOF(file)'''
+
+        if len(args) != 1 or not isinstance(args[0], pc_ast.Variable) or (args[0].name, self.scope) not in self.files:
+            print("EOF takes a file opened with OPENFILE")
+            sys.exit()
+
+        self.check_file(args[0].name, True)
+
+        return pc_ast.End_Of_File(int, args[0].name, 0)
+
+    def math_function(self, op, args):
+        '''
+        Builds SQRT(x), POW(x, y), ABS(x), MIN(x, y) and the other math
+        functions. SQRT, EXP, LOG, SIN and COS give a DOUBLE, and the others
+        give an INT when all of their arguments are INTs. An argument can be
+        a whole array when the result is assigned to a whole array.
+        '''
+
+        if len(args) != MATH_FUNCTIONS[op]:
+            print(op + (" takes one number" if MATH_FUNCTIONS[op] == 1 else " takes two numbers"))
+            sys.exit()
+
+        for arg in args:
+            self.check_field(arg)
+
+            if arg.dType not in (int, float):
+                print("The arguments of " + op + " must be numbers")
+                sys.exit()
+
+        if op in DOUBLE_FUNCTIONS or any(arg.dType == float for arg in args):
+            dType = float
+        else:
+            dType = int
+
+        return pc_ast.Math_Function(op, dType, args, 0)
+
+    def array_reduction(self, op, args):
+        '''Builds SUM(arr, n), MIN(arr, n), MAX(arr, n), ARGMIN(arr, n) or COUNT(arr, n, value)'''
+
+        if len(args) != REDUCTIONS[op]:
+            print(op + " takes an array, a number of elements and a value" if op == 'COUNT' else op + " takes an array and a number of elements")
+            sys.exit()
+
+        array, count = args[0], args[1]
+
+        if not isinstance(array, pc_ast.Array_Variable):
+            print("The first argument of " + op + " must be an array")
+            sys.exit()
+
+        self.check_scalar(count, "as an argument")
+
+        if count.dType != int:
+            print("The number of elements given to " + op + " must be an INT")
+            sys.exit()
+
+        value = None
+
+        if op == 'COUNT':
+            value = args[2]
+            self.check_scalar(value, "as an argument")
+
+            if value.dType not in (int, float):
+                print("Invalid operation")
+                sys.exit()
+
+        dType = array.dType if op in ('SUM', 'MIN', 'MAX') else int
+
+        return pc_ast.Array_Reduction(op, dType, array, count, value, 0)
+
+    def p_expression_map_contains(self, p):
+        '''expression : CONTAINS LPAREN VAR COMMA expression RPAREN'''
+
+        key_type = self.map_key(p[3], p[5])
+
+        p[0] = pc_ast.Map_Contains(int, p[3], p[5], key_type, 0)
+
+    def p_expression_map_size(self, p):
+        '''expression : SIZE LPAREN VAR RPAREN'''
+
+        if (p[3], self.scope) not in self.maps:
+            print(p[3] + " is not a map")
+            sys.exit()
+
+        p[0] = pc_ast.Map_Size(int, p[3], 0)
+
     def p_expression_array_expr(self, p):
         '''expression : array_index'''
 
+        self.check_field(p[1])
+
         p[0] = p[1]
 
+    def check_rank(self, name, count):
+        '''Stops with an error if an array is indexed with the wrong number of indexes'''
+
+        if (name, self.scope) in self.array_dims:
+            rank = len(self.array_dims[(name, self.scope)])
+        elif (name, self.scope) in self.arrays or (name, self.scope) in self.record_arrays:
+            rank = 1
+        else:
+            return
+
+        if rank != count:
+            print(name + " has " + str(rank) + (" dimension, so it needs 1 index" if rank == 1 else " dimensions, so it needs " + str(rank) + " indexes"))
+            sys.exit()
+
+    def p_expression_array_multi_val(self, p):
+        '''array_index : VAR LBRACKET expr_list RBRACKET'''
+
+        for index in p[3]:
+            self.check_scalar(index, "as an index")
+
+        self.check_rank(p[1], len(p[3]))
+
+        if (p[1], self.scope) in self.array_dims:
+            index = pc_ast.Flat_Index(int, p[1], p[3], self.array_dims[(p[1], self.scope)], 0)
+            p[0] = pc_ast.Array_Element(self.variable_types[(p[1], self.scope)], p[1], index, 0)
+        else:
+            p[0] = pc_ast.Array_Element(None, p[1], pc_ast.Flat_Index(int, p[1], p[3], None, 0), None)
+
     def p_expression_array_val(self, p):
         '''array_index : VAR LBRACKET expression RBRACKET'''
 
+        if (p[1], self.scope) in self.maps:
+            key_type = self.map_key(p[1], p[3])
+            p[0] = pc_ast.Map_Element(self.maps[(p[1], self.scope)][1], p[1], p[3], key_type, 0)
+            return
+
+        self.check_scalar(p[3], "as an index")
+        self.check_rank(p[1], 1)
+
         if (p[1], self.scope) in self.variable_types:
             p[0] = pc_ast.Array_Element(self.variable_types[(p[1], self.scope)], p[1], p[3], 0)
         else:
             p[0] = pc_ast.Array_Element(None, p[1], p[3], None)
             
+    def p_record_field(self, p):
+        '''array_index : array_index DOT VAR'''
+
+        element = p[1]
+
+        if not isinstance(element, pc_ast.Array_Element) or not isinstance(element.dType, pc_ast.Record_Decl):
+            print("Only the elements of an array of records have fields, so " + element.name + "[...]." + p[3] + " is not one")
+            sys.exit()
+
+        fields = dict(element.dType.fields)
+
+        if p[3] not in fields:
+            print("The record " + element.dType.name + " has no field " + p[3])
+            sys.exit()
+
+        p[0] = pc_ast.Array_Element(fields[p[3]], element.name, element.index, 0, element.dType, p[3])
+
     def p_expression_literal(self, p):
         '''expression : literal'''
         
@@ -388,7 +1122,18 @@ class PC_Parser:
     def p_expression_var(self, p):
         'expression : VAR'
 
-        if (p[1], self.scope) in self.variable_types:
+        if (p[1], self.scope) in self.maps:
+            print("A whole map cannot be used in an expression")
+            sys.exit()
+
+        if (p[1], self.scope) in self.record_arrays:
+            print("A whole array of records cannot be used in an expression")
+            sys.exit()
+
+        if (p[1], self.scope) in self.arrays:
+            p[0] = pc_ast.Array_Variable(self.arrays[(p[1], self.scope)], p[1], 0)
+
+        elif (p[1], self.scope) in self.variable_types:
             length = self.var_lengths[(p[1], self.scope)]
             p[0] = pc_ast.Variable(self.variable_types[(p[1], self.scope)],p[1],length)
             
@@ -0,0 +1,3160 @@
+#!/usr/bin/env python
+
+'''
+Runtime support routines for the generated code. Each routine is built
+straight into the module as LLVM IR the first time it is needed, so the
+compiled .ll file stays self-contained and can still be run through lli.
+'''
+
+from contextlib import contextmanager
+
+from llvmlite import ir
+
+__author__ = "Mugilan Ganesan"
+__email__ = "mugi.ganesan@gmail.com"
+__status__ = "Developer"
+__version__ = "1.0.0"
+
+
+VOID   = ir.VoidType()
+BOOL   = ir.IntType(1)
+CHAR   = ir.IntType(8)
+INT    = ir.IntType(32)
+LONG   = ir.IntType(64)
+DOUBLE = ir.DoubleType()
+PTR    = CHAR.as_pointer()
+
+MAX_THREADS = 64
+
+SC_NPROCESSORS_ONLN = 84
+
+MEMO_TABLE = ir.LiteralStructType([LONG.as_pointer(), LONG, LONG])
+
+# the characters (null-terminated once anything has been stored), the
+# length without the terminator and the allocated capacity
+STRING = ir.LiteralStructType([PTR, LONG, LONG])
+
+STRING_MIN_CAPACITY = 16
+
+# an array declared without a size keeps its elements, its length and
+# the number of elements it has room for
+DYNAMIC_ARRAY = ir.LiteralStructType([PTR, LONG, LONG])
+
+DYNAMIC_ARRAY_MIN_CAPACITY = 16
+
+# a map keeps one byte per slot with the entry's probe distance plus one
+# (0 for an empty slot), then the keys, the values as 8-byte cells that
+# hold either an INT or a DOUBLE, the number of entries and the capacity,
+# which is 0 or a power of two. A STRING key is its own copy of the
+# characters, the length and the hash.
+MAP            = ir.LiteralStructType([PTR, PTR, LONG.as_pointer(), LONG, LONG])
+MAP_STRING_KEY = ir.LiteralStructType([PTR, LONG, LONG])
+
+MAP_KEY_SIZE     = {"int": 4, "string": 24}
+MAP_MIN_CAPACITY = 16
+MAP_MAX_PROBE    = 255
+MAP_LOAD         = (7, 8) # grow before the map is more than 7/8 full
+
+FIBONACCI_HASH = 0x9E3779B97F4A7C15 - (1 << 64)
+FNV_OFFSET     = 0xCBF29CE484222325 - (1 << 64)
+FNV_PRIME      = 0x100000001B3
+
+# the arena hands out memory from regions chained through a header
+# holding the previous region and the region's size
+ARENA_REGION = 1 << 20
+ARENA_ALIGN  = 64
+ARENA_HEADER = ir.LiteralStructType([PTR, LONG])
+ARENA_MARK   = ir.LiteralStructType([PTR, PTR])
+
+STDERR = 2
+
+# the Linux values of the flags used to map arrays into memory
+O_RDONLY      = 0
+O_WRONLY      = 1
+O_RDWR        = 2
+O_CREAT       = 0o100
+O_TRUNC       = 0o1000
+O_APPEND      = 0o2000
+FILE_MODE     = 0o644
+SEEK_END      = 2
+PROT_RW       = 3
+MAP_SHARED    = 1
+MAP_PRIVATE   = 2
+MAP_ANONYMOUS = 0x20
+MS_SYNC       = 4
+
+MADVICE = {None: 0, 'RANDOM': 1, 'SEQUENTIAL': 2}
+MADV_HUGEPAGE = 14
+
+# heap arrays this large are mapped straight from the kernel
+LARGE_ARRAY = 1 << 26
+
+CACHE_LINE = 64
+
+STDIN  = 0
+STDOUT = 1
+
+# a buffered stream: its buffer, the position of the next unread byte,
+# the end of the data (or, when writing, the number of bytes waiting to
+# be written), the size of the buffer, the file descriptor, whether it
+# has run out, whether it is written to, the character that separates
+# values besides whitespace, and the next open file
+STREAM = ir.LiteralStructType([PTR, LONG, LONG, LONG, INT, BOOL, BOOL, CHAR, PTR])
+
+# files are read and written in blocks this large, and values in them
+# can also be separated by commas
+FILE_BUFFER    = 1 << 20
+FILE_SEPARATOR = ","
+
+FILE_MODES = {'READ': 0, 'WRITE': 1, 'APPEND': 2}
+
+OUTPUT_BUFFER = 1 << 16
+INT_DIGITS    = 12  # "-2147483648\n"
+DOUBLE_DIGITS = 512 # "%f" of the largest double is 316 characters
+
+DOUBLE_FAST_DIGITS = 19 # "-999999999.999999\n"
+
+INPUT_BUFFER = 1 << 16
+
+# partitions this small are finished with an insertion sort, and INT
+# arrays this large are radix sorted one byte at a time
+INSERTION_SORT_MAX = 16
+RADIX_SORT_MIN     = 1 << 7
+RADIX_BITS         = 8
+
+EXACT_MANTISSA = 1 << 53
+EXACT_POWER    = 22 # 10^22 is the largest power of ten a double holds exactly
+
+LIBC = {
+    'calloc':         (PTR,  [LONG, LONG], False),
+    'free':           (VOID, [PTR], False),
+    'realloc':        (PTR,  [PTR, LONG], False),
+    'getenv':         (PTR,  [PTR], False),
+    'atoi':           (INT,  [PTR], False),
+    'sysconf':        (LONG, [INT], False),
+    'pthread_create': (INT,  [LONG.as_pointer(), PTR,
+                              ir.FunctionType(PTR, [PTR]).as_pointer(), PTR], False),
+    'pthread_join':   (INT,  [LONG, PTR.as_pointer()], False),
+    'write':          (LONG, [INT, PTR, LONG], False),
+    'snprintf':       (INT,  [PTR, LONG, PTR], True),
+    'read':           (LONG, [INT, PTR, LONG], False),
+    'strtod':         (DOUBLE, [PTR, PTR.as_pointer()], False),
+    'dprintf':        (INT,  [INT, PTR], True),
+    'aligned_alloc':  (PTR,  [LONG, LONG], False),
+    'exit':           (VOID, [INT], False),
+    'memcmp':         (INT,  [PTR, PTR, LONG], False),
+    'open':           (INT,  [PTR, INT], True),
+    'close':          (INT,  [INT], False),
+    'lseek':          (LONG, [INT, LONG, INT], False),
+    'ftruncate':      (INT,  [INT, LONG], False),
+    'mmap':           (PTR,  [PTR, LONG, INT, INT, INT, LONG], False),
+    'madvise':        (INT,  [PTR, LONG, INT], False),
+    'msync':          (INT,  [PTR, LONG, INT], False),
+}
+
+
+@contextmanager
+def for_range(builder, start, stop, name="range", metadata=None):
+    '''
+    Emits a loop counting from start up to (but not including) stop and
+    yields the index. The builder is left positioned after the loop, and
+    metadata is attached to it as its llvm.loop properties.
+    '''
+
+    preheader = builder.block
+    cond = builder.append_basic_block(name=name + ".cond")
+    body = builder.append_basic_block(name=name + ".body")
+    end = builder.append_basic_block(name=name + ".end")
+
+    builder.branch(cond)
+    builder.position_at_end(cond)
+
+    index = builder.phi(start.type, name=name + ".i")
+    index.add_incoming(start, preheader)
+    builder.cbranch(builder.icmp_signed('<', index, stop), body, end)
+
+    builder.position_at_end(body)
+
+    yield index
+
+    index.add_incoming(builder.add(index, start.type(1)), builder.block)
+    latch = builder.branch(cond)
+
+    if metadata is not None:
+        latch.set_metadata("llvm.loop", metadata)
+
+    builder.position_at_end(end)
+
+
+class Runtime:
+
+    def __init__(self, module, alloc="malloc"):
+
+        self.module = module
+        self.alloc = alloc
+
+    def function(self, name):
+
+        return self.module.globals.get(name)
+
+    def define(self, name, ret, args):
+        '''Starts the definition of an internal runtime function'''
+
+        func = ir.Function(self.module, ir.FunctionType(ret, args), name=name)
+        func.linkage = "internal"
+
+        return func, ir.IRBuilder(func.append_basic_block(name="entry"))
+
+    def libc(self, name):
+        '''Declares a C library function the first time it is used'''
+
+        if name not in self.module.globals:
+            ret, args, var_arg = LIBC[name]
+            ir.Function(self.module, ir.FunctionType(ret, args, var_arg=var_arg), name=name)
+
+        return self.module.globals[name]
+
+    def global_variable(self, name, dType):
+        '''Returns an internal, zero-initialized global the runtime keeps its state in'''
+
+        if name not in self.module.globals:
+            variable = ir.GlobalVariable(self.module, dType, name)
+            variable.linkage = "internal"
+            variable.initializer = dType(None)
+
+        return self.module.globals[name]
+
+    def constant_array(self, name, dType, values):
+        '''Returns a pointer to the first element of a private constant table'''
+
+        if name not in self.module.globals:
+            value = ir.Constant(ir.ArrayType(dType, len(values)), [dType(v) for v in values])
+            table = ir.GlobalVariable(self.module, value.type, name)
+            table.global_constant = True
+            table.linkage = "private"
+            table.initializer = value
+
+        return self.module.globals[name]
+
+    def intrinsic(self, name, ret, args):
+        '''Declares an LLVM intrinsic that llvmlite does not know the signature of'''
+
+        if name not in self.module.globals:
+            ir.Function(self.module, ir.FunctionType(ret, args), name=name)
+
+        return self.module.globals[name]
+
+    def memcpy(self, builder, dst, src, size):
+
+        func = self.module.declare_intrinsic('llvm.memcpy', [PTR, PTR, LONG])
+        builder.call(func, [dst, src, size, BOOL(0)])
+
+    def memmove(self, builder, dst, src, size):
+
+        func = self.module.declare_intrinsic('llvm.memmove', [PTR, PTR, LONG])
+        builder.call(func, [dst, src, size, BOOL(0)])
+
+    def cstring(self, builder, text, name):
+        '''Returns an i8* to a private, null-terminated string constant'''
+
+        if name not in self.module.globals:
+            data = bytearray((text + "\0").encode("utf8"))
+            value = ir.Constant(ir.ArrayType(CHAR, len(data)), data)
+            string = ir.GlobalVariable(self.module, value.type, name)
+            string.global_constant = True
+            string.linkage = "private"
+            string.initializer = value
+
+        return builder.gep(self.module.globals[name], [INT(0), INT(0)], inbounds=True)
+
+    def thread_count(self, builder, work):
+        '''
+        The number of worker threads to use for `work` iterations: the
+        PC_NUM_THREADS environment variable if set, otherwise the number
+        of online processors, clamped to [1, min(work, MAX_THREADS)]
+        '''
+
+        env = builder.call(self.libc('getenv'), [self.cstring(builder, "PC_NUM_THREADS", "pc.env.threads")])
+        has_env = builder.icmp_unsigned('!=', env, PTR(None))
+
+        with builder.if_else(has_env) as (then, otherwise):
+            with then:
+                from_env = builder.call(self.libc('atoi'), [env])
+                env_block = builder.block
+            with otherwise:
+                cpus = builder.call(self.libc('sysconf'), [INT(SC_NPROCESSORS_ONLN)])
+                cpus = builder.trunc(cpus, INT)
+                cpu_block = builder.block
+
+        count = builder.phi(INT)
+        count.add_incoming(from_env, env_block)
+        count.add_incoming(cpus, cpu_block)
+
+        limit = builder.select(builder.icmp_signed('<', work, INT(MAX_THREADS)), work, INT(MAX_THREADS))
+        count = builder.select(builder.icmp_signed('<', count, limit), count, limit)
+        count = builder.select(builder.icmp_signed('<', count, INT(1)), INT(1), count)
+
+        return count
+
+    def parallel_for(self):
+        '''
+        i32 pc_parallel_for(worker, i8* ctx, i32 lo, i32 hi)
+
+        Splits [lo, hi) into one contiguous chunk per thread and runs
+        worker(ctx, chunk_lo, chunk_hi, thread) on each of them. Returns the
+        number of threads used, so that the caller can combine per-thread
+        partial results. A chunk whose thread cannot be created is run on
+        the calling thread instead.
+        '''
+
+        name = "pc_parallel_for"
+
+        if self.function(name):
+            return self.function(name)
+
+        worker_ty = ir.FunctionType(VOID, [PTR, INT, INT, INT]).as_pointer()
+        task_ty = ir.LiteralStructType([worker_ty, PTR, INT, INT, INT])
+
+        task = ir.Function(self.module, ir.FunctionType(PTR, [PTR]), name="pc_parallel_task")
+        task.linkage = "internal"
+        builder = ir.IRBuilder(task.append_basic_block(name="entry"))
+
+        args = builder.bitcast(task.args[0], task_ty.as_pointer())
+        fields = [builder.load(builder.gep(args, [INT(0), INT(i)], inbounds=True)) for i in range(5)]
+        builder.call(fields[0], fields[1:])
+        builder.ret(PTR(None))
+
+        func = ir.Function(self.module, ir.FunctionType(INT, [worker_ty, PTR, INT, INT]), name=name)
+        func.linkage = "internal"
+        worker, ctx, lo, hi = func.args
+        builder = ir.IRBuilder(func.append_basic_block(name="entry"))
+
+        tasks = builder.alloca(ir.ArrayType(task_ty, MAX_THREADS), name="tasks")
+        tids = builder.alloca(ir.ArrayType(LONG, MAX_THREADS), name="tids")
+
+        work = builder.sub(hi, lo, name="work")
+        threads = self.thread_count(builder, work)
+
+        wide_lo = builder.sext(lo, LONG)
+        wide_work = builder.sext(work, LONG)
+        wide_threads = builder.sext(threads, LONG)
+
+        with for_range(builder, INT(0), threads, name="spawn") as t:
+            wide_t = builder.sext(t, LONG)
+            start = builder.sdiv(builder.mul(wide_work, wide_t), wide_threads)
+            stop = builder.sdiv(builder.mul(wide_work, builder.add(wide_t, LONG(1))), wide_threads)
+            start = builder.trunc(builder.add(wide_lo, start), INT)
+            stop = builder.trunc(builder.add(wide_lo, stop), INT)
+
+            slot = builder.gep(tasks, [INT(0), t], inbounds=True)
+            for i, value in enumerate((worker, ctx, start, stop, t)):
+                builder.store(value, builder.gep(slot, [INT(0), INT(i)], inbounds=True))
+
+            tid = builder.gep(tids, [INT(0), t], inbounds=True)
+            status = builder.call(self.libc('pthread_create'), [tid, PTR(None), task, builder.bitcast(slot, PTR)])
+
+            with builder.if_then(builder.icmp_signed('!=', status, INT(0))):
+                builder.store(LONG(0), tid)
+                builder.call(worker, [ctx, start, stop, t])
+
+        with for_range(builder, INT(0), threads, name="join") as t:
+            tid = builder.load(builder.gep(tids, [INT(0), t], inbounds=True))
+
+            with builder.if_then(builder.icmp_unsigned('!=', tid, LONG(0))):
+                builder.call(self.libc('pthread_join'), [tid, PTR.as_pointer()(None)])
+
+        builder.ret(threads)
+
+        return func
+
+    def memo_slot(self):
+        '''
+        i64* pc_memo_slot(table, i64* key, i32 words)
+
+        Finds the slot of a memo table that holds `key`, or the empty slot
+        where it belongs, by linear probing. A slot is words + 2 i64s: a
+        used flag, the key and the memoized result. The table must not be
+        empty.
+        '''
+
+        name = "pc_memo_slot"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, LONG.as_pointer(), [MEMO_TABLE.as_pointer(), LONG.as_pointer(), INT])
+        table, key, words = func.args
+
+        slots = builder.load(builder.gep(table, [INT(0), INT(0)], inbounds=True))
+        capacity = builder.load(builder.gep(table, [INT(0), INT(1)], inbounds=True))
+        stride = builder.sext(builder.add(words, INT(2)), LONG)
+        mask = builder.sub(capacity, LONG(1))
+
+        hashed = builder.alloca(LONG, name="hash")
+        builder.store(LONG(0x9E3779B97F4A7C15 - (1 << 64)), hashed)
+
+        with for_range(builder, INT(0), words, name="mix") as w:
+            word = builder.load(builder.gep(key, [w], inbounds=True))
+            h = builder.mul(builder.xor(builder.load(hashed), word), LONG(0xFF51AFD7ED558CCD - (1 << 64)))
+            builder.store(builder.xor(h, builder.lshr(h, LONG(29))), hashed)
+
+        index = builder.alloca(LONG, name="index")
+        same = builder.alloca(BOOL, name="same")
+        builder.store(builder.and_(builder.load(hashed), mask), index)
+
+        probe = builder.append_basic_block(name="probe")
+        compare = builder.append_basic_block(name="compare")
+        found = builder.append_basic_block(name="found")
+        next_slot = builder.append_basic_block(name="next")
+
+        builder.branch(probe)
+        builder.position_at_end(probe)
+
+        slot = builder.gep(slots, [builder.mul(builder.load(index), stride)], inbounds=True, name="slot")
+        used = builder.load(slot)
+        builder.cbranch(builder.icmp_signed('==', used, LONG(0)), found, compare)
+
+        builder.position_at_end(compare)
+        builder.store(BOOL(1), same)
+
+        with for_range(builder, INT(0), words, name="cmp") as w:
+            stored = builder.load(builder.gep(slot, [builder.add(w, INT(1))], inbounds=True))
+            wanted = builder.load(builder.gep(key, [w], inbounds=True))
+            builder.store(builder.and_(builder.load(same), builder.icmp_signed('==', stored, wanted)), same)
+
+        builder.cbranch(builder.load(same), found, next_slot)
+
+        builder.position_at_end(next_slot)
+        builder.store(builder.and_(builder.add(builder.load(index), LONG(1)), mask), index)
+        builder.branch(probe)
+
+        builder.position_at_end(found)
+        builder.ret(slot)
+
+        return func
+
+    def memo_find(self):
+        '''
+        i64* pc_memo_find(table, i64* key, i32 words)
+
+        Returns a pointer to the result memoized for `key`, or null
+        '''
+
+        name = "pc_memo_find"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, LONG.as_pointer(), [MEMO_TABLE.as_pointer(), LONG.as_pointer(), INT])
+        table, key, words = func.args
+
+        capacity = builder.load(builder.gep(table, [INT(0), INT(1)], inbounds=True))
+
+        with builder.if_then(builder.icmp_signed('==', capacity, LONG(0))):
+            builder.ret(LONG.as_pointer()(None))
+
+        slot = builder.call(self.memo_slot(), [table, key, words])
+
+        with builder.if_then(builder.icmp_signed('==', builder.load(slot), LONG(0))):
+            builder.ret(LONG.as_pointer()(None))
+
+        builder.ret(builder.gep(slot, [builder.add(words, INT(1))], inbounds=True))
+
+        return func
+
+    def memo_store(self):
+        '''
+        void pc_memo_store(table, i64* key, i32 words, i64 result)
+
+        Memoizes `result` for `key`, doubling the table whenever it would
+        become more than half full
+        '''
+
+        name = "pc_memo_store"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [MEMO_TABLE.as_pointer(), LONG.as_pointer(), INT, LONG])
+        table, key, words, result = func.args
+
+        slots_ptr = builder.gep(table, [INT(0), INT(0)], inbounds=True)
+        capacity_ptr = builder.gep(table, [INT(0), INT(1)], inbounds=True)
+        count_ptr = builder.gep(table, [INT(0), INT(2)], inbounds=True)
+
+        stride = builder.sext(builder.add(words, INT(2)), LONG)
+        capacity = builder.load(capacity_ptr)
+        count = builder.load(count_ptr)
+
+        full = builder.icmp_signed('>', builder.mul(builder.add(count, LONG(1)), LONG(2)), capacity)
+
+        with builder.if_then(full):
+            old_slots = builder.load(slots_ptr)
+            grown = builder.mul(capacity, LONG(2))
+            grown = builder.select(builder.icmp_signed('<', grown, LONG(64)), LONG(64), grown)
+
+            raw = builder.call(self.libc('calloc'), [builder.mul(grown, stride), LONG(8)])
+            builder.store(builder.bitcast(raw, LONG.as_pointer()), slots_ptr)
+            builder.store(grown, capacity_ptr)
+
+            with for_range(builder, LONG(0), capacity, name="rehash") as i:
+                old = builder.gep(old_slots, [builder.mul(i, stride)], inbounds=True)
+
+                with builder.if_then(builder.icmp_signed('!=', builder.load(old), LONG(0))):
+                    old_key = builder.gep(old, [LONG(1)], inbounds=True)
+                    new = builder.call(self.memo_slot(), [table, old_key, words])
+
+                    with for_range(builder, LONG(0), stride, name="move") as w:
+                        builder.store(builder.load(builder.gep(old, [w], inbounds=True)),
+                                      builder.gep(new, [w], inbounds=True))
+
+            builder.call(self.libc('free'), [builder.bitcast(old_slots, PTR)])
+
+        slot = builder.call(self.memo_slot(), [table, key, words])
+
+        with builder.if_then(builder.icmp_signed('==', builder.load(slot), LONG(0))):
+            builder.store(LONG(1), slot)
+            builder.store(builder.add(builder.load(count_ptr), LONG(1)), count_ptr)
+
+            with for_range(builder, INT(0), words, name="copy") as w:
+                builder.store(builder.load(builder.gep(key, [w], inbounds=True)),
+                              builder.gep(slot, [builder.add(w, INT(1))], inbounds=True))
+
+        builder.store(result, builder.gep(slot, [builder.add(words, INT(1))], inbounds=True))
+        builder.ret_void()
+
+        return func
+
+
+    def stream(self, name, buffer_name, size, capacity, fd):
+        '''Returns a global stream over a static buffer of `size` bytes'''
+
+        if name not in self.module.globals:
+            buffer = self.global_variable(buffer_name, ir.ArrayType(CHAR, size))
+
+            stream = ir.GlobalVariable(self.module, STREAM, name)
+            stream.linkage = "internal"
+            stream.initializer = STREAM([buffer.gep([INT(0), INT(0)]), LONG(0), LONG(0), LONG(capacity), INT(fd),
+                                         BOOL(0), BOOL(fd == STDOUT), CHAR(ord(" ")), PTR(None)])
+
+        return self.module.globals[name]
+
+    def stdout(self):
+        '''The stream OUTPUT statements are formatted into'''
+
+        return self.stream("pc.stdout", "pc.out.buf", OUTPUT_BUFFER, OUTPUT_BUFFER, STDOUT)
+
+    def stdin(self):
+        '''The stream INPUT statements read from. Its data is always followed by a null byte.'''
+
+        return self.stream("pc.stdin", "pc.in.buf", INPUT_BUFFER + 1, INPUT_BUFFER, STDIN)
+
+    def stream_buffer(self, builder, stream):
+        '''
+        The buffer of a stream, and pointers to the position of its next
+        unread byte, to the end of its data and to whether it has run out
+        '''
+
+        buffer = builder.load(builder.gep(stream, [INT(0), INT(0)], inbounds=True))
+        position = builder.gep(stream, [INT(0), INT(1)], inbounds=True)
+        used = builder.gep(stream, [INT(0), INT(2)], inbounds=True)
+        eof = builder.gep(stream, [INT(0), INT(5)], inbounds=True)
+
+        return buffer, position, used, eof
+
+    def stream_field(self, builder, stream, index):
+        '''Loads a field of a stream: 3 is its capacity, 4 its file descriptor, 6 whether it is written to and 7 its separator'''
+
+        return builder.load(builder.gep(stream, [INT(0), INT(index)], inbounds=True))
+
+    def write_all(self):
+        '''
+        void pc_write_all(i32 fd, i8* data, i64 size)
+
+        Writes a whole block to a file descriptor, retrying short writes.
+        Output is dropped if the file is closed.
+        '''
+
+        name = "pc_write_all"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [INT, PTR, LONG])
+        fd, data, size = func.args
+
+        done = builder.alloca(LONG, name="done")
+        builder.store(LONG(0), done)
+
+        cond = builder.append_basic_block(name="cond")
+        body = builder.append_basic_block(name="body")
+        end = builder.append_basic_block(name="end")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+        builder.cbranch(builder.icmp_signed('<', builder.load(done), size), body, end)
+
+        builder.position_at_end(body)
+        start = builder.gep(data, [builder.load(done)], inbounds=True)
+        written = builder.call(self.libc('write'), [fd, start, builder.sub(size, builder.load(done))])
+        builder.store(builder.add(builder.load(done), written), done)
+        builder.cbranch(builder.icmp_signed('>', written, LONG(0)), cond, end)
+
+        builder.position_at_end(end)
+        builder.ret_void()
+
+        return func
+
+    def flush_stream(self):
+        '''
+        void pc_stream_flush(stream* s)
+
+        Writes out everything buffered in a stream that is written to
+        '''
+
+        name = "pc_stream_flush"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STREAM.as_pointer()])
+        stream = func.args[0]
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+
+        size = builder.load(used)
+
+        with builder.if_then(builder.icmp_signed('>', size, LONG(0))):
+            builder.call(self.write_all(), [self.stream_field(builder, stream, 4), buffer, size])
+            builder.store(LONG(0), used)
+
+        builder.ret_void()
+
+        return func
+
+    def flush(self):
+        '''
+        void pc_flush()
+
+        Writes out everything buffered by OUTPUT statements. It is called
+        before every INPUT, so that prompts appear, and when the program ends.
+        '''
+
+        name = "pc_flush"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [])
+        buffer, position, used, eof = self.stream_buffer(builder, self.stdout())
+
+        with builder.if_then(builder.icmp_signed('>', builder.load(used), LONG(0))):
+            builder.call(self.flush_stream(), [self.stdout()])
+
+        builder.ret_void()
+
+        return func
+
+    def reserve(self):
+        '''
+        i8* pc_out_reserve(stream* s, i64 size)
+
+        Returns the end of the buffer of a stream, flushing it first if
+        fewer than `size` bytes are free. The caller adds what it wrote to
+        the amount of data in the stream.
+        '''
+
+        name = "pc_out_reserve"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, PTR, [STREAM.as_pointer(), LONG])
+        stream, size = func.args
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+
+        full = builder.icmp_signed('>', builder.add(builder.load(used), size), self.stream_field(builder, stream, 3))
+
+        with builder.if_then(full):
+            builder.call(self.flush_stream(), [stream])
+
+        builder.ret(builder.gep(buffer, [builder.load(used)], inbounds=True))
+
+        return func
+
+    def digits(self, builder, digits, end, value, minimum):
+        '''
+        Writes the decimal digits of the unsigned i64 `value` into the
+        [N x i8] alloca `digits`, ending just before index `end` and
+        zero-padded to at least `minimum` digits. Returns the index of the
+        first digit.
+        '''
+
+        preheader = builder.block
+        body = builder.append_basic_block(name="digit")
+        done = builder.append_basic_block(name="digits.end")
+
+        builder.branch(body)
+        builder.position_at_end(body)
+
+        rest = builder.phi(LONG, name="rest")
+        index = builder.phi(LONG, name="index")
+        rest.add_incoming(value, preheader)
+        index.add_incoming(end, preheader)
+
+        position = builder.sub(index, LONG(1))
+        digit = builder.trunc(builder.urem(rest, LONG(10)), CHAR)
+        builder.store(builder.add(digit, CHAR(ord("0"))), builder.gep(digits, [INT(0), position], inbounds=True))
+
+        quotient = builder.udiv(rest, LONG(10))
+        rest.add_incoming(quotient, body)
+        index.add_incoming(position, body)
+
+        more = builder.icmp_unsigned('!=', quotient, LONG(0))
+        short = builder.icmp_signed('>', position, builder.sub(end, LONG(minimum)))
+        builder.cbranch(builder.or_(more, short), body, done)
+
+        builder.position_at_end(done)
+
+        return position
+
+    def write_digits(self, builder, stream, digits, first, negative):
+        '''
+        Prefixes a minus sign if `negative` and appends digits[first:] to
+        the buffer of a stream
+        '''
+
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+        size = digits.type.pointee.count
+
+        # the buffers always leave room for the sign, so it is stored
+        # unconditionally and only included in the output if negative
+        signed = builder.sub(first, LONG(1))
+        builder.store(CHAR(ord("-")), builder.gep(digits, [INT(0), signed], inbounds=True))
+        first = builder.select(negative, signed, first)
+
+        length = builder.sub(LONG(size), first)
+
+        out = builder.call(self.reserve(), [stream, LONG(size)])
+        self.memcpy(builder, out, builder.gep(digits, [INT(0), first], inbounds=True), length)
+        builder.store(builder.add(builder.load(used), length), used)
+
+    def write_int(self):
+        '''
+        void pc_write_int(stream* s, i32 value, i8 end)
+
+        Appends a decimal integer and the character `end` to the buffer of
+        a stream
+        '''
+
+        name = "pc_write_int"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STREAM.as_pointer(), INT, CHAR])
+        stream, value, end = func.args
+
+        digits = builder.alloca(ir.ArrayType(CHAR, INT_DIGITS), name="digits")
+
+        value = builder.sext(value, LONG)
+        negative = builder.icmp_signed('<', value, LONG(0))
+        magnitude = builder.select(negative, builder.neg(value), value)
+
+        builder.store(end, builder.gep(digits, [INT(0), INT(INT_DIGITS - 1)], inbounds=True))
+
+        first = self.digits(builder, digits, LONG(INT_DIGITS - 1), magnitude, 1)
+        self.write_digits(builder, stream, digits, first, negative)
+        builder.ret_void()
+
+        return func
+
+    def write_double(self):
+        '''
+        void pc_write_double(stream* s, double value, i8 end)
+
+        Appends a double, formatted like printf's "%f", and the character
+        `end` to the buffer of a stream. Values below 1e9 are scaled to an integer count
+        of millionths and printed directly whenever the rounding error of
+        the scaling cannot change the last digit; everything else goes
+        through snprintf.
+        '''
+
+        name = "pc_write_double"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STREAM.as_pointer(), DOUBLE, CHAR])
+        stream, value, end = func.args
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+
+        digits = builder.alloca(ir.ArrayType(CHAR, DOUBLE_FAST_DIGITS), name="digits")
+
+        fabs = self.module.declare_intrinsic('llvm.fabs', [DOUBLE])
+        floor = self.module.declare_intrinsic('llvm.floor', [DOUBLE])
+
+        # below 1e15 the scaled value is off by at most 1/16, so it rounds
+        # the same way as the exact value unless it is that close to a half
+        scaled = builder.fmul(builder.call(fabs, [value]), DOUBLE(1e6))
+        whole = builder.call(floor, [scaled])
+        fraction = builder.fsub(scaled, whole)
+        tie = builder.call(fabs, [builder.fsub(fraction, DOUBLE(0.5))])
+
+        fast = builder.and_(builder.fcmp_ordered('<', scaled, DOUBLE(1e15)),
+                            builder.fcmp_ordered('>', tie, DOUBLE(0.0625)))
+
+        with builder.if_else(fast) as (then, otherwise):
+            with then:
+                millionths = builder.fptoui(whole, LONG)
+                millionths = builder.add(millionths, builder.zext(builder.fcmp_ordered('>', fraction, DOUBLE(0.5)), LONG))
+                negative = builder.icmp_signed('<', builder.bitcast(value, LONG), LONG(0))
+
+                builder.store(end, builder.gep(digits, [INT(0), INT(DOUBLE_FAST_DIGITS - 1)], inbounds=True))
+
+                point = self.digits(builder, digits, LONG(DOUBLE_FAST_DIGITS - 1), builder.urem(millionths, LONG(1000000)), 6)
+                point = builder.sub(point, LONG(1))
+                builder.store(CHAR(ord(".")), builder.gep(digits, [INT(0), point], inbounds=True))
+
+                first = self.digits(builder, digits, point, builder.udiv(millionths, LONG(1000000)), 1)
+                self.write_digits(builder, stream, digits, first, negative)
+
+            with otherwise:
+                out = builder.call(self.reserve(), [stream, LONG(DOUBLE_DIGITS)])
+                fmt = self.cstring(builder, "%f%c", "pc.fmt.double")
+                size = builder.call(self.libc('snprintf'), [out, LONG(DOUBLE_DIGITS), fmt, value, builder.zext(end, INT)])
+
+                builder.store(builder.add(builder.load(used), builder.sext(size, LONG)), used)
+
+        builder.ret_void()
+
+        return func
+
+    def write_text(self):
+        '''
+        void pc_write_text(stream* s, i8* text, i64 size)
+
+        Appends `size` characters to the buffer of a stream. Text that does
+        not fit in the buffer is written directly.
+        '''
+
+        name = "pc_write_text"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STREAM.as_pointer(), PTR, LONG])
+        stream, text, size = func.args
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+
+        with builder.if_then(builder.icmp_signed('>=', size, self.stream_field(builder, stream, 3))):
+            builder.call(self.flush_stream(), [stream])
+            builder.call(self.write_all(), [self.stream_field(builder, stream, 4), text, size])
+            builder.ret_void()
+
+        out = builder.call(self.reserve(), [stream, size])
+        self.memcpy(builder, out, text, size)
+        builder.store(builder.add(builder.load(used), size), used)
+        builder.ret_void()
+
+        return func
+
+    def write_string(self):
+        '''
+        void pc_write_string(stream* s, i8* text, i64 size, i8 end)
+
+        Appends `size` characters and the character `end` to the buffer of
+        a stream
+        '''
+
+        name = "pc_write_string"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STREAM.as_pointer(), PTR, LONG, CHAR])
+        stream, text, size, end = func.args
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+
+        builder.call(self.write_text(), [stream, text, size])
+
+        out = builder.call(self.reserve(), [stream, LONG(1)])
+        builder.store(end, out)
+        builder.store(builder.add(builder.load(used), LONG(1)), used)
+        builder.ret_void()
+
+        return func
+
+    def write_array(self, element):
+        '''
+        void pc_write_array_int(stream* s, i32* a, i64 n, i8* separator, i64 size)
+        void pc_write_array_double(stream* s, double* a, i64 n, i8* separator, i64 size)
+
+        Appends the first n elements of an array to the buffer of a stream
+        on one line, with the separator between them
+        '''
+
+        name = "pc_write_array_" + ("double" if element == DOUBLE else "int")
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STREAM.as_pointer(), element.as_pointer(), LONG, PTR, LONG])
+        stream, array, count, separator, size = func.args
+
+        write = self.write_double() if element == DOUBLE else self.write_int()
+        first = builder.load(separator)
+        last = builder.sub(count, LONG(1))
+
+        # the first character of the separator ends each element the same
+        # way the newline ends the last one, and the rest is copied after it
+        with for_range(builder, LONG(0), count, name="element") as i:
+            end = builder.icmp_signed('==', i, last)
+            builder.call(write, [stream, builder.load(builder.gep(array, [i], inbounds=True)),
+                                 builder.select(end, CHAR(ord("\n")), first)])
+
+            with builder.if_then(builder.and_(builder.not_(end), builder.icmp_signed('>', size, LONG(1)))):
+                builder.call(self.write_text(), [stream, builder.gep(separator, [LONG(1)], inbounds=True),
+                                                 builder.sub(size, LONG(1))])
+
+        builder.ret_void()
+
+        return func
+
+    def is_space(self, builder, char):
+        '''Whether a character is one of the whitespace characters scanf skips'''
+
+        control = builder.icmp_unsigned('<=', builder.sub(char, CHAR(9)), CHAR(13 - 9))
+
+        return builder.or_(builder.icmp_unsigned('==', char, CHAR(ord(" "))), control)
+
+    def is_separator(self, builder, char, separator):
+        '''Whether a character is whitespace or the separator of a stream'''
+
+        return builder.or_(self.is_space(builder, char), builder.icmp_unsigned('==', char, separator))
+
+    def is_digit(self, builder, char):
+
+        return builder.icmp_unsigned('<=', builder.sub(char, CHAR(ord("0"))), CHAR(9))
+
+    def fill(self):
+        '''
+        void pc_in_fill(stream* s)
+
+        Moves the unread input of a stream to the start of its buffer and
+        makes one read() call to fill the rest. A single read returns as
+        soon as a line has been typed, so interactive programs never wait
+        for more input than they asked for.
+        '''
+
+        name = "pc_in_fill"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STREAM.as_pointer()])
+        stream = func.args[0]
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+
+        keep = builder.sub(builder.load(used), builder.load(position))
+
+        self.memmove(builder, buffer, builder.gep(buffer, [builder.load(position)], inbounds=True), keep)
+        builder.store(LONG(0), position)
+
+        free = builder.gep(buffer, [keep], inbounds=True)
+        room = builder.sub(self.stream_field(builder, stream, 3), keep)
+        size = builder.call(self.libc('read'), [self.stream_field(builder, stream, 4), free, room])
+        size = builder.select(builder.icmp_signed('>', size, LONG(0)), size, LONG(0))
+
+        builder.store(builder.icmp_signed('==', size, LONG(0)), eof)
+        builder.store(builder.add(keep, size), used)
+        builder.store(CHAR(0), builder.gep(buffer, [builder.add(keep, size)], inbounds=True))
+        builder.ret_void()
+
+        return func
+
+    def token(self):
+        '''
+        i8* pc_in_token(stream* s)
+
+        Skips separators and makes sure the whole of the next token is in
+        the buffer, followed by a separator or the null byte. Returns a
+        pointer to it, or null at the end of the input. A token longer
+        than the buffer is cut short.
+        '''
+
+        name = "pc_in_token"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, PTR, [STREAM.as_pointer()])
+        stream = func.args[0]
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+        separator = self.stream_field(builder, stream, 7)
+
+        skip = builder.append_basic_block(name="skip")
+        space = builder.append_basic_block(name="space")
+        refill = builder.append_basic_block(name="refill")
+        found = builder.append_basic_block(name="found")
+        scan = builder.append_basic_block(name="scan")
+        more = builder.append_basic_block(name="more")
+        done = builder.append_basic_block(name="done")
+        extend = builder.append_basic_block(name="extend")
+
+        builder.branch(skip)
+
+        builder.position_at_end(skip)
+        pos = builder.load(position)
+        builder.cbranch(builder.icmp_signed('<', pos, builder.load(used)), space, refill)
+
+        builder.position_at_end(space)
+        char = builder.load(builder.gep(buffer, [pos], inbounds=True))
+        with builder.if_then(self.is_separator(builder, char, separator)):
+            builder.store(builder.add(pos, LONG(1)), position)
+            builder.branch(skip)
+        builder.branch(found)
+
+        builder.position_at_end(refill)
+        with builder.if_then(builder.load(eof)):
+            builder.ret(PTR(None))
+        builder.call(self.fill(), [stream])
+        builder.branch(skip)
+
+        builder.position_at_end(found)
+        start = builder.load(position)
+        builder.branch(scan)
+
+        builder.position_at_end(scan)
+        end = builder.phi(LONG, name="end")
+        end.add_incoming(start, found)
+        inside = builder.icmp_signed('<', end, builder.load(used))
+        builder.cbranch(inside, more, done)
+
+        builder.position_at_end(more)
+        char = builder.load(builder.gep(buffer, [end], inbounds=True))
+        end.add_incoming(builder.add(end, LONG(1)), more)
+        builder.cbranch(self.is_separator(builder, char, separator), extend, scan)
+
+        # the token ends at the end of the data, so it may continue in input
+        # that has not been read yet
+        builder.position_at_end(done)
+        whole = builder.or_(builder.load(eof), builder.icmp_signed('==', builder.sub(end, start), self.stream_field(builder, stream, 3)))
+        with builder.if_then(builder.not_(whole)):
+            builder.call(self.fill(), [stream])
+            builder.branch(found)
+        builder.branch(extend)
+
+        builder.position_at_end(extend)
+        builder.ret(builder.gep(buffer, [builder.load(position)], inbounds=True))
+
+        return func
+
+    def read_int(self):
+        '''
+        i1 pc_read_int(stream* s, i32* dest)
+
+        Reads an optionally signed decimal integer. Like scanf, it returns
+        false and leaves dest and the input alone if there is no number.
+        '''
+
+        name = "pc_read_int"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, BOOL, [STREAM.as_pointer(), INT.as_pointer()])
+        stream, dest = func.args
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+
+        text = builder.call(self.token(), [stream])
+
+        with builder.if_then(builder.icmp_unsigned('==', text, PTR(None))):
+            builder.ret(BOOL(0))
+
+        first = builder.load(text)
+        negative = builder.icmp_unsigned('==', first, CHAR(ord("-")))
+        signed = builder.or_(negative, builder.icmp_unsigned('==', first, CHAR(ord("+"))))
+        start = builder.zext(signed, LONG)
+
+        preheader = builder.block
+        cond = builder.append_basic_block(name="cond")
+        body = builder.append_basic_block(name="body")
+        end = builder.append_basic_block(name="end")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+
+        index = builder.phi(LONG, name="index")
+        value = builder.phi(LONG, name="value")
+        index.add_incoming(start, preheader)
+        value.add_incoming(LONG(0), preheader)
+
+        char = builder.load(builder.gep(text, [index], inbounds=True))
+        builder.cbranch(self.is_digit(builder, char), body, end)
+
+        builder.position_at_end(body)
+        digit = builder.zext(builder.sub(char, CHAR(ord("0"))), LONG)
+        index.add_incoming(builder.add(index, LONG(1)), body)
+        value.add_incoming(builder.add(builder.mul(value, LONG(10)), digit), body)
+        builder.branch(cond)
+
+        builder.position_at_end(end)
+
+        with builder.if_then(builder.icmp_signed('==', index, start)):
+            builder.ret(BOOL(0))
+
+        value = builder.select(negative, builder.neg(value), value)
+        builder.store(builder.trunc(value, INT), dest)
+        builder.store(builder.add(builder.load(position), index), position)
+        builder.ret(BOOL(1))
+
+        return func
+
+    def read_double(self):
+        '''
+        i1 pc_read_double(stream* s, double* dest)
+
+        Reads a decimal number with an optional fraction and exponent.
+        When the digits fit in 53 bits and the power of ten is exact, one
+        multiplication or division gives the correctly rounded result;
+        every other token is handed to strtod.
+        '''
+
+        name = "pc_read_double"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, BOOL, [STREAM.as_pointer(), DOUBLE.as_pointer()])
+        stream, dest = func.args
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+        separator = self.stream_field(builder, stream, 7)
+
+        index = builder.alloca(LONG, name="index")
+        mantissa = builder.alloca(LONG, name="mantissa")
+        digits = builder.alloca(LONG, name="digits")
+        scale = builder.alloca(LONG, name="scale")
+        exponent = builder.alloca(LONG, name="exponent")
+        stop = builder.alloca(PTR, name="stop")
+
+        text = builder.call(self.token(), [stream])
+
+        with builder.if_then(builder.icmp_unsigned('==', text, PTR(None))):
+            builder.ret(BOOL(0))
+
+        def char_at():
+            return builder.load(builder.gep(text, [builder.load(index)], inbounds=True))
+
+        def advance():
+            builder.store(builder.add(builder.load(index), LONG(1)), index)
+
+        def take_digits(fraction):
+            '''Accumulates a run of digits; digits past the 19th only move the scale'''
+
+            cond = builder.append_basic_block(name="digits.cond")
+            body = builder.append_basic_block(name="digits.body")
+            end = builder.append_basic_block(name="digits.end")
+
+            builder.branch(cond)
+            builder.position_at_end(cond)
+            char = char_at()
+            builder.cbranch(self.is_digit(builder, char), body, end)
+
+            builder.position_at_end(body)
+            digit = builder.zext(builder.sub(char, CHAR(ord("0"))), LONG)
+            count = builder.load(digits)
+            room = builder.icmp_signed('<', count, LONG(19))
+
+            with builder.if_else(room) as (then, otherwise):
+                with then:
+                    builder.store(builder.add(builder.mul(builder.load(mantissa), LONG(10)), digit), mantissa)
+                    builder.store(builder.select(builder.icmp_signed('==', builder.load(mantissa), LONG(0)), count, builder.add(count, LONG(1))), digits)
+                    if fraction:
+                        builder.store(builder.sub(builder.load(scale), LONG(1)), scale)
+                with otherwise:
+                    if not fraction:
+                        builder.store(builder.add(builder.load(scale), LONG(1)), scale)
+
+            advance()
+            builder.branch(cond)
+
+            builder.position_at_end(end)
+
+        first = builder.load(text)
+        negative = builder.icmp_unsigned('==', first, CHAR(ord("-")))
+        signed = builder.or_(negative, builder.icmp_unsigned('==', first, CHAR(ord("+"))))
+
+        builder.store(builder.zext(signed, LONG), index)
+        builder.store(LONG(0), mantissa)
+        builder.store(LONG(0), digits)
+        builder.store(LONG(0), scale)
+        builder.store(LONG(0), exponent)
+
+        start = builder.load(index)
+        take_digits(False)
+        whole = builder.sub(builder.load(index), start)
+
+        with builder.if_then(builder.icmp_unsigned('==', char_at(), CHAR(ord(".")))):
+            advance()
+            take_digits(True)
+
+        # a number needs a digit before or after the point
+        point = builder.zext(builder.icmp_signed('!=', builder.load(index), builder.add(start, whole)), LONG)
+        seen = builder.icmp_signed('>', builder.sub(builder.sub(builder.load(index), start), point), LONG(0))
+
+        char = char_at()
+        marker = builder.or_(builder.icmp_unsigned('==', char, CHAR(ord("e"))), builder.icmp_unsigned('==', char, CHAR(ord("E"))))
+
+        with builder.if_then(builder.and_(seen, marker)):
+            mark = builder.load(index)
+            advance()
+
+            sign = char_at()
+            minus = builder.icmp_unsigned('==', sign, CHAR(ord("-")))
+            with builder.if_then(builder.or_(minus, builder.icmp_unsigned('==', sign, CHAR(ord("+"))))):
+                advance()
+
+            cond = builder.append_basic_block(name="exp.cond")
+            body = builder.append_basic_block(name="exp.body")
+            end = builder.append_basic_block(name="exp.end")
+            digits_start = builder.load(index)
+
+            builder.branch(cond)
+            builder.position_at_end(cond)
+            char = char_at()
+            builder.cbranch(self.is_digit(builder, char), body, end)
+
+            builder.position_at_end(body)
+            value = builder.add(builder.mul(builder.load(exponent), LONG(10)), builder.zext(builder.sub(char, CHAR(ord("0"))), LONG))
+            builder.store(builder.select(builder.icmp_signed('<', value, LONG(100000)), value, LONG(100000)), exponent)
+            advance()
+            builder.branch(cond)
+
+            builder.position_at_end(end)
+            # "1e" or "1e+" is the number 1 followed by other text
+            with builder.if_then(builder.icmp_signed('==', builder.load(index), digits_start)):
+                builder.store(mark, index)
+            builder.store(builder.select(minus, builder.neg(builder.load(exponent)), builder.load(exponent)), exponent)
+
+        power = builder.add(builder.load(scale), builder.load(exponent))
+        small = builder.icmp_unsigned('<=', builder.load(mantissa), LONG(EXACT_MANTISSA))
+        exact = builder.icmp_unsigned('<=', builder.add(power, LONG(EXACT_POWER)), LONG(2 * EXACT_POWER))
+        ended = self.is_separator(builder, char_at(), separator)
+        ended = builder.or_(ended, builder.icmp_unsigned('==', char_at(), CHAR(0)))
+
+        fast = builder.and_(builder.and_(seen, ended), builder.and_(small, exact))
+
+        with builder.if_else(fast) as (then, otherwise):
+            with then:
+                powers = self.constant_array("pc.pow10", DOUBLE, [10.0 ** i for i in range(EXACT_POWER + 1)])
+                magnitude = builder.select(builder.icmp_signed('<', power, LONG(0)), builder.neg(power), power)
+                factor = builder.load(builder.gep(powers, [INT(0), magnitude], inbounds=True))
+                value = builder.uitofp(builder.load(mantissa), DOUBLE)
+
+                value = builder.select(builder.icmp_signed('<', power, LONG(0)),
+                                       builder.fdiv(value, factor), builder.fmul(value, factor))
+                value = builder.select(negative, builder.fneg(value), value)
+
+                builder.store(value, dest)
+                builder.store(builder.add(builder.load(position), builder.load(index)), position)
+
+            with otherwise:
+                value = builder.call(self.libc('strtod'), [text, stop])
+                size = builder.sub(builder.ptrtoint(builder.load(stop), LONG), builder.ptrtoint(text, LONG))
+
+                with builder.if_then(builder.icmp_signed('==', size, LONG(0))):
+                    builder.ret(BOOL(0))
+
+                builder.store(value, dest)
+                builder.store(builder.add(builder.load(position), size), position)
+
+        builder.ret(BOOL(1))
+
+        return func
+
+    def read_string(self):
+        '''
+        i1 pc_read_string(stream* s, string* dest)
+
+        Stores the next word in dest, up to whitespace or the separator of
+        the stream
+        '''
+
+        name = "pc_read_string"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, BOOL, [STREAM.as_pointer(), STRING.as_pointer()])
+        stream, dest = func.args
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+        separator = self.stream_field(builder, stream, 7)
+
+        text = builder.call(self.token(), [stream])
+
+        with builder.if_then(builder.icmp_unsigned('==', text, PTR(None))):
+            builder.ret(BOOL(0))
+
+        preheader = builder.block
+        cond = builder.append_basic_block(name="cond")
+        body = builder.append_basic_block(name="body")
+        end = builder.append_basic_block(name="end")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+
+        index = builder.phi(LONG, name="index")
+        index.add_incoming(LONG(0), preheader)
+        char = builder.load(builder.gep(text, [index], inbounds=True))
+        stop = builder.or_(self.is_separator(builder, char, separator), builder.icmp_unsigned('==', char, CHAR(0)))
+        builder.cbranch(stop, end, body)
+
+        builder.position_at_end(body)
+        index.add_incoming(builder.add(index, LONG(1)), body)
+        builder.branch(cond)
+
+        builder.position_at_end(end)
+        builder.call(self.string_assign(), [dest, text, index])
+        builder.store(builder.add(builder.load(position), index), position)
+        builder.ret(BOOL(1))
+
+        return func
+
+    def read_array(self, element):
+        '''
+        i64 pc_read_array_int(stream* s, i32* a, i64 n)
+        i64 pc_read_array_double(stream* s, double* a, i64 n)
+
+        Reads up to n numbers from a stream into the first elements of an
+        array and returns how many were read. It stops early at the end of
+        the input or at a word that is not a number, which is left unread.
+        '''
+
+        if element == INT:
+            return self.read_int_array()
+
+        name = "pc_read_array_double"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, LONG, [STREAM.as_pointer(), DOUBLE.as_pointer(), LONG])
+        stream, array, count = func.args
+
+        with for_range(builder, LONG(0), count, name="element") as i:
+            found = builder.call(self.read_double(), [stream, builder.gep(array, [i], inbounds=True)])
+
+            with builder.if_then(builder.not_(found), likely=False):
+                builder.ret(i)
+
+        builder.ret(count)
+
+        return func
+
+    def read_int_array(self):
+        '''
+        i64 pc_read_array_int(stream* s, i32* a, i64 n)
+
+        The INT version of read_array. Rather than finding the end of each
+        word before reading it, like pc_read_int, it parses the numbers
+        straight out of the buffer in one pass. A number cut off by the end
+        of the buffer is parsed again once the buffer has been refilled.
+        '''
+
+        name = "pc_read_array_int"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, LONG, [STREAM.as_pointer(), INT.as_pointer(), LONG])
+        stream, array, count = func.args
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+        separator = self.stream_field(builder, stream, 7)
+        capacity = self.stream_field(builder, stream, 3)
+
+        entry = builder.block
+        following = builder.append_basic_block(name="next")
+        skip = builder.append_basic_block(name="skip")
+        space = builder.append_basic_block(name="space")
+        refill = builder.append_basic_block(name="refill")
+        number = builder.append_basic_block(name="number")
+        digits = builder.append_basic_block(name="digits")
+        check = builder.append_basic_block(name="check")
+        digit = builder.append_basic_block(name="digit")
+        cut = builder.append_basic_block(name="cut")
+        finish = builder.append_basic_block(name="finish")
+        store = builder.append_basic_block(name="store")
+
+        builder.branch(following)
+
+        builder.position_at_end(following)
+        i = builder.phi(LONG, name="i")
+        i.add_incoming(LONG(0), entry)
+        with builder.if_then(builder.icmp_signed('>=', i, count), likely=False):
+            builder.ret(count)
+        builder.branch(skip)
+
+        builder.position_at_end(skip)
+        pos = builder.load(position)
+        builder.cbranch(builder.icmp_signed('<', pos, builder.load(used)), space, refill)
+
+        builder.position_at_end(space)
+        char = builder.load(builder.gep(buffer, [pos], inbounds=True))
+        with builder.if_then(self.is_separator(builder, char, separator)):
+            builder.store(builder.add(pos, LONG(1)), position)
+            builder.branch(skip)
+        builder.branch(number)
+
+        builder.position_at_end(refill)
+        with builder.if_then(builder.load(eof), likely=False):
+            builder.ret(i)
+        builder.call(self.fill(), [stream])
+        builder.branch(skip)
+
+        builder.position_at_end(number)
+        start = builder.load(position)
+        first = builder.load(builder.gep(buffer, [start], inbounds=True))
+        negative = builder.icmp_unsigned('==', first, CHAR(ord("-")))
+        signed = builder.or_(negative, builder.icmp_unsigned('==', first, CHAR(ord("+"))))
+        begin = builder.add(start, builder.zext(signed, LONG))
+        builder.branch(digits)
+
+        builder.position_at_end(digits)
+        index = builder.phi(LONG, name="index")
+        value = builder.phi(LONG, name="value")
+        index.add_incoming(begin, number)
+        value.add_incoming(LONG(0), number)
+        builder.cbranch(builder.icmp_signed('<', index, builder.load(used)), check, cut)
+
+        builder.position_at_end(check)
+        char = builder.load(builder.gep(buffer, [index], inbounds=True))
+        builder.cbranch(self.is_digit(builder, char), digit, finish)
+
+        builder.position_at_end(digit)
+        index.add_incoming(builder.add(index, LONG(1)), digit)
+        value.add_incoming(builder.add(builder.mul(value, LONG(10)), builder.zext(builder.sub(char, CHAR(ord("0"))), LONG)), digit)
+        builder.branch(digits)
+
+        # the number may go on past the end of the buffer, unless the input
+        # has ended or the number already fills the whole buffer
+        builder.position_at_end(cut)
+        room = builder.icmp_signed('<', builder.sub(builder.load(used), start), capacity)
+        with builder.if_then(builder.and_(builder.not_(builder.load(eof)), room), likely=False):
+            builder.call(self.fill(), [stream])
+            builder.branch(number)
+        builder.branch(finish)
+
+        builder.position_at_end(finish)
+        with builder.if_then(builder.icmp_signed('==', index, begin), likely=False):
+            builder.ret(i)
+        builder.branch(store)
+
+        builder.position_at_end(store)
+        value = builder.select(negative, builder.neg(value), value)
+        builder.store(builder.trunc(value, INT), builder.gep(array, [i], inbounds=True))
+        builder.store(index, position)
+        i.add_incoming(builder.add(i, LONG(1)), store)
+        builder.branch(following)
+
+        return func
+
+    def open_files(self):
+        '''The first of the files that are open, each linked to the next'''
+
+        return self.global_variable("pc.files", PTR)
+
+    def open_file(self):
+        '''
+        stream* pc_open_file(i8* path, i32 mode)
+
+        Opens a file to READ, to WRITE over or to APPEND to, and returns a
+        stream with a buffer of FILE_BUFFER bytes over it. The stream is
+        added to the open files, so that it is flushed when the program
+        ends or stops with an error. Stops the program if the file cannot be
+        opened.
+        '''
+
+        name = "pc_open_file"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, STREAM.as_pointer(), [PTR, INT])
+        path, mode = func.args
+
+        writing = builder.icmp_signed('!=', mode, INT(FILE_MODES['READ']))
+        flags = builder.select(builder.icmp_signed('==', mode, INT(FILE_MODES['WRITE'])),
+                               INT(O_WRONLY | O_CREAT | O_TRUNC), INT(O_WRONLY | O_CREAT | O_APPEND))
+        flags = builder.select(writing, flags, INT(O_RDONLY))
+
+        fd = builder.call(self.libc('open'), [path, flags, INT(FILE_MODE)])
+
+        with builder.if_then(builder.icmp_signed('<', fd, INT(0)), likely=False):
+            builder.call(self.file_error(), [path, LONG(-1)])
+
+        size = STREAM.as_pointer()(None).gep([INT(1)]).ptrtoint(LONG)
+        memory = builder.call(self.libc('calloc'), [LONG(1), size])
+        buffer = builder.call(self.libc('calloc'), [LONG(1), LONG(FILE_BUFFER + 1)])
+
+        failed = builder.or_(builder.icmp_unsigned('==', memory, PTR(None)), builder.icmp_unsigned('==', buffer, PTR(None)))
+
+        with builder.if_then(failed, likely=False):
+            builder.call(self.out_of_memory(), [LONG(FILE_BUFFER + 1)])
+
+        stream = builder.bitcast(memory, STREAM.as_pointer())
+        files = self.open_files()
+
+        value = STREAM([PTR(None), LONG(0), LONG(0), LONG(FILE_BUFFER), INT(0), BOOL(0), BOOL(0),
+                        CHAR(ord(FILE_SEPARATOR)), PTR(None)])
+        value = builder.insert_value(value, buffer, 0)
+        value = builder.insert_value(value, fd, 4)
+        value = builder.insert_value(value, writing, 6)
+        value = builder.insert_value(value, builder.load(files), 8)
+
+        builder.store(value, stream)
+        builder.store(memory, files)
+        builder.ret(stream)
+
+        return func
+
+    def close_file(self):
+        '''
+        void pc_close_file(stream* s)
+
+        Flushes a stream that is written to, closes its file and removes it
+        from the open files
+        '''
+
+        name = "pc_close_file"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STREAM.as_pointer()])
+        stream = func.args[0]
+        buffer, position, used, eof = self.stream_buffer(builder, stream)
+
+        with builder.if_then(self.stream_field(builder, stream, 6)):
+            builder.call(self.flush_stream(), [stream])
+
+        builder.call(self.libc('close'), [self.stream_field(builder, stream, 4)])
+
+        # follow the links until the one that leads to this stream
+        preheader = builder.block
+        cond = builder.append_basic_block(name="cond")
+        body = builder.append_basic_block(name="body")
+        end = builder.append_basic_block(name="end")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+
+        link = builder.phi(PTR.as_pointer(), name="link")
+        link.add_incoming(self.open_files(), preheader)
+
+        current = builder.bitcast(builder.load(link), STREAM.as_pointer())
+        builder.cbranch(builder.icmp_unsigned('==', current, stream), end, body)
+
+        builder.position_at_end(body)
+        link.add_incoming(builder.gep(current, [INT(0), INT(8)], inbounds=True), body)
+        builder.branch(cond)
+
+        builder.position_at_end(end)
+        builder.store(self.stream_field(builder, stream, 8), link)
+
+        builder.call(self.libc('free'), [buffer])
+        builder.call(self.libc('free'), [builder.bitcast(stream, PTR)])
+        builder.ret_void()
+
+        return func
+
+    def close_files(self):
+        '''
+        void pc_close_files()
+
+        Closes every file that is still open when the program ends
+        '''
+
+        name = "pc_close_files"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [])
+        files = self.open_files()
+
+        cond = builder.append_basic_block(name="cond")
+        body = builder.append_basic_block(name="body")
+        end = builder.append_basic_block(name="end")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+        first = builder.load(files)
+        builder.cbranch(builder.icmp_unsigned('==', first, PTR(None)), end, body)
+
+        builder.position_at_end(body)
+        builder.call(self.close_file(), [builder.bitcast(first, STREAM.as_pointer())])
+        builder.branch(cond)
+
+        builder.position_at_end(end)
+        builder.ret_void()
+
+        return func
+
+    def flush_all(self):
+        '''
+        void pc_flush_all()
+
+        Writes out everything buffered for OUTPUT and for every open file
+        that is written to, before the program stops with an error
+        '''
+
+        name = "pc_flush_all"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [])
+        builder.call(self.flush(), [])
+
+        first = builder.load(self.open_files())
+        entry = builder.block
+        cond = builder.append_basic_block(name="cond")
+        body = builder.append_basic_block(name="body")
+        end = builder.append_basic_block(name="end")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+
+        current = builder.phi(PTR, name="file")
+        current.add_incoming(first, entry)
+        builder.cbranch(builder.icmp_unsigned('==', current, PTR(None)), end, body)
+
+        builder.position_at_end(body)
+        stream = builder.bitcast(current, STREAM.as_pointer())
+
+        with builder.if_then(self.stream_field(builder, stream, 6)):
+            builder.call(self.flush_stream(), [stream])
+
+        current.add_incoming(self.stream_field(builder, stream, 8), builder.block)
+        builder.branch(cond)
+
+        builder.position_at_end(end)
+        builder.ret_void()
+
+        return func
+
+    def at_end(self):
+        '''
+        i1 pc_at_end(stream* s)
+
+        Whether nothing but separators is left to read from a stream
+        '''
+
+        name = "pc_at_end"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, BOOL, [STREAM.as_pointer()])
+
+        text = builder.call(self.token(), [func.args[0]])
+        builder.ret(builder.icmp_unsigned('==', text, PTR(None)))
+
+        return func
+
+    def file_closed(self):
+        '''
+        void pc_file_closed(i8* name)
+
+        Reports the use of a file that is not open and stops the program
+        '''
+
+        name = "pc_file_closed"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [PTR])
+        func.attributes.add('noreturn')
+        func.attributes.add('cold')
+
+        builder.call(self.flush_all(), [])
+
+        fmt = self.cstring(builder, "The file %s is not open\n", "pc.fmt.closed")
+        builder.call(self.libc('dprintf'), [INT(STDERR), fmt, func.args[0]])
+        builder.call(self.libc('exit'), [INT(1)])
+        builder.unreachable()
+
+        return func
+
+
+    def string_reserve(self):
+        '''
+        void pc_str_reserve(string* s, i64 length)
+
+        Makes room for a string of `length` characters and its terminator,
+        at least doubling the capacity whenever it has to grow so that
+        repeated appends take amortized constant time. With the arena
+        allocator the old buffer is left for the arena to release.
+        '''
+
+        name = "pc_str_reserve"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STRING.as_pointer(), LONG])
+        string, length = func.args
+
+        data_ptr = builder.gep(string, [INT(0), INT(0)], inbounds=True)
+        capacity_ptr = builder.gep(string, [INT(0), INT(2)], inbounds=True)
+
+        needed = builder.add(length, LONG(1))
+        capacity = builder.load(capacity_ptr)
+
+        with builder.if_then(builder.icmp_signed('>', needed, capacity)):
+            grown = builder.mul(capacity, LONG(2))
+            grown = builder.select(builder.icmp_signed('>', grown, needed), grown, needed)
+            grown = builder.select(builder.icmp_signed('>', grown, LONG(STRING_MIN_CAPACITY)), grown, LONG(STRING_MIN_CAPACITY))
+
+            if self.alloc == "arena":
+                data = builder.call(self.arena_alloc(), [grown])
+                length = builder.load(builder.gep(string, [INT(0), INT(1)], inbounds=True))
+                self.memcpy(builder, data, builder.load(data_ptr), length)
+            else:
+                data = builder.call(self.libc('realloc'), [builder.load(data_ptr), grown])
+
+            builder.store(data, data_ptr)
+            builder.store(grown, capacity_ptr)
+
+        builder.ret_void()
+
+        return func
+
+    def array_grow(self):
+        '''
+        void pc_array_grow(array* a, i64 size)
+
+        Doubles the room of an array declared without a size, which starts
+        with room for DYNAMIC_ARRAY_MIN_CAPACITY elements of `size` bytes,
+        so that appending n elements copies O(n) of them in total. Its
+        elements are always on the heap, even with --alloc=arena, since
+        they outlive the arena regions of the loops that append to them.
+        '''
+
+        name = "pc_array_grow"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [DYNAMIC_ARRAY.as_pointer(), LONG])
+        array, size = func.args
+
+        data_ptr = builder.gep(array, [INT(0), INT(0)], inbounds=True)
+        capacity_ptr = builder.gep(array, [INT(0), INT(2)], inbounds=True)
+
+        capacity = builder.load(capacity_ptr)
+        grown = builder.select(builder.icmp_signed('<', capacity, LONG(DYNAMIC_ARRAY_MIN_CAPACITY)),
+                               LONG(DYNAMIC_ARRAY_MIN_CAPACITY), builder.mul(capacity, LONG(2)))
+
+        multiply = self.intrinsic('llvm.umul.with.overflow.i64', ir.LiteralStructType([LONG, BOOL]), [LONG, LONG])
+        product = builder.call(multiply, [grown, size])
+
+        with builder.if_then(builder.extract_value(product, 1), likely=False):
+            builder.call(self.out_of_memory(), [LONG(-1)])
+
+        total = builder.extract_value(product, 0)
+        data = builder.call(self.libc('realloc'), [builder.load(data_ptr), total])
+
+        with builder.if_then(builder.icmp_unsigned('==', data, PTR(None)), likely=False):
+            builder.call(self.out_of_memory(), [total])
+
+        builder.store(data, data_ptr)
+        builder.store(grown, capacity_ptr)
+
+        builder.ret_void()
+
+        return func
+
+    def string_append(self):
+        '''
+        void pc_str_append(string* s, i8* text, i64 length)
+
+        Appends `length` characters to a string in place. The text must not
+        point into the string itself, since growing it can move it.
+        '''
+
+        name = "pc_str_append"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STRING.as_pointer(), PTR, LONG])
+        string, text, length = func.args
+
+        data_ptr = builder.gep(string, [INT(0), INT(0)], inbounds=True)
+        length_ptr = builder.gep(string, [INT(0), INT(1)], inbounds=True)
+
+        old = builder.load(length_ptr)
+        new = builder.add(old, length)
+
+        builder.call(self.string_reserve(), [string, new])
+
+        data = builder.load(data_ptr)
+        self.memcpy(builder, builder.gep(data, [old], inbounds=True), text, length)
+        builder.store(CHAR(0), builder.gep(data, [new], inbounds=True))
+        builder.store(new, length_ptr)
+        builder.ret_void()
+
+        return func
+
+    def string_assign(self):
+        '''
+        void pc_str_assign(string* s, i8* text, i64 length)
+
+        Replaces the contents of a string, reusing its buffer if it is big enough
+        '''
+
+        name = "pc_str_assign"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STRING.as_pointer(), PTR, LONG])
+        string, text, length = func.args
+
+        builder.store(LONG(0), builder.gep(string, [INT(0), INT(1)], inbounds=True))
+        builder.call(self.string_append(), [string, text, length])
+        builder.ret_void()
+
+        return func
+
+    def string_free(self):
+        '''
+        void pc_str_free(string* s)
+
+        Frees the buffer of a string, leaving it empty
+        '''
+
+        name = "pc_str_free"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [STRING.as_pointer()])
+        string = func.args[0]
+
+        data_ptr = builder.gep(string, [INT(0), INT(0)], inbounds=True)
+
+        builder.call(self.libc('free'), [builder.load(data_ptr)])
+        builder.store(STRING(None), string)
+        builder.ret_void()
+
+        return func
+
+
+    def arena_state(self):
+        '''
+        The current region, the next free byte and the end of the current
+        region, followed by the statistics: bytes handed out, bytes held in
+        regions and the most bytes ever held in regions
+        '''
+
+        names = ["region", "top", "end"]
+        state = [self.global_variable("pc.arena." + name, PTR) for name in names]
+
+        names = ["allocated", "resident", "peak"]
+        state += [self.global_variable("pc.arena." + name, LONG) for name in names]
+
+        return state
+
+    def arena_alloc(self):
+        '''
+        i8* pc_arena_alloc(i64 size)
+
+        Bump-allocates cache-line aligned memory from the current region,
+        starting a new region when it is full
+        '''
+
+        name = "pc_arena_alloc"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, PTR, [LONG])
+        region, top, end, allocated, resident, peak = self.arena_state()
+
+        with builder.if_then(builder.icmp_unsigned('>', func.args[0], LONG(1 << 62))):
+            builder.call(self.out_of_memory(), [func.args[0]])
+
+        size = builder.and_(builder.add(func.args[0], LONG(ARENA_ALIGN - 1)), LONG(-ARENA_ALIGN))
+        builder.store(builder.add(builder.load(allocated), size), allocated)
+
+        free = builder.sub(builder.ptrtoint(builder.load(end), LONG), builder.ptrtoint(builder.load(top), LONG))
+
+        with builder.if_then(builder.icmp_unsigned('>', size, free)):
+            header = LONG(ARENA_ALIGN)
+            region_size = builder.add(size, header)
+            region_size = builder.select(builder.icmp_unsigned('>', region_size, LONG(ARENA_REGION)), region_size, LONG(ARENA_REGION))
+
+            new = builder.call(self.libc('aligned_alloc'), [LONG(ARENA_ALIGN), region_size])
+
+            with builder.if_then(builder.icmp_unsigned('==', new, PTR(None))):
+                builder.call(self.out_of_memory(), [region_size])
+
+            fields = builder.bitcast(new, ARENA_HEADER.as_pointer())
+            builder.store(builder.load(region), builder.gep(fields, [INT(0), INT(0)], inbounds=True))
+            builder.store(region_size, builder.gep(fields, [INT(0), INT(1)], inbounds=True))
+
+            builder.store(new, region)
+            builder.store(builder.gep(new, [header], inbounds=True), top)
+            builder.store(builder.gep(new, [region_size], inbounds=True), end)
+
+            held = builder.add(builder.load(resident), region_size)
+            builder.store(held, resident)
+            builder.store(builder.select(builder.icmp_signed('>', held, builder.load(peak)), held, builder.load(peak)), peak)
+
+        memory = builder.load(top)
+        builder.store(builder.gep(memory, [size], inbounds=True), top)
+        builder.ret(memory)
+
+        return func
+
+    def arena_mark(self):
+        '''
+        void pc_arena_mark(mark* m)
+
+        Remembers how far the arena has been used
+        '''
+
+        name = "pc_arena_mark"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [ARENA_MARK.as_pointer()])
+        region, top, end, allocated, resident, peak = self.arena_state()
+        mark = func.args[0]
+
+        builder.store(builder.load(region), builder.gep(mark, [INT(0), INT(0)], inbounds=True))
+        builder.store(builder.load(top), builder.gep(mark, [INT(0), INT(1)], inbounds=True))
+        builder.ret_void()
+
+        return func
+
+    def arena_release(self):
+        '''
+        void pc_arena_release(mark* m)
+
+        Frees everything allocated since the mark in one go, returning the
+        regions started since then to the system
+        '''
+
+        name = "pc_arena_release"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [ARENA_MARK.as_pointer()])
+        region, top, end, allocated, resident, peak = self.arena_state()
+        mark = func.args[0]
+
+        marked = builder.load(builder.gep(mark, [INT(0), INT(0)], inbounds=True))
+
+        cond = builder.append_basic_block(name="cond")
+        body = builder.append_basic_block(name="body")
+        done = builder.append_basic_block(name="done")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+        current = builder.load(region)
+        builder.cbranch(builder.icmp_unsigned('!=', current, marked), body, done)
+
+        builder.position_at_end(body)
+        fields = builder.bitcast(current, ARENA_HEADER.as_pointer())
+        previous = builder.load(builder.gep(fields, [INT(0), INT(0)], inbounds=True))
+        size = builder.load(builder.gep(fields, [INT(0), INT(1)], inbounds=True))
+
+        builder.store(builder.sub(builder.load(resident), size), resident)
+        builder.call(self.libc('free'), [current])
+        builder.store(previous, region)
+        builder.branch(cond)
+
+        builder.position_at_end(done)
+        builder.store(builder.load(builder.gep(mark, [INT(0), INT(1)], inbounds=True)), top)
+
+        with builder.if_else(builder.icmp_unsigned('==', marked, PTR(None))) as (empty, used):
+            with empty:
+                builder.store(PTR(None), end)
+            with used:
+                fields = builder.bitcast(marked, ARENA_HEADER.as_pointer())
+                size = builder.load(builder.gep(fields, [INT(0), INT(1)], inbounds=True))
+                builder.store(builder.gep(marked, [size], inbounds=True), end)
+
+        builder.ret_void()
+
+        return func
+
+    def arena_report(self):
+        '''
+        void pc_arena_report()
+
+        Prints the arena statistics to stderr if the PC_ALLOC_STATS
+        environment variable is set
+        '''
+
+        name = "pc_arena_report"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [])
+        region, top, end, allocated, resident, peak = self.arena_state()
+
+        env = builder.call(self.libc('getenv'), [self.cstring(builder, "PC_ALLOC_STATS", "pc.env.alloc_stats")])
+
+        with builder.if_then(builder.icmp_unsigned('!=', env, PTR(None))):
+            fmt = self.cstring(builder, "arena: %ld bytes allocated, peak %ld bytes resident\n", "pc.fmt.arena")
+            builder.call(self.libc('dprintf'), [INT(STDERR), fmt, builder.load(allocated), builder.load(peak)])
+
+        builder.ret_void()
+
+        return func
+
+
+    def out_of_memory(self):
+        '''
+        void pc_out_of_memory(i64 size)
+
+        Reports a failed allocation and stops the program
+        '''
+
+        name = "pc_out_of_memory"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [LONG])
+        func.attributes.add('noreturn')
+        func.attributes.add('cold')
+
+        builder.call(self.flush_all(), [])
+
+        fmt = self.cstring(builder, "Out of memory: cannot allocate %lu bytes\n", "pc.fmt.out_of_memory")
+        builder.call(self.libc('dprintf'), [INT(STDERR), fmt, func.args[0]])
+        builder.call(self.libc('exit'), [INT(1)])
+        builder.unreachable()
+
+        return func
+
+    def file_error(self):
+        '''
+        void pc_file_error(i8* path, i64 size)
+
+        Reports a file that cannot be opened, when size is negative, or
+        that cannot hold an array of `size` bytes, and stops the program
+        '''
+
+        name = "pc_file_error"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [PTR, LONG])
+        func.attributes.add('noreturn')
+        func.attributes.add('cold')
+        path, size = func.args
+
+        builder.call(self.flush_all(), [])
+
+        missing = self.cstring(builder, "Cannot open the file %s\n", "pc.fmt.file_missing")
+        short = self.cstring(builder, "The file %s cannot hold the %ld bytes of the array\n", "pc.fmt.file_short")
+        fmt = builder.select(builder.icmp_signed('<', size, LONG(0)), missing, short)
+
+        builder.call(self.libc('dprintf'), [INT(STDERR), fmt, path, size])
+        builder.call(self.libc('exit'), [INT(1)])
+        builder.unreachable()
+
+        return func
+
+    def map_file(self):
+        '''
+        i8* pc_map_file(i8* path, i64 count, i64 size, i32 advice, i64* length)
+
+        Maps a file into memory as an array of `count` elements of `size`
+        bytes, or of as many whole elements as the file holds when count is
+        negative, and stores the number of elements in *length. A file the
+        program can write to is shared, so that writes to the array reach
+        it, and is created or extended to hold the array. Any other file is
+        mapped privately, so writes only change the program's copy. advice
+        is passed on to madvise.
+        '''
+
+        name = "pc_map_file"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, PTR, [PTR, LONG, LONG, INT, LONG.as_pointer()])
+        path, count, size, advice, length = func.args
+
+        whole = builder.icmp_signed('<', count, LONG(0))
+        flags = builder.select(whole, INT(O_RDWR), INT(O_RDWR | O_CREAT))
+
+        shared = builder.call(self.libc('open'), [path, flags, INT(FILE_MODE)])
+        writable = builder.icmp_signed('>=', shared, INT(0))
+        opened = builder.block
+
+        with builder.if_then(builder.not_(writable), likely=False):
+            private = builder.call(self.libc('open'), [path, INT(O_RDONLY)])
+            reopened = builder.block
+
+        fd = builder.phi(INT)
+        fd.add_incoming(shared, opened)
+        fd.add_incoming(private, reopened)
+
+        with builder.if_then(builder.icmp_signed('<', fd, INT(0)), likely=False):
+            builder.call(self.file_error(), [path, LONG(-1)])
+
+        file_size = builder.call(self.libc('lseek'), [fd, LONG(0), INT(SEEK_END)])
+        count = builder.select(whole, builder.sdiv(file_size, size), count)
+
+        multiply = self.intrinsic('llvm.umul.with.overflow.i64', ir.LiteralStructType([LONG, BOOL]), [LONG, LONG])
+        product = builder.call(multiply, [count, size])
+        total = builder.extract_value(product, 0)
+
+        with builder.if_then(builder.extract_value(product, 1), likely=False):
+            builder.call(self.out_of_memory(), [LONG(-1)])
+
+        with builder.if_then(builder.icmp_signed('<', file_size, total), likely=False):
+
+            with builder.if_else(writable) as (then, otherwise):
+
+                with then:
+                    extended = builder.call(self.libc('ftruncate'), [fd, total])
+
+                    with builder.if_then(builder.icmp_signed('!=', extended, INT(0))):
+                        builder.call(self.file_error(), [path, total])
+
+                with otherwise:
+                    builder.call(self.file_error(), [path, total])
+
+        builder.store(count, length)
+
+        # mmap cannot map nothing, and an empty array is never read
+        with builder.if_then(builder.icmp_signed('==', total, LONG(0))):
+            builder.call(self.libc('close'), [fd])
+            builder.ret(PTR(None))
+
+        mode = builder.select(writable, INT(MAP_SHARED), INT(MAP_PRIVATE))
+        memory = builder.call(self.libc('mmap'), [PTR(None), total, INT(PROT_RW), mode, fd, LONG(0)])
+
+        with builder.if_then(builder.icmp_signed('==', builder.ptrtoint(memory, LONG), LONG(-1)), likely=False):
+            builder.call(self.out_of_memory(), [total])
+
+        with builder.if_then(builder.icmp_signed('!=', advice, INT(0))):
+            builder.call(self.libc('madvise'), [memory, total, advice])
+
+        builder.call(self.libc('close'), [fd])
+        builder.ret(memory)
+
+        return func
+
+    def sync(self):
+        '''
+        void pc_sync(i8* data, i64 size, i8* name)
+
+        Writes the changes to an array mapped from a file back to the file,
+        and stops the program if they cannot be written
+        '''
+
+        name = "pc_sync"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [PTR, LONG, PTR])
+        data, size, array = func.args
+
+        with builder.if_then(builder.icmp_signed('>', size, LONG(0))):
+            failed = builder.icmp_signed('!=', builder.call(self.libc('msync'), [data, size, INT(MS_SYNC)]), INT(0))
+
+            with builder.if_then(failed, likely=False):
+                builder.call(self.flush_all(), [])
+
+                fmt = self.cstring(builder, "Cannot write %s back to its file\n", "pc.fmt.sync")
+                builder.call(self.libc('dprintf'), [INT(STDERR), fmt, array])
+                builder.call(self.libc('exit'), [INT(1)])
+
+        builder.ret_void()
+
+        return func
+
+    def bounds_error(self):
+        '''
+        void pc_bounds_error(i8* name, i64 index, i64 length)
+
+        Reports an array index that is out of bounds and stops the program
+        '''
+
+        name = "pc_bounds_error"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [PTR, LONG, LONG])
+        func.attributes.add('noreturn')
+        func.attributes.add('cold')
+
+        builder.call(self.flush_all(), [])
+
+        fmt = self.cstring(builder, "Index %ld is out of bounds for %s, which has %ld elements\n", "pc.fmt.bounds_error")
+        builder.call(self.libc('dprintf'), [INT(STDERR), fmt, func.args[1], func.args[0], func.args[2]])
+        builder.call(self.libc('exit'), [INT(1)])
+        builder.unreachable()
+
+        return func
+
+    def array_alloc(self):
+        '''
+        i8* pc_array_alloc(i64 count, i64 size)
+
+        Allocates an array of `count` elements of `size` bytes, aligned to
+        a cache line and padded to a whole number of cache lines. A
+        negative count gives an empty array. Arrays of LARGE_ARRAY bytes or
+        more are mapped from the kernel, which hands out pages of zeros as
+        they are first touched rather than clearing them up front, and
+        asked to be backed by huge pages.
+        '''
+
+        name = "pc_array_alloc"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, PTR, [LONG, LONG])
+        func.return_value.add_attribute('noalias')
+        count, size = func.args
+
+        count = builder.select(builder.icmp_signed('<', count, LONG(0)), LONG(0), count)
+
+        multiply = self.intrinsic('llvm.umul.with.overflow.i64', ir.LiteralStructType([LONG, BOOL]), [LONG, LONG])
+        product = builder.call(multiply, [count, size])
+        total = builder.extract_value(product, 0)
+
+        with builder.if_then(builder.extract_value(product, 1)):
+            builder.call(self.out_of_memory(), [LONG(-1)])
+
+        padded = builder.and_(builder.add(total, LONG(CACHE_LINE - 1)), LONG(-CACHE_LINE))
+        padded = builder.select(builder.icmp_unsigned('<', padded, total), LONG(-CACHE_LINE), padded)
+        padded = builder.select(builder.icmp_unsigned('==', padded, LONG(0)), LONG(CACHE_LINE), padded)
+
+        if self.alloc == "arena":
+            builder.ret(builder.call(self.arena_alloc(), [padded]))
+            return func
+
+        with builder.if_then(builder.icmp_unsigned('>=', padded, LONG(LARGE_ARRAY)), likely=False):
+            mapped = builder.call(self.libc('mmap'), [PTR(None), padded, INT(PROT_RW), INT(MAP_PRIVATE | MAP_ANONYMOUS), INT(-1), LONG(0)])
+
+            with builder.if_then(builder.icmp_signed('==', builder.ptrtoint(mapped, LONG), LONG(-1))):
+                builder.call(self.out_of_memory(), [total])
+
+            builder.call(self.libc('madvise'), [mapped, padded, INT(MADV_HUGEPAGE)])
+            builder.ret(mapped)
+
+        memory = builder.call(self.libc('aligned_alloc'), [LONG(CACHE_LINE), padded])
+
+        with builder.if_then(builder.icmp_unsigned('==', memory, PTR(None))):
+            builder.call(self.out_of_memory(), [total])
+
+        builder.ret(memory)
+
+        return func
+
+    def less(self, builder, lvalue, rvalue):
+
+        if lvalue.type == DOUBLE:
+            return builder.fcmp_ordered('<', lvalue, rvalue)
+
+        return builder.icmp_signed('<', lvalue, rvalue)
+
+    def swap(self, builder, array, i, j):
+
+        first = builder.gep(array, [i], inbounds=True)
+        second = builder.gep(array, [j], inbounds=True)
+
+        lvalue = builder.load(first)
+        builder.store(builder.load(second), first)
+        builder.store(lvalue, second)
+
+    def sort(self, element):
+        '''
+        void pc_sort_int(i32* a, i64 n, i1 descending)
+        void pc_sort_double(double* a, i64 n, i1 descending)
+
+        Sorts the first n elements of an array in place. INT arrays of at
+        least RADIX_SORT_MIN elements are radix sorted and everything else
+        is introsorted. A descending sort reverses the ascending order.
+        '''
+
+        name = "pc_sort_" + ("double" if element == DOUBLE else "int")
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [element.as_pointer(), LONG, BOOL])
+        array, count, descending = func.args
+
+        # quicksort gives way to heapsort after 2 log2(n) levels
+        leading = builder.call(self.intrinsic('llvm.ctlz.i64', LONG, [LONG, BOOL]), [builder.or_(count, LONG(1)), BOOL(1)])
+        depth = builder.shl(builder.sub(LONG(63), leading), LONG(1))
+
+        if element == DOUBLE:
+            builder.call(self.introsort(element), [array, LONG(0), count, depth])
+
+        else:
+            with builder.if_else(builder.icmp_signed('<', count, LONG(RADIX_SORT_MIN))) as (small, large):
+                with small:
+                    builder.call(self.introsort(element), [array, LONG(0), count, depth])
+                with large:
+                    builder.call(self.radix_sort(), [array, count])
+
+        with builder.if_then(descending):
+            builder.call(self.reverse(element), [array, count])
+
+        builder.ret_void()
+
+        return func
+
+    def introsort(self, element):
+        '''
+        void pc_introsort_T(T* a, i64 lo, i64 hi, i64 depth)
+
+        Quicksorts a[lo..hi) around a median of three pivot, recursing into
+        the smaller side and looping on the larger one. Partitions of at
+        most INSERTION_SORT_MAX elements are insertion sorted, and a
+        partition that is still too large once depth runs out is heapsorted.
+        '''
+
+        name = "pc_introsort_" + ("double" if element == DOUBLE else "int")
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [element.as_pointer(), LONG, LONG, LONG])
+        array = func.args[0]
+
+        entry = builder.block
+        loop = builder.append_basic_block(name="loop")
+        split = builder.append_basic_block(name="split")
+        partition = builder.append_basic_block(name="partition")
+        small = builder.append_basic_block(name="small")
+        deep = builder.append_basic_block(name="deep")
+
+        builder.branch(loop)
+        builder.position_at_end(loop)
+
+        lo = builder.phi(LONG, name="lo")
+        hi = builder.phi(LONG, name="hi")
+        depth = builder.phi(LONG, name="depth")
+        lo.add_incoming(func.args[1], entry)
+        hi.add_incoming(func.args[2], entry)
+        depth.add_incoming(func.args[3], entry)
+
+        size = builder.sub(hi, lo)
+        builder.cbranch(builder.icmp_signed('<=', size, LONG(INSERTION_SORT_MAX)), small, split)
+
+        builder.position_at_end(small)
+        builder.call(self.insertion_sort(element), [array, lo, hi])
+        builder.ret_void()
+
+        builder.position_at_end(split)
+        builder.cbranch(builder.icmp_signed('==', depth, LONG(0)), deep, partition)
+
+        builder.position_at_end(deep)
+        builder.call(self.heapsort(element), [builder.gep(array, [lo], inbounds=True), size])
+        builder.ret_void()
+
+        builder.position_at_end(partition)
+        pivot = builder.call(self.partition(element), [array, lo, hi])
+        after = builder.add(pivot, LONG(1))
+        less = builder.sub(depth, LONG(1))
+
+        left_smaller = builder.icmp_signed('<', builder.sub(pivot, lo), builder.sub(hi, after))
+
+        with builder.if_else(left_smaller) as (left, right):
+            with left:
+                builder.call(func, [array, lo, pivot, less])
+            with right:
+                builder.call(func, [array, after, hi, less])
+
+        lo.add_incoming(builder.select(left_smaller, after, lo), builder.block)
+        hi.add_incoming(builder.select(left_smaller, hi, pivot), builder.block)
+        depth.add_incoming(less, builder.block)
+        builder.branch(loop)
+
+        return func
+
+    def partition(self, element):
+        '''
+        i64 pc_partition_T(T* a, i64 lo, i64 hi)
+
+        Moves the median of the first, middle and last elements of a[lo..hi)
+        to the front and partitions the rest around it, returning where the
+        pivot ends up. Elements equal to the pivot stop both scans, so runs
+        of equal elements split evenly. hi - lo must be at least 3.
+        '''
+
+        name = "pc_partition_" + ("double" if element == DOUBLE else "int")
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, LONG, [element.as_pointer(), LONG, LONG])
+        array, lo, hi = func.args
+
+        last = builder.sub(hi, LONG(1))
+        middle = builder.add(lo, builder.ashr(builder.sub(hi, lo), LONG(1)))
+
+        for i, j in ((lo, middle), (middle, last), (lo, middle)):
+            smaller = self.less(builder, builder.load(builder.gep(array, [j], inbounds=True)),
+                                builder.load(builder.gep(array, [i], inbounds=True)))
+
+            with builder.if_then(smaller):
+                self.swap(builder, array, i, j)
+
+        self.swap(builder, array, lo, middle)
+        pivot = builder.load(builder.gep(array, [lo], inbounds=True), name="pivot")
+
+        entry = builder.block
+        scan = builder.append_basic_block(name="scan")
+        left = builder.append_basic_block(name="left")
+        left_next = builder.append_basic_block(name="left.next")
+        right = builder.append_basic_block(name="right")
+        check = builder.append_basic_block(name="check")
+        exchange = builder.append_basic_block(name="exchange")
+        done = builder.append_basic_block(name="done")
+
+        builder.branch(scan)
+        builder.position_at_end(scan)
+
+        i = builder.phi(LONG, name="i")
+        j = builder.phi(LONG, name="j")
+        i.add_incoming(lo, entry)
+        j.add_incoming(hi, entry)
+        builder.branch(left)
+
+        # moves i right past the elements smaller than the pivot, stopping
+        # at the last element
+        builder.position_at_end(left)
+        left_i = builder.phi(LONG, name="left.i")
+        left_i.add_incoming(i, scan)
+        next_i = builder.add(left_i, LONG(1))
+        left_i.add_incoming(next_i, left_next)
+        builder.cbranch(builder.icmp_signed('<', next_i, last), left_next, right)
+
+        builder.position_at_end(left_next)
+        smaller = self.less(builder, builder.load(builder.gep(array, [next_i], inbounds=True)), pivot)
+        builder.cbranch(smaller, left, right)
+
+        # moves j left past the elements larger than the pivot, which
+        # stops at the pivot itself
+        builder.position_at_end(right)
+        right_j = builder.phi(LONG, name="right.j")
+        right_j.add_incoming(j, left)
+        right_j.add_incoming(j, left_next)
+        next_j = builder.sub(right_j, LONG(1))
+        right_j.add_incoming(next_j, right)
+        larger = self.less(builder, pivot, builder.load(builder.gep(array, [next_j], inbounds=True)))
+        builder.cbranch(larger, right, check)
+
+        builder.position_at_end(check)
+        builder.cbranch(builder.icmp_signed('<', next_i, next_j), exchange, done)
+
+        builder.position_at_end(exchange)
+        self.swap(builder, array, next_i, next_j)
+        i.add_incoming(next_i, exchange)
+        j.add_incoming(next_j, exchange)
+        builder.branch(scan)
+
+        builder.position_at_end(done)
+        self.swap(builder, array, lo, next_j)
+        builder.ret(next_j)
+
+        return func
+
+    def insertion_sort(self, element):
+        '''
+        void pc_insertion_sort_T(T* a, i64 lo, i64 hi)
+
+        Sorts a[lo..hi) by inserting each element into the sorted elements
+        before it
+        '''
+
+        name = "pc_insertion_sort_" + ("double" if element == DOUBLE else "int")
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [element.as_pointer(), LONG, LONG])
+        array, lo, hi = func.args
+
+        with for_range(builder, builder.add(lo, LONG(1)), hi, name="insert") as i:
+            value = builder.load(builder.gep(array, [i], inbounds=True), name="value")
+
+            preheader = builder.block
+            shift = builder.append_basic_block(name="shift")
+            move = builder.append_basic_block(name="move")
+            place = builder.append_basic_block(name="place")
+
+            builder.branch(shift)
+            builder.position_at_end(shift)
+
+            j = builder.phi(LONG, name="j")
+            j.add_incoming(i, preheader)
+            before = builder.sub(j, LONG(1))
+
+            with builder.if_then(builder.icmp_signed('>', j, lo)):
+                previous = builder.load(builder.gep(array, [before], inbounds=True))
+                builder.cbranch(self.less(builder, value, previous), move, place)
+
+            builder.branch(place)
+
+            builder.position_at_end(move)
+            builder.store(previous, builder.gep(array, [j], inbounds=True))
+            j.add_incoming(before, move)
+            builder.branch(shift)
+
+            builder.position_at_end(place)
+            builder.store(value, builder.gep(array, [j], inbounds=True))
+
+        builder.ret_void()
+
+        return func
+
+    def heapsort(self, element):
+        '''
+        void pc_heapsort_T(T* a, i64 n)
+
+        Sorts the first n elements of a by building a max-heap and then
+        moving its root to the end n - 1 times
+        '''
+
+        name = "pc_heapsort_" + ("double" if element == DOUBLE else "int")
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [element.as_pointer(), LONG])
+        array, count = func.args
+        sift_down = self.sift_down(element)
+
+        half = builder.ashr(count, LONG(1))
+
+        with for_range(builder, LONG(0), half, name="heapify") as i:
+            builder.call(sift_down, [array, builder.sub(builder.sub(half, LONG(1)), i), count])
+
+        with for_range(builder, LONG(1), count, name="extract") as i:
+            end = builder.sub(count, i)
+            self.swap(builder, array, LONG(0), end)
+            builder.call(sift_down, [array, LONG(0), end])
+
+        builder.ret_void()
+
+        return func
+
+    def sift_down(self, element):
+        '''
+        void pc_sift_down_T(T* a, i64 root, i64 n)
+
+        Moves a[root] down the max-heap held in the first n elements of a
+        until neither of its children is larger
+        '''
+
+        name = "pc_sift_down_" + ("double" if element == DOUBLE else "int")
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [element.as_pointer(), LONG, LONG])
+        array, start, count = func.args
+
+        value = builder.load(builder.gep(array, [start], inbounds=True), name="value")
+
+        entry = builder.block
+        loop = builder.append_basic_block(name="loop")
+        child = builder.append_basic_block(name="child")
+        down = builder.append_basic_block(name="down")
+        place = builder.append_basic_block(name="place")
+
+        builder.branch(loop)
+        builder.position_at_end(loop)
+
+        root = builder.phi(LONG, name="root")
+        root.add_incoming(start, entry)
+        first = builder.add(builder.shl(root, LONG(1)), LONG(1))
+        builder.cbranch(builder.icmp_signed('<', first, count), child, place)
+
+        builder.position_at_end(child)
+        second = builder.add(first, LONG(1))
+        larger = first
+
+        with builder.if_then(builder.icmp_signed('<', second, count)):
+            right = self.less(builder, builder.load(builder.gep(array, [first], inbounds=True)),
+                              builder.load(builder.gep(array, [second], inbounds=True)))
+            right = builder.select(right, second, first)
+            right_block = builder.block
+
+        larger = builder.phi(LONG, name="larger")
+        larger.add_incoming(first, child)
+        larger.add_incoming(right, right_block)
+
+        larger_value = builder.load(builder.gep(array, [larger], inbounds=True))
+        builder.cbranch(self.less(builder, value, larger_value), down, place)
+
+        builder.position_at_end(down)
+        builder.store(larger_value, builder.gep(array, [root], inbounds=True))
+        root.add_incoming(larger, down)
+        builder.branch(loop)
+
+        builder.position_at_end(place)
+        builder.store(value, builder.gep(array, [root], inbounds=True))
+        builder.ret_void()
+
+        return func
+
+    def reverse(self, element):
+        '''
+        void pc_reverse_T(T* a, i64 n)
+
+        Reverses the order of the first n elements of a
+        '''
+
+        name = "pc_reverse_" + ("double" if element == DOUBLE else "int")
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [element.as_pointer(), LONG])
+        array, count = func.args
+
+        with for_range(builder, LONG(0), builder.ashr(count, LONG(1)), name="reverse") as i:
+            self.swap(builder, array, i, builder.sub(builder.sub(count, LONG(1)), i))
+
+        builder.ret_void()
+
+        return func
+
+    def radix_sort(self):
+        '''
+        void pc_radix_sort(i32* a, i64 n)
+
+        Sorts the first n elements of an INT array with a least significant
+        digit radix sort, one RADIX_BITS digit per pass. The counts for
+        every digit are taken in a single pass over the array, and a digit
+        that is the same in every element is skipped. The sign bit is
+        flipped so that negative numbers come first.
+        '''
+
+        name = "pc_radix_sort"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, VOID, [INT.as_pointer(), LONG])
+        array, count = func.args
+
+        passes = 32 // RADIX_BITS
+        buckets = 1 << RADIX_BITS
+
+        counts = builder.alloca(ir.ArrayType(LONG, passes * buckets), name="counts")
+        offset = builder.alloca(LONG, name="offset")
+        memset = self.module.declare_intrinsic('llvm.memset', [PTR, LONG])
+        builder.call(memset, [builder.bitcast(counts, PTR), CHAR(0), LONG(passes * buckets * 8), BOOL(0)])
+
+        size = builder.shl(count, LONG(2))
+        memory = builder.call(self.libc('aligned_alloc'), [LONG(CACHE_LINE), builder.and_(builder.add(size, LONG(CACHE_LINE - 1)), LONG(-CACHE_LINE))])
+
+        with builder.if_then(builder.icmp_unsigned('==', memory, PTR(None))):
+            builder.call(self.out_of_memory(), [size])
+
+        buffer = builder.bitcast(memory, INT.as_pointer())
+
+        def bucket(builder, value, digit):
+            key = builder.xor(value, INT(-1 << 31))
+            key = builder.and_(builder.lshr(key, INT(digit * RADIX_BITS)), INT(buckets - 1))
+
+            return builder.gep(counts, [INT(0), builder.add(builder.zext(key, LONG), LONG(digit * buckets))], inbounds=True)
+
+        with for_range(builder, LONG(0), count, name="count") as i:
+            value = builder.load(builder.gep(array, [i], inbounds=True))
+
+            for digit in range(passes):
+                slot = bucket(builder, value, digit)
+                builder.store(builder.add(builder.load(slot), LONG(1)), slot)
+
+        first = builder.load(array, name="first")
+        source, target = array, buffer
+
+        for digit in range(passes):
+            preheader = builder.block
+
+            with builder.if_then(builder.icmp_signed('!=', builder.load(bucket(builder, first, digit)), count)):
+
+                builder.store(LONG(0), offset)
+
+                # each count becomes the position of the first element
+                # with that digit
+                with for_range(builder, LONG(0), LONG(buckets), name="offsets") as b:
+                    slot = builder.gep(counts, [INT(0), builder.add(b, LONG(digit * buckets))], inbounds=True)
+                    number = builder.load(slot)
+                    builder.store(builder.load(offset), slot)
+                    builder.store(builder.add(builder.load(offset), number), offset)
+
+                with for_range(builder, LONG(0), count, name="scatter") as i:
+                    value = builder.load(builder.gep(source, [i], inbounds=True))
+                    slot = bucket(builder, value, digit)
+                    position = builder.load(slot)
+                    builder.store(builder.add(position, LONG(1)), slot)
+                    builder.store(value, builder.gep(target, [position], inbounds=True))
+
+                moved = builder.block
+
+            new_source = builder.phi(source.type, name="source")
+            new_source.add_incoming(source, preheader)
+            new_source.add_incoming(target, moved)
+
+            new_target = builder.phi(target.type, name="target")
+            new_target.add_incoming(target, preheader)
+            new_target.add_incoming(source, moved)
+
+            source, target = new_source, new_target
+
+        with builder.if_then(builder.icmp_unsigned('!=', source, array)):
+            self.memcpy(builder, builder.bitcast(array, PTR), builder.bitcast(source, PTR), size)
+
+        builder.call(self.libc('free'), [memory])
+        builder.ret_void()
+
+        return func
+
+    def pow_int(self):
+        '''
+        i32 pc_pow_int(i32 base, i32 exponent)
+
+        Raises an INT to an INT power by repeated squaring, wrapping around
+        at 32 bits like multiplication does. A negative power is the
+        reciprocal truncated towards zero, which is 0 unless the base is 1
+        or -1.
+        '''
+
+        name = "pc_pow_int"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, INT, [INT, INT])
+        func.attributes.add('readnone')
+        base, exponent = func.args
+
+        with builder.if_then(builder.icmp_signed('<', exponent, INT(0)), likely=False):
+            odd = builder.trunc(exponent, BOOL)
+            one = builder.icmp_signed('==', base, INT(1))
+            minus_one = builder.icmp_signed('==', base, INT(-1))
+            builder.ret(builder.select(one, INT(1), builder.select(minus_one, builder.select(odd, INT(-1), INT(1)), INT(0))))
+
+        preheader = builder.block
+        cond = builder.append_basic_block(name="cond")
+        body = builder.append_basic_block(name="body")
+        end = builder.append_basic_block(name="end")
+
+        builder.branch(cond)
+        builder.position_at_end(cond)
+
+        result = builder.phi(INT, name="result")
+        square = builder.phi(INT, name="square")
+        rest = builder.phi(INT, name="rest")
+        result.add_incoming(INT(1), preheader)
+        square.add_incoming(base, preheader)
+        rest.add_incoming(exponent, preheader)
+        builder.cbranch(builder.icmp_signed('>', rest, INT(0)), body, end)
+
+        builder.position_at_end(body)
+        odd = builder.trunc(rest, BOOL)
+        result.add_incoming(builder.select(odd, builder.mul(result, square), result), body)
+        square.add_incoming(builder.mul(square, square), body)
+        rest.add_incoming(builder.lshr(rest, INT(1)), body)
+        builder.branch(cond)
+
+        builder.position_at_end(end)
+        builder.ret(result)
+
+        return func
+
+    def map_key_type(self, kind):
+
+        return INT if kind == "int" else MAP_STRING_KEY
+
+    def map_fields(self, builder, table):
+        '''Loads the probe distances, keys, values and capacity of a map'''
+
+        fields = [builder.load(builder.gep(table, [INT(0), INT(i)], inbounds=True)) for i in (0, 1, 2, 4)]
+
+        return fields
+
+    def map_home(self, builder, kind, key, capacity):
+        '''The slot a key hashes to, by Fibonacci hashing, which keeps the top bits'''
+
+        if kind == "int":
+            hashed = builder.zext(key, LONG)
+        else:
+            hashed = builder.extract_value(key, 2)
+
+        leading = builder.call(self.intrinsic('llvm.ctlz.i64', LONG, [LONG, BOOL]), [capacity, BOOL(1)])
+
+        return builder.lshr(builder.mul(hashed, LONG(FIBONACCI_HASH)), builder.add(leading, LONG(1)), name="home")
+
+    def map_string_key(self):
+        '''
+        key pc_map_string_key(i8* data, i64 length)
+
+        Hashes the characters of a string with FNV-1a into a map key that
+        still points at them
+        '''
+
+        name = "pc_map_string_key"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, MAP_STRING_KEY, [PTR, LONG])
+        data, length = func.args
+
+        entry = builder.block
+        loop = builder.append_basic_block(name="loop")
+        body = builder.append_basic_block(name="body")
+        done = builder.append_basic_block(name="done")
+
+        builder.branch(loop)
+        builder.position_at_end(loop)
+
+        index = builder.phi(LONG, name="i")
+        hashed = builder.phi(LONG, name="hash")
+        index.add_incoming(LONG(0), entry)
+        hashed.add_incoming(LONG(FNV_OFFSET), entry)
+        builder.cbranch(builder.icmp_signed('<', index, length), body, done)
+
+        builder.position_at_end(body)
+        char = builder.zext(builder.load(builder.gep(data, [index], inbounds=True)), LONG)
+        index.add_incoming(builder.add(index, LONG(1)), body)
+        hashed.add_incoming(builder.mul(builder.xor(hashed, char), LONG(FNV_PRIME)), body)
+        builder.branch(loop)
+
+        builder.position_at_end(done)
+        key = MAP_STRING_KEY(ir.Undefined)
+
+        for i, field in enumerate((data, length, hashed)):
+            key = builder.insert_value(key, field, i)
+
+        builder.ret(key)
+
+        return func
+
+    def map_same_string(self):
+        '''
+        i1 pc_map_same_string(key a, key b)
+
+        Whether two STRING keys hold the same characters, comparing the
+        hashes and lengths before the characters themselves
+        '''
+
+        name = "pc_map_same_string"
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, BOOL, [MAP_STRING_KEY, MAP_STRING_KEY])
+        first, second = func.args
+
+        same_hash = builder.icmp_unsigned('==', builder.extract_value(first, 2), builder.extract_value(second, 2))
+        length = builder.extract_value(first, 1)
+        same_length = builder.icmp_unsigned('==', length, builder.extract_value(second, 1))
+
+        with builder.if_then(builder.not_(builder.and_(same_hash, same_length))):
+            builder.ret(BOOL(0))
+
+        order = builder.call(self.libc('memcmp'), [builder.extract_value(first, 0), builder.extract_value(second, 0), length])
+        builder.ret(builder.icmp_signed('==', order, INT(0)))
+
+        return func
+
+    def map_same(self, builder, kind, first, second):
+
+        if kind == "int":
+            return builder.icmp_signed('==', first, second)
+
+        return builder.call(self.map_same_string(), [first, second])
+
+    def map_find(self, kind):
+        '''
+        i64 pc_map_find_int(map* m, i32 key)
+        i64 pc_map_find_string(map* m, key k)
+
+        The slot that holds a key, or -1. Entries are kept in Robin Hood
+        order, so the search stops at the first slot whose entry is closer
+        to its home slot than the key would be.
+        '''
+
+        name = "pc_map_find_" + kind
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, LONG, [MAP.as_pointer(), self.map_key_type(kind)])
+        table, key = func.args
+
+        distances, keys, values, capacity = self.map_fields(builder, table)
+        keys = builder.bitcast(keys, self.map_key_type(kind).as_pointer())
+
+        with builder.if_then(builder.icmp_signed('==', capacity, LONG(0))):
+            builder.ret(LONG(-1))
+
+        home = self.map_home(builder, kind, key, capacity)
+        mask = builder.sub(capacity, LONG(1))
+
+        entry = builder.block
+        loop = builder.append_basic_block(name="loop")
+        check = builder.append_basic_block(name="check")
+        compare = builder.append_basic_block(name="compare")
+        next_slot = builder.append_basic_block(name="next")
+        missing = builder.append_basic_block(name="missing")
+        found = builder.append_basic_block(name="found")
+
+        builder.branch(loop)
+        builder.position_at_end(loop)
+
+        index = builder.phi(LONG, name="i")
+        distance = builder.phi(LONG, name="distance")
+        index.add_incoming(home, entry)
+        distance.add_incoming(LONG(1), entry)
+
+        stored = builder.zext(builder.load(builder.gep(distances, [index], inbounds=True)), LONG)
+        builder.cbranch(builder.icmp_unsigned('<', stored, distance), missing, check)
+
+        builder.position_at_end(check)
+        builder.cbranch(builder.icmp_unsigned('==', stored, distance), compare, next_slot)
+
+        builder.position_at_end(compare)
+        same = self.map_same(builder, kind, builder.load(builder.gep(keys, [index], inbounds=True)), key)
+        builder.cbranch(same, found, next_slot)
+
+        builder.position_at_end(next_slot)
+        index.add_incoming(builder.and_(builder.add(index, LONG(1)), mask), next_slot)
+        distance.add_incoming(builder.add(distance, LONG(1)), next_slot)
+        builder.branch(loop)
+
+        builder.position_at_end(missing)
+        builder.ret(LONG(-1))
+
+        builder.position_at_end(found)
+        builder.ret(index)
+
+        return func
+
+    def map_place(self, kind):
+        '''
+        i64 pc_map_place_int(map* m, i32 key, i64 value)
+        i64 pc_map_place_string(map* m, key k, i64 value)
+
+        Adds a key that is not in the map yet and returns its slot. Going
+        along from the key's home slot, an entry that is closer to its own
+        home than the one being placed gives up its slot and is placed
+        further on in turn, which keeps every entry near its home. The map
+        grows when it is full or when an entry would end up more than
+        MAP_MAX_PROBE slots from home.
+        '''
+
+        name = "pc_map_place_" + kind
+
+        if self.function(name):
+            return self.function(name)
+
+        key_type = self.map_key_type(kind)
+
+        func, builder = self.define(name, LONG, [MAP.as_pointer(), key_type, LONG])
+        table, key, value = func.args
+
+        count_field = builder.gep(table, [INT(0), INT(3)], inbounds=True)
+        count = builder.load(count_field)
+        capacity = builder.load(builder.gep(table, [INT(0), INT(4)], inbounds=True))
+
+        full = builder.icmp_unsigned('>', builder.mul(builder.add(count, LONG(1)), LONG(MAP_LOAD[1])),
+                                     builder.mul(capacity, LONG(MAP_LOAD[0])))
+
+        with builder.if_then(full, likely=False):
+            builder.call(self.map_grow(kind), [table])
+
+        distances, keys, values, capacity = self.map_fields(builder, table)
+        keys = builder.bitcast(keys, key_type.as_pointer())
+
+        home = self.map_home(builder, kind, key, capacity)
+        mask = builder.sub(capacity, LONG(1))
+
+        entry = builder.block
+        loop = builder.append_basic_block(name="loop")
+        empty = builder.append_basic_block(name="empty")
+        taken = builder.append_basic_block(name="taken")
+        overflow = builder.append_basic_block(name="overflow")
+
+        builder.branch(loop)
+        builder.position_at_end(loop)
+
+        index = builder.phi(LONG, name="i")
+        distance = builder.phi(LONG, name="distance")
+        current_key = builder.phi(key_type, name="key")
+        current_value = builder.phi(LONG, name="value")
+        result = builder.phi(LONG, name="result")
+
+        for phi, start in ((index, home), (distance, LONG(1)), (current_key, key), (current_value, value), (result, LONG(-1))):
+            phi.add_incoming(start, entry)
+
+        distance_slot = builder.gep(distances, [index], inbounds=True)
+        key_slot = builder.gep(keys, [index], inbounds=True)
+        value_slot = builder.gep(values, [index], inbounds=True)
+
+        stored = builder.zext(builder.load(distance_slot), LONG)
+        placed = builder.select(builder.icmp_signed('<', result, LONG(0)), index, result)
+        builder.cbranch(builder.icmp_unsigned('==', stored, LONG(0)), empty, taken)
+
+        builder.position_at_end(empty)
+        builder.store(builder.trunc(distance, CHAR), distance_slot)
+        builder.store(current_key, key_slot)
+        builder.store(current_value, value_slot)
+        builder.store(builder.add(builder.load(count_field), LONG(1)), count_field)
+        builder.ret(placed)
+
+        builder.position_at_end(taken)
+        richer = builder.icmp_unsigned('<', stored, distance)
+        old_key = builder.load(key_slot)
+        old_value = builder.load(value_slot)
+
+        with builder.if_then(richer):
+            builder.store(builder.trunc(distance, CHAR), distance_slot)
+            builder.store(current_key, key_slot)
+            builder.store(current_value, value_slot)
+
+        next_distance = builder.add(builder.select(richer, stored, distance), LONG(1))
+        next_key = builder.select(richer, old_key, current_key)
+        next_value = builder.select(richer, old_value, current_value)
+
+        index.add_incoming(builder.and_(builder.add(index, LONG(1)), mask), builder.block)
+        distance.add_incoming(next_distance, builder.block)
+        current_key.add_incoming(next_key, builder.block)
+        current_value.add_incoming(next_value, builder.block)
+        result.add_incoming(builder.select(richer, placed, result), builder.block)
+
+        builder.cbranch(builder.icmp_unsigned('>', next_distance, LONG(MAP_MAX_PROBE)), overflow, loop)
+
+        # the entry that is still being carried is placed again after
+        # growing, which moves every slot, so the key is looked up afresh
+        builder.position_at_end(overflow)
+        builder.call(self.map_grow(kind), [table])
+        builder.call(func, [table, next_key, next_value])
+        builder.ret(builder.call(self.map_find(kind), [table, key]))
+
+        return func
+
+    def map_grow(self, kind):
+        '''
+        void pc_map_grow_int(map* m)
+        void pc_map_grow_string(map* m)
+
+        Doubles the capacity of a map, starting from MAP_MIN_CAPACITY, and
+        places every entry again
+        '''
+
+        name = "pc_map_grow_" + kind
+
+        if self.function(name):
+            return self.function(name)
+
+        key_type = self.map_key_type(kind)
+
+        func, builder = self.define(name, VOID, [MAP.as_pointer()])
+        table = func.args[0]
+
+        distances, keys, values, capacity = self.map_fields(builder, table)
+        keys = builder.bitcast(keys, key_type.as_pointer())
+
+        grown = builder.select(builder.icmp_signed('==', capacity, LONG(0)), LONG(MAP_MIN_CAPACITY), builder.shl(capacity, LONG(1)))
+
+        arrays = []
+
+        for size in (1, MAP_KEY_SIZE[kind], 8):
+            memory = builder.call(self.libc('calloc'), [grown, LONG(size)])
+
+            with builder.if_then(builder.icmp_unsigned('==', memory, PTR(None)), likely=False):
+                builder.call(self.out_of_memory(), [builder.mul(grown, LONG(size))])
+
+            arrays.append(memory)
+
+        builder.store(arrays[0], builder.gep(table, [INT(0), INT(0)], inbounds=True))
+        builder.store(arrays[1], builder.gep(table, [INT(0), INT(1)], inbounds=True))
+        builder.store(builder.bitcast(arrays[2], LONG.as_pointer()), builder.gep(table, [INT(0), INT(2)], inbounds=True))
+        builder.store(LONG(0), builder.gep(table, [INT(0), INT(3)], inbounds=True))
+        builder.store(grown, builder.gep(table, [INT(0), INT(4)], inbounds=True))
+
+        with for_range(builder, LONG(0), capacity, name="move") as i:
+            used = builder.load(builder.gep(distances, [i], inbounds=True))
+
+            with builder.if_then(builder.icmp_unsigned('!=', used, CHAR(0))):
+                key = builder.load(builder.gep(keys, [i], inbounds=True))
+                value = builder.load(builder.gep(values, [i], inbounds=True))
+                builder.call(self.map_place(kind), [table, key, value])
+
+        for array in (distances, keys, values):
+            builder.call(self.libc('free'), [builder.bitcast(array, PTR)])
+
+        builder.ret_void()
+
+        return func
+
+    def map_insert(self, kind):
+        '''
+        i64 pc_map_insert_int(map* m, i32 key)
+        i64 pc_map_insert_string(map* m, key k)
+
+        The slot that holds a key, adding it with a value of 0 if it is not
+        in the map yet. A STRING key is copied, so the map keeps it after
+        the string it came from changes.
+        '''
+
+        name = "pc_map_insert_" + kind
+
+        if self.function(name):
+            return self.function(name)
+
+        func, builder = self.define(name, LONG, [MAP.as_pointer(), self.map_key_type(kind)])
+        table, key = func.args
+
+        slot = builder.call(self.map_find(kind), [table, key])
+
+        with builder.if_then(builder.icmp_signed('>=', slot, LONG(0))):
+            builder.ret(slot)
+
+        if kind == "string":
+            length = builder.extract_value(key, 1)
+            copy = builder.call(self.libc('calloc'), [builder.add(length, LONG(1)), LONG(1)])
+
+            with builder.if_then(builder.icmp_unsigned('==', copy, PTR(None)), likely=False):
+                builder.call(self.out_of_memory(), [builder.add(length, LONG(1))])
+
+            with builder.if_then(builder.icmp_signed('>', length, LONG(0))):
+                self.memcpy(builder, copy, builder.extract_value(key, 0), length)
+
+            key = builder.insert_value(key, copy, 0)
+
+        builder.ret(builder.call(self.map_place(kind), [table, key, LONG(0)]))
+
+        return func
+
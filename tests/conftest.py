@@ -0,0 +1,108 @@
+'''
+Compiles pseudocode programs with src/compiler.py and runs them under lli
+'''
+
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COMPILER = os.path.join(HERE, os.pardir, "src", "compiler.py")
+
+
+class Program:
+
+    def __init__(self, directory):
+
+        self.directory = directory
+        self.count = 0
+        self.messages = ""
+        self.output = []
+
+    def compile(self, source, flags=()):
+        '''Compiles a program, given as source text, and returns the path of its IR'''
+
+        self.count += 1
+
+        program = os.path.join(self.directory, "program%d.pc" % self.count)
+        output = os.path.join(self.directory, "program%d.ll" % self.count)
+
+        with open(program, "w") as f:
+            f.write(textwrap.dedent(source).strip() + "\n")
+
+        return self.compile_file(program, flags, output)
+
+    def compile_file(self, program, flags=(), output=None):
+
+        output = output or os.path.join(self.directory, os.path.splitext(os.path.basename(program))[0] + ".ll")
+
+        result = subprocess.run([sys.executable, COMPILER, "--filename=" + program, "--output=" + output] + list(flags),
+                                capture_output=True, text=True)
+
+        assert result.returncode == 0 and os.path.exists(output), result.stdout + result.stderr
+
+        # what the compiler printed, like its reports on inlining and parallel loops
+        self.messages = result.stdout
+
+        return output
+
+    def ir(self, source, flags=()):
+        '''The IR of a program'''
+
+        with open(self.compile(source, flags)) as f:
+            return f.read()
+
+    def optimize(self, ir_file):
+        '''Runs the IR through opt -O2, as the README suggests, and returns the path of the result'''
+
+        if shutil.which("opt") is None:
+            pytest.skip("opt is not installed")
+
+        output = os.path.splitext(ir_file)[0] + ".O2.ll"
+        subprocess.run(["opt", "-O2", "-S", ir_file, "-o", output], check=True)
+
+        return output
+
+    def run_ir(self, ir_file, stdin="", env=None):
+
+        result = subprocess.run(["lli", ir_file], input=stdin, capture_output=True, text=True,
+                                env=dict(os.environ, **(env or {})), timeout=60)
+
+        assert result.returncode == 0, result.stderr
+
+        return result.stdout.split()
+
+    def run(self, source, flags=(), stdin="", env=None):
+        '''Compiles and runs a program, returning the words it outputs'''
+
+        return self.run_ir(self.compile(source, flags), stdin, env)
+
+    def fails(self, source, flags=(), stdin=""):
+        '''Compiles and runs a program that has to stop with an error, returning the error'''
+
+        return self.fails_ir(self.compile(source, flags), stdin)
+
+    def fails_ir(self, ir_file, stdin=""):
+
+        result = subprocess.run(["lli", ir_file], input=stdin, capture_output=True, text=True, timeout=60)
+
+        assert result.returncode != 0, result.stdout
+
+        # what the program output before it stopped
+        self.output = result.stdout.split()
+
+        return result.stderr.strip()
+
+
+@pytest.fixture
+def program(tmp_path):
+
+    if shutil.which("lli") is None:
+        pytest.skip("lli is not installed")
+
+    return Program(str(tmp_path))
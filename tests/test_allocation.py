@@ -0,0 +1,86 @@
+'''
+Heap arrays: element sizes, alignment, arrays mapped from the operating system and 64-bit indices
+'''
+
+import re
+
+import pytest
+
+
+def test_arrays_are_allocated_by_element_size_and_aligned(program):
+
+    ir = program.ir('''
+        n = 3
+        INT a[n]
+        DOUBLE b[n]
+        a[0] = 1
+        b[0] = 2.0
+        OUTPUT a[0]
+        OUTPUT b[0]
+    ''')
+
+    assert re.search(r'call i8\* @"pc_array_alloc"\(i64 %"idx[.\d]*", i64 4\)', ir)
+    assert re.search(r'call i8\* @"pc_array_alloc"\(i64 %"idx[.\d]*", i64 8\)', ir)
+    assert 'call i8* @"aligned_alloc"(i64 64,' in ir
+    assert 'call i8* @"mmap"(' in ir
+
+
+@pytest.mark.parametrize("flags", [(), ("--alloc=arena",)])
+def test_neighbouring_arrays_of_odd_sizes_do_not_overlap(program, flags):
+
+    assert program.run('''
+        n = 3
+        INT a[n]
+        DOUBLE b[n + 2]
+        INT c[n * 5]
+        FOR i = 0 TO n - 1
+            a[i] = -1
+        NEXT i
+        FOR i = 0 TO n + 1
+            b[i] = -2.0
+        NEXT i
+        FOR i = 0 TO n * 5 - 1
+            c[i] = i
+        NEXT i
+        OUTPUT a[0] + a[n - 1]
+        OUTPUT b[0] + b[n + 1]
+        OUTPUT SUM(c, n * 5)
+    ''', flags) == ["-2", "-4.000000", "105"]
+
+
+def test_large_array_is_mapped_with_zeros(program):
+
+    # 80 MB, past the 64 MB at which arrays are mapped rather than allocated
+    assert program.run('''
+        n = 20000000
+        INT x[n]
+        x[0] = 5
+        x[n - 1] = 7
+        zeros = 0
+        i = 1
+        WHILE i < n - 1 DO
+            IF x[i] == 0 THEN
+                zeros = zeros + 1
+            ENDIF
+            i = i + 4096
+        ENDWHILE
+        OUTPUT x[0] + x[n - 1]
+        OUTPUT zeros
+    ''') == ["12", str(len(range(1, 20000000 - 1, 4096)))]
+
+
+def test_array_larger_than_2_gb(program):
+
+    # 2.4 GB: the byte offsets of the last elements do not fit in 32 bits,
+    # and only the pages that are touched are ever backed by memory
+    assert program.run('''
+        n = 300000000
+        DOUBLE x[n]
+        x[0] = 2.5
+        x[n - 1] = 1.5
+        x[n / 2] = 0.25
+        OUTPUT x[n - 1]
+        OUTPUT x[n / 2]
+        OUTPUT x[0]
+        OUTPUT x[n - 2]
+    ''') == ["1.500000", "0.250000", "2.500000", "0.000000"]
@@ -0,0 +1,51 @@
+'''
+--alloc=arena, which releases what a loop iteration or subroutine call allocated
+'''
+
+import pytest
+
+
+@pytest.mark.parametrize("use", [
+    "m[k + \"!\"] = i",
+    "x = first(k + \"!\")",
+])
+def test_joined_strings_outlive_the_iteration(program, use):
+
+    source = '''
+        MAP m FROM STRING TO INT
+        INT SUBROUTINE first(STRING s)
+            RETURN 0
+        ENDSUBROUTINE
+        k = "key"
+        x = 0
+        FOR i = 0 TO 2
+            n = 16 + i * 64
+            INT a[n]
+            FOR j = 0 TO n - 1
+                a[j] = 0
+            NEXT j
+            %s
+            OUTPUT a[MIN(i, 1) * 16] + x
+        NEXT i
+    ''' % use
+
+    assert program.run(source, ["--alloc=arena", "--inline-threshold=0"]) == ["0", "0", "0"]
+
+
+def test_loop_arrays_are_released_every_iteration(program):
+
+    source = '''
+        total = 0
+        FOR i = 1 TO 1000
+            n = 10000 + i
+            INT a[n]
+            FOR j = 0 TO n - 1
+                a[j] = j
+            NEXT j
+            total = total + a[n - 1] - n
+        NEXT i
+        OUTPUT total
+    '''
+
+    assert program.run(source, ["--alloc=arena"]) == ["-1000"]
+    assert "pc_arena_release" in program.ir(source, ["--alloc=arena"])
@@ -0,0 +1,198 @@
+'''
+Array reductions, sorting, growable arrays, several dimensions, records and whole-array arithmetic
+'''
+
+import pytest
+
+
+def test_reductions(program):
+
+    assert program.run('''
+        n = 6
+        INT x[n]
+        x[0] = 4
+        x[1] = -2
+        x[2] = 7
+        x[3] = -2
+        x[4] = 7
+        x[5] = 0
+        OUTPUT SUM(x, n)
+        OUTPUT MIN(x, n)
+        OUTPUT MAX(x, n)
+        OUTPUT ARGMIN(x, n)
+        OUTPUT COUNT(x, n, 7)
+        OUTPUT SUM(x, 0)
+    ''') == ["14", "-2", "7", "1", "2", "0"]
+
+
+def test_sort_small_and_large(program):
+
+    assert program.run('''
+        n = 100000
+        INT x[n]
+        DOUBLE y[5]
+        FOR i = 0 TO n - 1
+            x[i] = (i * 7919) % 100003 - 50000
+        NEXT i
+        SORT x, n
+        sorted = 1
+        FOR i = 1 TO n - 1
+            IF x[i - 1] > x[i] THEN
+                sorted = 0
+            ENDIF
+        NEXT i
+        OUTPUT sorted
+        y[0] = 2.5
+        y[1] = -1.0
+        y[2] = 9.0
+        y[3] = 0.0
+        y[4] = 3.0
+        SORT y, 5 DESCENDING
+        OUTPUT y[0]
+        OUTPUT y[4]
+    ''') == ["1", "9.000000", "-1.000000"]
+
+
+def test_append_grows_an_array(program):
+
+    assert program.run('''
+        INT evens[]
+        FOR i = 1 TO 100000
+            IF i % 2 == 0 THEN
+                APPEND evens, i
+            ENDIF
+        NEXT i
+        OUTPUT LENGTH(evens)
+        OUTPUT evens[LENGTH(evens) - 1]
+    ''', ["--bounds-check"]) == ["50000", "100000"]
+
+
+def test_rows_are_stored_one_after_another(program):
+
+    assert program.run('''
+        rows = 3
+        cols = 4
+        INT grid[rows, cols]
+        FOR i = 0 TO rows - 1
+            FOR j = 0 TO cols - 1
+                grid[i, j] = i * 10 + j
+            NEXT j
+        NEXT i
+        OUTPUT grid[2, 3]
+        OUTPUT SUM(grid, rows * cols)
+    ''', ["--bounds-check"]) == ["23", "138"]
+
+
+def test_index_out_of_its_dimension(program):
+
+    error = program.fails('''
+        INT grid[3, 4]
+        j = 4
+        grid[0, j] = 1
+    ''', ["--bounds-check"])
+
+    assert "out of bounds" in error
+
+
+@pytest.mark.parametrize("layout", ["AOS", "SOA"])
+def test_records_give_the_same_results_in_either_layout(program, layout):
+
+    assert program.run('''
+        RECORD Particle LAYOUT %s
+            DOUBLE x
+            DOUBLE vx
+            INT id
+        ENDRECORD
+        n = 1000
+        Particle p[n]
+        FOR i = 0 TO n - 1
+            p[i].x = i
+            p[i].vx = 0.5
+            p[i].id = i * 2
+        NEXT i
+        FOR i = 0 TO n - 1
+            p[i].x = p[i].x + p[i].vx
+        NEXT i
+        OUTPUT p[n - 1].x
+        OUTPUT p[n - 1].id
+    ''' % layout) == ["999.500000", "1998"]
+
+
+def test_whole_array_arithmetic(program):
+
+    assert program.run('''
+        n = 5
+        INT a[n]
+        INT b[n]
+        DOUBLE c[n]
+        FOR i = 0 TO n - 1
+            a[i] = i
+            b[i] = 10 - i
+        NEXT i
+        k = 3
+        c = a + b * 2
+        c = c / 2.5
+        a = -a
+        b = b % k + a * (k * 2)
+        OUTPUT c, n SEPARATOR " "
+        OUTPUT a, n SEPARATOR " "
+        OUTPUT b, n SEPARATOR " "
+    ''') == ["8.000000", "7.600000", "7.200000", "6.800000", "6.400000",
+             "0", "-1", "-2", "-3", "-4",
+             "1", "-6", "-10", "-17", "-24"]
+
+
+def test_whole_array_arithmetic_on_the_same_array(program):
+
+    assert program.run('''
+        n = 4
+        DOUBLE x[n]
+        FOR i = 0 TO n - 1
+            x[i] = i + 1
+        NEXT i
+        x = x * x + x
+        x = SQRT(x - x + 16) + MAX(0, x - 10)
+        OUTPUT x, n SEPARATOR " "
+    ''') == ["4.000000", "4.000000", "6.000000", "14.000000"]
+
+
+def test_whole_array_arithmetic_on_arrays_of_different_lengths(program):
+
+    # only the elements that every array in the statement has are assigned
+    assert program.run('''
+        INT a[3]
+        INT b[6]
+        INT c[5]
+        FOR i = 0 TO 5
+            b[i] = 1
+        NEXT i
+        FOR i = 0 TO 4
+            c[i] = -1
+        NEXT i
+        FOR i = 0 TO 2
+            a[i] = 10 * i
+        NEXT i
+        c = a + b
+        b = b * 7
+        a = c + b
+        OUTPUT c, 5 SEPARATOR " "
+        OUTPUT b, 6 SEPARATOR " "
+        OUTPUT a, 3 SEPARATOR " "
+    ''') == ["1", "11", "21", "-1", "-1",
+             "7", "7", "7", "7", "7", "7",
+             "8", "18", "28"]
+
+
+def test_whole_array_arithmetic_is_one_vectorizable_loop(program):
+
+    ir = program.ir('''
+        n = 100
+        INT a[n]
+        DOUBLE c[n]
+        k = 2
+        c = a * (k * 2) + 1.5
+        OUTPUT c[0]
+    ''')
+
+    assert "llvm.loop.vectorize.enable" in ir
+    assert ir.count("sitofp") == 1
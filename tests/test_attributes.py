@@ -0,0 +1,69 @@
+'''
+The attributes subroutines are given from what the purity analysis proves
+'''
+
+import re
+
+
+def definition(ir, name):
+    '''The define line of a subroutine'''
+
+    return re.search(r'^define .*@"' + name + r'"\(.*$', ir, re.MULTILINE).group(0)
+
+
+def test_pure_leaf_function(program):
+
+    ir = program.ir('''
+        INT SUBROUTINE square(INT x)
+            RETURN x * x
+        ENDSUBROUTINE
+        OUTPUT square(7)
+    ''', ["--inline-threshold=0"])
+
+    assert "readnone" in definition(ir, "square")
+    assert "norecurse" in definition(ir, "square")
+
+
+def test_recursive_function_is_not_norecurse(program):
+
+    ir = program.ir('''
+        INT SUBROUTINE down(INT x)
+            IF x == 0 THEN
+                RETURN 0
+            ENDIF
+            RETURN down(x - 1) + 1
+        ENDSUBROUTINE
+        OUTPUT down(7)
+    ''', ["--inline-threshold=0"])
+
+    assert "norecurse" not in definition(ir, "down")
+    assert "readnone" in definition(ir, "down")
+
+
+PEEK = '''
+    INT SUBROUTINE peek(INT a[], INT k)
+        RETURN a[k]
+    ENDSUBROUTINE
+    INT x[4]
+    x[0] = 1
+    d = peek(x, %d)
+    OUTPUT 7
+'''
+
+
+def test_reading_function_is_readonly(program):
+
+    ir = program.ir(PEEK % 0, ["--inline-threshold=0"])
+
+    assert "readonly" in definition(ir, "peek")
+
+
+def test_bounds_check_survives_optimization(program):
+
+    ir_file = program.compile(PEEK % 10, ["--bounds-check", "--inline-threshold=0"])
+
+    assert "readonly" not in definition(open(ir_file).read(), "peek")
+
+    error = program.fails_ir(program.optimize(ir_file))
+
+    assert error == "Index 10 is out of bounds for a, which has 4 elements"
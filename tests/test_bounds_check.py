@@ -0,0 +1,88 @@
+'''
+--bounds-check, which stops a program that indexes outside an array
+'''
+
+import pytest
+
+
+def test_index_out_of_bounds(program):
+
+    assert program.fails('''
+        INT x[5]
+        i = 7
+        x[i] = 1
+    ''', ["--bounds-check"]) == "Index 7 is out of bounds for x, which has 5 elements"
+
+
+def test_negative_index_in_a_loop(program):
+
+    error = program.fails('''
+        n = 10
+        INT x[n]
+        FOR i = 0 TO n - 1
+            x[i - 1] = i
+        NEXT i
+    ''', ["--bounds-check"])
+
+    assert error == "Index -1 is out of bounds for x, which has 10 elements"
+
+
+@pytest.mark.parametrize("flags", [["--bounds-check"], ["--bounds-check", "--auto-parallel"]])
+def test_indexes_in_bounds_run_unchanged(program, flags):
+
+    assert program.run('''
+        n = 100000
+        INT x[n]
+        total = 0
+        FOR i = 0 TO n - 1
+            x[i] = i % 10
+        NEXT i
+        FOR i = 0 TO n - 1
+            total = total + x[i]
+        NEXT i
+        OUTPUT total
+    ''', flags) == ["450000"]
+
+
+def test_indexes_of_several_dimensions_proven_in_bounds(program):
+
+    assert program.run('''
+        n = 300
+        m = 200
+        DOUBLE grid[n, m]
+        INT small[4, 5]
+        FOR i = 0 TO n - 1
+            FOR j = 0 TO m - 1
+                grid[i, j] = i + j
+            NEXT j
+        NEXT i
+        FOR i = 0 TO 3
+            FOR j = 0 TO 4
+                small[i, j] = i * j
+            NEXT j
+        NEXT i
+        total = 0.0
+        FOR i = 1 TO n - 2
+            FOR j = 0 TO m - 1
+                total = total + grid[i - 1, j] + grid[i + 1, j]
+            NEXT j
+        NEXT i
+        OUTPUT total
+        OUTPUT small[3, 4]
+    ''', ["--bounds-check"]) == ["29680800.000000", "12"]
+
+    assert "5 array accesses, 5 proven in bounds" in program.messages
+
+
+def test_dimension_whose_size_changes_after_the_declaration(program):
+
+    error = program.fails('''
+        m = 3
+        INT g[2, m]
+        m = m + 1
+        FOR j = 0 TO m - 1
+            g[1, j] = j
+        NEXT j
+    ''', ["--bounds-check"])
+
+    assert error == "Index 3 is out of bounds for g along dimension 2, which has 3 elements"
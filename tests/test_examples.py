@@ -0,0 +1,30 @@
+'''
+The example programs that finish on their own, compiled with each of the compiler's options
+'''
+
+import os
+
+import pytest
+
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "examples")
+
+
+FLAGS = [[], ["--bounds-check"], ["--auto-parallel"], ["--alloc=arena"], ["--inline-threshold=0"]]
+
+EXAMPLE_RUNS = [
+    ("even.pc", "", lambda words: words[:3] == ["Even", "Odd", "Even"] and len(words) == 100),
+    ("selection_sort.pc", "5\n3\n1\n4\n1\n5\n", lambda words: words[-5:] == ["1", "1", "3", "4", "5"]),
+    ("guessing_game.pc", "7\n3\n1\n9\n7\n", lambda words: words[-3:] == ["1", "9", "7"]),
+    ("hello_world.pc", "", lambda words: words == ["Hello", "World"]),
+    ("fibonacci.pc", "", lambda words: words[-2:] == ["39088169", "63245986"]),
+]
+
+
+@pytest.mark.parametrize("flags", FLAGS, ids=lambda flags: " ".join(flags) or "default")
+@pytest.mark.parametrize("example, stdin, check", EXAMPLE_RUNS, ids=[run[0] for run in EXAMPLE_RUNS])
+def test_example(program, example, stdin, check, flags):
+
+    words = program.run_ir(program.compile_file(os.path.join(EXAMPLES, example), flags), stdin)
+
+    assert check(words), words
@@ -0,0 +1,99 @@
+'''
+Arrays mapped from files, and files opened with OPENFILE
+'''
+
+import struct
+
+import pytest
+
+
+def test_array_mapped_from_a_file(program, tmp_path):
+
+    path = tmp_path / "samples.bin"
+    path.write_bytes(struct.pack("=1000i", *range(1000)))
+
+    assert program.run('''
+        INT samples[] FROM FILE "%s" SEQUENTIAL
+        OUTPUT LENGTH(samples)
+        OUTPUT SUM(samples, LENGTH(samples))
+        samples[0] = 42
+        SYNC samples
+    ''' % path) == ["1000", "499500"]
+
+    assert struct.unpack("=i", path.read_bytes()[:4]) == (42,)
+
+
+def test_reading_and_writing_files(program, tmp_path):
+
+    data = tmp_path / "readings.csv"
+    report = tmp_path / "report.txt"
+    data.write_text("1,2,3\n4.5\n")
+
+    assert program.run('''
+        OPENFILE data, "%s", READ
+        OPENFILE report, "%s", WRITE
+        x = 0.0
+        total = 0.0
+        WHILE EOF(data) == 0 DO
+            READFILE data, x
+            total = total + x
+            WRITEFILE report, x * 2
+        ENDWHILE
+        WRITEFILE report, total
+        CLOSEFILE data
+        CLOSEFILE report
+        OUTPUT "done"
+    ''' % (data, report)) == ["done"]
+
+    assert report.read_text().split() == ["2.000000", "4.000000", "6.000000", "9.000000", "10.500000"]
+
+
+def test_missing_file(program, tmp_path):
+
+    error = program.fails('''
+        OPENFILE data, "%s", READ
+        CLOSEFILE data
+    ''' % (tmp_path / "missing.txt"))
+
+    assert "missing.txt" in error
+
+
+def test_files_are_written_out_when_the_program_stops_with_an_error(program, tmp_path):
+
+    log = tmp_path / "log.txt"
+    report = tmp_path / "report.txt"
+    log.write_text("earlier\n")
+
+    error = program.fails('''
+        OPENFILE log, "%s", APPEND
+        OPENFILE report, "%s", WRITE
+        WRITEFILE log, 42
+        WRITEFILE report, 1.5
+        OUTPUT 7
+        CLOSEFILE report
+        WRITEFILE report, 3
+    ''' % (log, report))
+
+    assert "not open" in error
+    assert program.output == ["7"]
+    assert log.read_text() == "earlier\n42\n"
+    assert report.read_text() == "1.500000\n"
+
+
+@pytest.mark.parametrize("flags", [(), ("--alloc=arena",)])
+def test_files_are_written_out_when_an_index_is_out_of_bounds(program, tmp_path, flags):
+
+    report = tmp_path / "report.txt"
+
+    error = program.fails('''
+        OPENFILE report, "%s", WRITE
+        n = 3
+        INT x[n]
+        FOR i = 0 TO n
+            x[i] = i
+            WRITEFILE report, i
+        NEXT i
+    ''' % report, ("--bounds-check",) + flags)
+
+    assert "out of bounds" in error
+    assert report.read_text() == "0\n1\n2\n"
@@ -0,0 +1,91 @@
+'''
+Inlining of small pure subroutines
+'''
+
+
+SMOOTH = '''
+    DOUBLE SUBROUTINE smooth(DOUBLE a, DOUBLE b)
+        s = a + b
+        d = s * 0.5
+        RETURN d * d
+    ENDSUBROUTINE
+    INT SUBROUTINE twice(INT x)
+        RETURN x * 2
+    ENDSUBROUTINE
+    n = 100000
+    DOUBLE x[n]
+    DOUBLE y[n]
+    FOR i = 0 TO n - 1
+        x[i] = twice(i % 10)
+    NEXT i
+    FOR i = 0 TO n - 1
+        y[i] = smooth(x[i], 1.0)
+    NEXT i
+    total = 0.0
+    FOR i = 0 TO n - 1
+        total = total + y[i]
+    NEXT i
+    OUTPUT total
+    OUTPUT twice(twice(3))
+'''
+
+
+def test_inlined_calls_give_the_same_output(program):
+
+    expected = program.run(SMOOTH, ["--inline-threshold=0"])
+    assert program.messages == ""
+
+    assert program.run(SMOOTH) == expected
+    assert program.messages.startswith("inlined 4 call sites")
+
+
+def test_inlined_calls_in_a_parallel_loop(program):
+
+    expected = program.run(SMOOTH, ["--inline-threshold=0"])
+
+    assert program.run(SMOOTH, ["--auto-parallel"], env={"PC_NUM_THREADS": "8"}) == expected
+    assert "not parallelized" not in program.messages
+
+
+def test_recursive_and_impure_calls_are_not_inlined(program):
+
+    assert program.run('''
+        INT SUBROUTINE down(INT x)
+            IF x == 0 THEN
+                RETURN 0
+            ENDIF
+            RETURN down(x - 1) + 1
+        ENDSUBROUTINE
+        INT SUBROUTINE noisy(INT x)
+            OUTPUT x
+            RETURN x
+        ENDSUBROUTINE
+        OUTPUT down(5) + noisy(1)
+    ''') == ["1", "6"]
+
+    assert "inlined" not in program.messages
+
+
+def test_threshold_and_budget(program):
+
+    source = '''
+        INT SUBROUTINE small(INT x)
+            RETURN x + 1
+        ENDSUBROUTINE
+        INT SUBROUTINE large(INT x)
+            a = x * 3 + 1
+            b = a * a - x
+            c = b % 7 + a % 5
+            RETURN a + b + c
+        ENDSUBROUTINE
+        OUTPUT small(1) + small(2) + small(3) + large(4)
+    '''
+
+    assert program.run(source) == ["194"]
+    assert program.messages.startswith("inlined 4 call sites")
+
+    assert program.run(source, ["--inline-threshold=10"]) == ["194"]
+    assert program.messages.startswith("inlined 3 call sites")
+
+    assert program.run(source, ["--inline-budget=2"]) == ["194"]
+    assert program.messages.startswith("inlined 2 call sites")
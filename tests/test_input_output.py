@@ -0,0 +1,105 @@
+'''
+INPUT and OUTPUT of numbers, strings and whole arrays
+'''
+
+import os
+import select
+import subprocess
+
+
+def test_input_skips_whitespace(program):
+
+    assert program.run('''
+        x = 0
+        y = 0.0
+        INPUT x
+        INPUT y
+        OUTPUT x + 1
+        OUTPUT y * 2
+    ''', stdin="  41 \n\n 1.25\n") == ["42", "2.500000"]
+
+
+def test_numbers_in_every_form(program):
+
+    assert program.run('''
+        x = 0
+        y = 0.0
+        total = 0.0
+        FOR i = 1 TO 6
+            INPUT y
+            total = total + y
+        NEXT i
+        INPUT x
+        OUTPUT total
+        OUTPUT x
+    ''', stdin="1 -2.5 +3 0.25\t1e2\n-1.5E-1\n-2147483648") == ["101.600000", "-2147483648"]
+
+
+def test_prompts_are_written_before_input_is_read(program):
+
+    ir_file = program.compile('''
+        x = 0
+        OUTPUT "first"
+        INPUT x
+        OUTPUT x * 2
+        OUTPUT "second"
+        INPUT x
+        OUTPUT x * 3
+    ''')
+
+    process = subprocess.Popen(["lli", ir_file], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    pending = []
+
+    # reads straight from the pipe, so that a line is only seen once the
+    # program has written it
+    def line():
+        while "\n" not in "".join(pending):
+            ready, _, _ = select.select([process.stdout], [], [], 30)
+            assert ready, "the program waits for input before writing what it has output"
+            pending.append(os.read(process.stdout.fileno(), 4096).decode())
+
+        text = "".join(pending)
+        first, rest = text.split("\n", 1)
+        pending[:] = [rest] if rest else []
+
+        return first.strip()
+
+    try:
+        assert line() == "first"
+        process.stdin.write("21\n")
+        process.stdin.flush()
+
+        assert line() == "42"
+        assert line() == "second"
+        process.stdin.write("5\n")
+        process.stdin.close()
+
+        assert line() == "15"
+
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_whole_array_input_and_output(program):
+
+    source = '''
+        n = 5
+        INT x[n]
+        INPUT x, n
+        OUTPUT x, n SEPARATOR ", "
+        OUTPUT x, 2
+    '''
+
+    assert program.run(source, stdin="3 1 4\n1 5\n") == ["3,", "1,", "4,", "1,", "5", "3", "1"]
+
+
+def test_whole_array_input_stops_when_the_input_runs_out(program):
+
+    assert program.run('''
+        INT x[4]
+        x[2] = 6
+        x[3] = 9
+        INPUT x, 4
+        OUTPUT x, 4
+    ''', stdin="7 8\n") == ["7", "8", "6", "9"]
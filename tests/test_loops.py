@@ -0,0 +1,58 @@
+'''
+WHILE and FOR loops, and --auto-parallel
+'''
+
+
+def test_while_tests_its_condition_first(program):
+
+    assert program.run('''
+        i = 5
+        n = 0
+        WHILE i < 3 DO
+            n = n + 1
+        ENDWHILE
+        OUTPUT n
+    ''') == ["0"]
+
+
+def test_for_includes_its_final_value(program):
+
+    assert program.run('''
+        total = 0
+        FOR i = 1 TO 10
+            total = total + i
+        NEXT i
+        OUTPUT total
+        count = 0
+        FOR i = 1 TO 0
+            count = count + 1
+        NEXT i
+        OUTPUT count
+    ''') == ["55", "0"]
+
+
+PARALLEL_SUM = '''
+    n = 1000000
+    INT x[n]
+    INT y[n]
+    FOR i = 0 TO n - 1
+        x[i] = i % 7
+    NEXT i
+    total = 0
+    i = 0
+    WHILE i < n DO
+        y[i] = x[i] * 2
+        total = total + x[i]
+        i = i + 1
+    ENDWHILE
+    OUTPUT total
+    OUTPUT y[n - 1]
+'''
+
+
+def test_parallel_loop_matches_sequential(program):
+
+    expected = program.run(PARALLEL_SUM)
+
+    assert program.run(PARALLEL_SUM, ["--auto-parallel"], env={"PC_NUM_THREADS": "8"}) == expected
+    assert "pc_parallel_for" in program.ir(PARALLEL_SUM, ["--auto-parallel"])
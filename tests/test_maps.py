@@ -0,0 +1,31 @@
+'''
+Maps with INT and STRING keys
+'''
+
+
+def test_counting_with_int_keys(program):
+
+    assert program.run('''
+        MAP counts FROM INT TO INT
+        FOR i = 0 TO 99999
+            counts[i % 1000] = counts[i % 1000] + 1
+        NEXT i
+        OUTPUT SIZE(counts)
+        OUTPUT counts[999]
+        OUTPUT counts[1000]
+    ''') == ["1000", "100", "0"]
+
+
+def test_string_keys_are_copied(program):
+
+    assert program.run('''
+        MAP ages FROM STRING TO DOUBLE
+        name = "Ada"
+        ages[name] = 36.5
+        name = name + " Lovelace"
+        ages[name] = 1.0
+        IF CONTAINS(ages, "Ada") THEN
+            OUTPUT ages["Ada"]
+        ENDIF
+        OUTPUT SIZE(ages)
+    ''') == ["36.500000", "2"]
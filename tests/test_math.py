@@ -0,0 +1,32 @@
+'''
+The built-in math functions
+'''
+
+
+def test_math_functions(program):
+
+    assert program.run('''
+        x = -7
+        OUTPUT ABS(x)
+        OUTPUT MIN(MAX(x, 0), 10)
+        OUTPUT POW(3, 4)
+        OUTPUT SQRT(2.25)
+        OUTPUT FLOOR(-1.5)
+        OUTPUT CEIL(1.25)
+        OUTPUT POW(2.0, 0.5) * POW(2.0, 0.5)
+    ''') == ["7", "0", "81", "1.500000", "-2.000000", "2.000000", "2.000000"]
+
+
+def test_math_functions_on_whole_arrays(program):
+
+    assert program.run('''
+        n = 4
+        DOUBLE a[n]
+        DOUBLE c[n]
+        FOR i = 0 TO n - 1
+            a[i] = i * 3
+        NEXT i
+        c = SQRT(a * a + 16.0)
+        OUTPUT c[1]
+        OUTPUT MAX(c, n)
+    ''') == ["5.000000", "9.848858"]
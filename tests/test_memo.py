@@ -0,0 +1,29 @@
+'''
+MEMO subroutines, which remember their results
+'''
+
+
+def test_memo_makes_exponential_recursion_linear(program):
+
+    assert program.run('''
+        MEMO INT SUBROUTINE fibonacci(INT x)
+            IF x < 2 THEN
+                RETURN x
+            ENDIF
+            RETURN fibonacci(x - 1) + fibonacci(x - 2)
+        ENDSUBROUTINE
+        OUTPUT fibonacci(40)
+        OUTPUT fibonacci(46)
+    ''') == ["102334155", "1836311903"]
+
+
+def test_memo_with_arguments_outside_the_table(program):
+
+    assert program.run('''
+        MEMO DOUBLE SUBROUTINE half(INT x, DOUBLE y)
+            RETURN x / 2.0 + y
+        ENDSUBROUTINE
+        OUTPUT half(100000, 0.5)
+        OUTPUT half(100000, 0.5)
+        OUTPUT half(-3, 0.0)
+    ''') == ["50000.500000", "50000.500000", "-1.500000"]
@@ -0,0 +1,88 @@
+'''
+Buffered OUTPUT, with specialized formatting of numbers and strings
+'''
+
+
+def test_output_larger_than_the_buffer(program):
+
+    words = program.run('''
+        FOR i = 0 TO 199999
+            OUTPUT i * 7 - 500000
+        NEXT i
+    ''')
+
+    assert words == [str(i * 7 - 500000) for i in range(200000)]
+
+
+def test_long_lines_across_the_buffer_limit(program):
+
+    words = program.run('''
+        s = ""
+        FOR i = 1 TO 10000
+            s = s + "x"
+        NEXT i
+        FOR i = 1 TO 20
+            OUTPUT s
+            OUTPUT i
+        NEXT i
+    ''')
+
+    assert words == [word for i in range(1, 21) for word in ("x" * 10000, str(i))]
+
+
+def test_output_is_written_before_an_error(program):
+
+    error = program.fails('''
+        OUTPUT "before"
+        INT x[4]
+        i = 4
+        x[i] = 1
+    ''', ["--bounds-check"])
+
+    assert error == "Index 4 is out of bounds for x, which has 4 elements"
+    assert program.output == ["before"]
+
+
+def test_numbers(program):
+
+    assert program.run('''
+        OUTPUT 0
+        OUTPUT -2147483648
+        OUTPUT 2147483647
+        OUTPUT 0.1
+        OUTPUT -0.5
+        OUTPUT 123456789.125
+        OUTPUT 1.0 / 3
+    ''') == ["0", "-2147483648", "2147483647", "0.100000", "-0.500000", "123456789.125000", "0.333333"]
+
+
+def test_joined_strings_between_numbers(program):
+
+    assert program.run('''
+        name = "World"
+        line = ""
+        FOR i = 1 TO 3
+            OUTPUT i
+            OUTPUT "Hello " + name + "," + " again"
+            OUTPUT i / 2.0
+            line = line + "ab"
+        NEXT i
+        OUTPUT "<" + line + ">" + ""
+    ''') == ["1", "Hello", "World,", "again", "0.500000",
+             "2", "Hello", "World,", "again", "1.000000",
+             "3", "Hello", "World,", "again", "1.500000", "<ababab>"]
+
+
+def test_joined_string_larger_than_the_buffer(program):
+
+    words = program.run('''
+        s = ""
+        FOR i = 1 TO 50000
+            s = s + "y"
+        NEXT i
+        OUTPUT 1
+        OUTPUT s + "-" + s
+        OUTPUT 2.5
+    ''')
+
+    assert words == ["1", "y" * 50000 + "-" + "y" * 50000, "2.500000"]
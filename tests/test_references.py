@@ -0,0 +1,90 @@
+'''
+Arrays and strings passed to subroutines by reference
+'''
+
+
+def test_array_argument_is_shared_with_the_caller(program):
+
+    assert program.run('''
+        INT SUBROUTINE fill(INT a[], INT n)
+            FOR i = 0 TO n - 1
+                a[i] = i * i
+            NEXT i
+            RETURN 0
+        ENDSUBROUTINE
+        n = 5
+        INT x[n]
+        r = fill(x, n)
+        OUTPUT x[4]
+    ''') == ["16"]
+
+
+def test_string_argument(program):
+
+    assert program.run('''
+        INT SUBROUTINE show(STRING s)
+            OUTPUT s + "!"
+            RETURN 0
+        ENDSUBROUTINE
+        name = "World"
+        r = show("Hello " + name)
+    ''') == ["Hello", "World!"]
+
+
+def test_no_tail_call_given_a_stack_array(program):
+
+    source = '''
+        INT SUBROUTINE first_two(INT b[], INT n)
+            RETURN b[0] + b[1]
+        ENDSUBROUTINE
+        INT SUBROUTINE f(INT n)
+            INT a[4]
+            a[0] = 10
+            a[1] = n
+            RETURN first_two(a, n)
+        ENDSUBROUTINE
+        OUTPUT f(10)
+    '''
+
+    assert program.run(source, ["--inline-threshold=0"]) == ["20"]
+    assert "tail call" not in program.ir(source, ["--inline-threshold=0"])
+
+
+SHIFT = '''
+    INT SUBROUTINE shift(INT a[], INT b[], INT n)
+        FOR i = 0 TO n - 2
+            a[i] = b[i + 1] * 2
+        NEXT i
+        RETURN 0
+    ENDSUBROUTINE
+    n = 1000000
+    INT x[n]
+    INT y[n]
+    FOR i = 0 TO n - 1
+        x[i] = 1
+    NEXT i
+    r = shift(%s, x, n)
+    total = 0
+    FOR i = 0 TO n - 1
+        total = total + x[i] + y[i]
+    NEXT i
+    OUTPUT total
+'''
+
+
+def test_aliasing_array_arguments_are_not_parallelized(program):
+
+    source = SHIFT % "x"
+    flags = ["--auto-parallel", "--inline-threshold=0"]
+
+    assert program.run(source, flags, env={"PC_NUM_THREADS": "32"}) == ["1999999"]
+    assert "@\"shift.par" not in program.ir(source, flags)
+
+
+def test_distinct_array_arguments_are_parallelized(program):
+
+    source = SHIFT % "y"
+    flags = ["--auto-parallel", "--inline-threshold=0"]
+
+    assert program.run(source, flags, env={"PC_NUM_THREADS": "32"}) == ["2999998"]
+    assert "@\"shift.par" in program.ir(source, flags)
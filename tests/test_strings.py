@@ -0,0 +1,48 @@
+'''
+Strings, which grow as needed and are freed when the subroutine that built them returns
+'''
+
+
+def test_appending_in_a_loop(program):
+
+    assert program.run('''
+        s = ""
+        FOR i = 1 TO 1000
+            s = s + "ab"
+        NEXT i
+        s = "<" + s + ">"
+        OUTPUT s
+    ''') == ["<" + "ab" * 1000 + ">"]
+
+
+def test_subroutine_strings_are_freed_on_return(program):
+
+    source = '''
+        INT SUBROUTINE keep(STRING s)
+            copy = s
+            RETURN 1
+        ENDSUBROUTINE
+        INT SUBROUTINE build(INT n)
+            s = "0123456789"
+            FOR i = 1 TO 5
+                s = s + "abcdefghij"
+            NEXT i
+            IF n < 0 THEN
+                RETURN 0
+            ENDIF
+            RETURN keep(s + "!")
+        ENDSUBROUTINE
+        name = "caller"
+        total = 0
+        FOR k = 1 TO 100000
+            total = total + build(k) + keep(name)
+        NEXT k
+        OUTPUT total
+        OUTPUT name
+    '''
+
+    assert program.run(source, ["--inline-threshold=0"]) == ["200000", "caller"]
+
+    build = program.ir(source, ["--inline-threshold=0"]).split('define i32 @"build"')[1].split("\n}")[0]
+
+    assert build.count("call void @\"pc_str_free\"") >= 4
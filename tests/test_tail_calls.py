@@ -0,0 +1,73 @@
+'''
+Tail calls, and self tail recursion turned into loops
+'''
+
+
+def test_self_tail_recursion_does_not_grow_the_stack(program):
+
+    assert program.run('''
+        INT SUBROUTINE count(INT n, INT total)
+            IF n == 0 THEN
+                RETURN total
+            ENDIF
+            RETURN count(n - 1, total + 1)
+        ENDSUBROUTINE
+        OUTPUT count(10000000, 0)
+    ''', ["--inline-threshold=0"]) == ["10000000"]
+
+
+def test_returned_call_is_a_tail_call(program):
+
+    source = '''
+        INT SUBROUTINE step(INT n, INT total)
+            RETURN n + total
+        ENDSUBROUTINE
+        INT SUBROUTINE down(INT n, INT total)
+            IF n == 0 THEN
+                RETURN total
+            ENDIF
+            RETURN step(n, total)
+        ENDSUBROUTINE
+        OUTPUT down(10, 5)
+    '''
+
+    assert program.run(source, ["--inline-threshold=0"]) == ["15"]
+    assert "musttail call i32 @\"step\"" in program.ir(source, ["--inline-threshold=0"])
+
+
+def test_no_tail_call_before_stack_arrays_end(program):
+
+    source = '''
+        INT SUBROUTINE twice(INT v)
+            RETURN v * 2
+        ENDSUBROUTINE
+        INT SUBROUTINE first(INT v)
+            INT a[4]
+            a[0] = v
+            RETURN twice(a[0])
+        ENDSUBROUTINE
+        OUTPUT first(21)
+    '''
+
+    assert program.run(source, ["--inline-threshold=0"]) == ["42"]
+    assert "tail call" not in program.ir(source, ["--inline-threshold=0"])
+
+
+def test_no_tail_call_before_files_close(program, tmp_path):
+
+    path = str(tmp_path / "numbers.txt")
+
+    source = '''
+        INT SUBROUTINE twice(INT v)
+            RETURN v * 2
+        ENDSUBROUTINE
+        INT SUBROUTINE save(INT v)
+            OPENFILE f, "%s", WRITE
+            WRITEFILE f, v
+            RETURN twice(v)
+        ENDSUBROUTINE
+        OUTPUT save(21)
+    ''' % path
+
+    assert program.run(source, ["--inline-threshold=0"]) == ["42"]
+    assert open(path).read().split() == ["21"]